@@ -0,0 +1,11 @@
+import pytest
+
+
+@pytest.fixture(autouse=True, scope='session')
+def isolated_settings():
+    """Тесты pytest, как и manage.py test, не трогают кэш разработки и
+    строят миниатюры без фонового пула."""
+    from core.testing import isolated_settings
+
+    with isolated_settings():
+        yield
@@ -0,0 +1,20 @@
+"""Конвертеры путей API."""
+from posts.utils import MAX_INTEGER
+
+
+class IdConverter:
+    """Как ``int``, но только номера, которые SQLite свяжет как параметр.
+
+    Больший номер дал бы OverflowError и ответ 500, а так — 404.
+    """
+
+    regex = '[0-9]+'
+
+    def to_python(self, value):
+        value = int(value)
+        if value > MAX_INTEGER:
+            raise ValueError(value)
+        return value
+
+    def to_url(self, value):
+        return str(value)
@@ -0,0 +1,15 @@
+from django import forms
+
+from posts import forms as posts_forms
+from posts.models import Group
+
+
+class PostForm(posts_forms.PostForm):
+    """Пост из JSON: группа задаётся slug, картинки через API нет."""
+
+    group = forms.ModelChoiceField(
+        Group.objects.all(), to_field_name='slug', required=False
+    )
+
+    class Meta(posts_forms.PostForm.Meta):
+        fields = ('text', 'group')
@@ -0,0 +1,130 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import reverse
+
+from core import loadtest
+from core.metrics import registry
+
+# Поля мобильного списка постов: без текста и дат.
+POST_FIELDS = 'id,author,group,comments_count'
+# Одни и те же данные страницами HTML и JSON:
+# (страница, HTML, API, аргументы адреса, поля для ?fields=).
+PAIRS = (
+    ('лента', 'posts:index', 'api:posts', (), POST_FIELDS),
+    ('группа', 'posts:group_list', 'api:posts', ('slug',), POST_FIELDS),
+    ('пост', 'posts:post_detail', 'api:post', ('post_id',), POST_FIELDS),
+    (
+        'комментарии',
+        'posts:post_comments',
+        'api:comments',
+        ('post_id',),
+        'id,author',
+    ),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность JSON API и HTML-страниц с теми '
+        'же данными на временной базе'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--requests', type=int, default=300)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with loadtest.temporary_site():
+            loadtest.seed(
+                users=options['users'],
+                posts=options['posts'],
+                comments=options['comments'],
+                images=0,
+                random_seed=options['seed'],
+            )
+            self.runner = loadtest.ClientRunner(seed=options['seed'])
+            self.handler = WSGIHandler()
+            self.factory = RequestFactory()
+            self.stdout.write(
+                f'{"страница":<12} {"вариант":<10} {"запросов/с":>11} '
+                f'{"p50":>8} {"p95":>8} {"SQL":>5} {"байт":>8}'
+            )
+            for title, html, api, arguments, fields in PAIRS:
+                variants = (
+                    ('html', html, {}),
+                    ('json', api, {}),
+                    ('json поля', api, {'fields': fields}),
+                )
+                for variant, name, fields in variants:
+                    result = self.measure(name, arguments, fields, options)
+                    self.write_row(title, variant, result)
+            connections.close_all()
+
+    def targets(self, arguments, count, seed):
+        """Аргументы адресов: одинаковые у HTML и JSON одной страницы."""
+        rng = random.Random(f'{seed}:{arguments}')
+        values = self.runner.values
+        return [
+            {argument: rng.choice(values[argument]) for argument in arguments}
+            for _ in range(count)
+        ]
+
+    def request(self, name, kwargs, fields):
+        if name != 'api:posts':
+            return reverse(name, kwargs=kwargs), fields
+        # Страница ленты того же размера, что в HTML; группа в API —
+        # фильтр ленты, а не часть адреса.
+        query = {'limit': settings.POSTS_ON_PAGE, **kwargs, **fields}
+        if 'slug' in query:
+            query['group'] = query.pop('slug')
+        return reverse(name), query
+
+    def get(self, address, query):
+        request = self.factory.get(address, query)
+        response = self.handler(request.environ, lambda status, headers: None)
+        size = len(b''.join(response))
+        # Как сервер: close() шлёт request_finished.
+        response.close()
+        return size
+
+    def measure(self, name, arguments, fields, options):
+        requests = [
+            self.request(name, kwargs, fields)
+            for kwargs in self.targets(
+                arguments, options['requests'], options['seed']
+            )
+        ]
+        for address, query in requests[:10]:
+            self.get(address, query)
+        registry.reset()
+        latencies = []
+        size = 0
+        started = time.perf_counter()
+        for address, query in requests:
+            began = time.perf_counter()
+            size += self.get(address, query)
+            latencies.append(time.perf_counter() - began)
+        elapsed = time.perf_counter() - started
+        stats = registry.snapshot().get(name, {})
+        summary = loadtest.summarize(
+            latencies, stats.get('queries', 0), stats.get('requests', 0)
+        )
+        summary['rate'] = len(requests) / elapsed
+        summary['bytes'] = size / len(requests)
+        return summary
+
+    def write_row(self, title, variant, summary):
+        self.stdout.write(
+            f'{title:<12} {variant:<10} {summary["rate"]:>11,.1f} '
+            f'{summary["p50"]:>8.2f} {summary["p95"]:>8.2f} '
+            f'{summary["queries"]:>5} {summary["bytes"]:>8,.0f}'
+        )
@@ -0,0 +1,99 @@
+"""Ресурсы API и их сериализация из строк ``values()``.
+
+Объекты моделей не создаются: запрос выбирает только колонки полей,
+запрошенных в ``?fields=`` (и колонки сортировки для курсора), а строка
+``values()`` переименовывается в JSON-объект по таблице полей ресурса.
+Связанные поля (автор, группа) приходят в той же строке через JOIN.
+"""
+from django.core.files.storage import default_storage
+
+from posts.utils import COMMENT_ORDERING, CURSOR_ORDERING
+
+
+class FieldError(ValueError):
+    """В ``?fields=`` запрошено поле, которого у ресурса нет."""
+
+
+def media_url(name):
+    return default_storage.url(name) if name else None
+
+
+class Resource:
+    """Поля ресурса: имя в JSON -> путь для ``values()``."""
+
+    def __init__(self, fields, ordering, convert=None):
+        self.fields = fields
+        self.ordering = ordering
+        self.convert = convert or {}
+
+    def select(self, requested=None):
+        """Поля ответа по ``?fields=a,b``; без параметра — все."""
+        if not requested:
+            return list(self.fields)
+        names = [name.strip() for name in requested.split(',')]
+        names = [name for name in names if name]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise FieldError(
+                f'Неизвестные поля: {", ".join(unknown)}; доступны: '
+                f'{", ".join(self.fields)}'
+            )
+        return names
+
+    def values(self, queryset, names):
+        """``values()`` полей ответа и полей сортировки для курсора."""
+        paths = [self.fields[name] for name in names]
+        paths += [name.lstrip('-') for name in self.ordering]
+        return queryset.values(*dict.fromkeys(paths))
+
+    def serialize(self, rows, names):
+        columns = [
+            (name, self.fields[name], self.convert.get(name))
+            for name in names
+        ]
+        return [
+            {
+                name: convert(row[path]) if convert else row[path]
+                for name, path, convert in columns
+            }
+            for row in rows
+        ]
+
+
+POSTS = Resource(
+    {
+        'id': 'id',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'updated': 'updated',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'image': 'image',
+        'comments_count': 'comments_count',
+    },
+    ordering=CURSOR_ORDERING,
+    convert={'image': media_url},
+)
+COMMENTS = Resource(
+    {
+        'id': 'id',
+        'post': 'post',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    },
+    ordering=COMMENT_ORDERING,
+)
+GROUPS = Resource(
+    {
+        'id': 'id',
+        'slug': 'slug',
+        'title': 'title',
+        'description': 'description',
+    },
+    ordering=('id',),
+)
+FOLLOWS = Resource(
+    {'id': 'id', 'author': 'author__username'},
+    ordering=('id',),
+)
@@ -0,0 +1,375 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from api.urls import urlpatterns
+from core.metrics import registry
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='api', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author,
+                group=cls.group if i % 2 else None,
+                text=f'Пост {i}',
+            )
+            for i in range(5)
+        ]
+        cls.post = cls.posts[-1]
+        Comment.objects.create(post=cls.post, author=cls.user, text='Ответ')
+
+    def setUp(self):
+        cache.clear()
+        self.user_client = Client()
+        self.user_client.force_login(self.user)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def send(self, client, method, address, data):
+        return getattr(client, method)(
+            address, json.dumps(data), content_type='application/json'
+        )
+
+
+class PostApiTests(ApiTestCase):
+    def test_cursor_pages_cover_feed(self):
+        address = reverse('api:posts')
+        ids = []
+        cursor = ''
+        while cursor is not None:
+            data = self.client.get(
+                address, {'limit': 2, 'after': cursor}
+            ).json()
+            self.assertLessEqual(len(data['results']), 2)
+            ids += [post['id'] for post in data['results']]
+            cursor = data['next']
+        self.assertEqual(ids, [post.pk for post in reversed(self.posts)])
+
+    def test_post_fields(self):
+        data = self.client.get(reverse('api:post', args=[self.post.pk]))
+        self.assertEqual(
+            data.json(),
+            {
+                'id': self.post.pk,
+                'text': self.post.text,
+                'pub_date': data.json()['pub_date'],
+                'updated': data.json()['updated'],
+                'author': 'author',
+                'group': None,
+                'image': None,
+                'comments_count': 1,
+            },
+        )
+
+    def test_sparse_fieldset_selects_only_requested_columns(self):
+        with self.assertNumQueries(1) as context:
+            response = self.client.get(
+                reverse('api:posts'), {'fields': 'id,author'}
+            )
+        self.assertEqual(
+            response.json()['results'][0],
+            {'id': self.post.pk, 'author': 'author'},
+        )
+        sql = context.captured_queries[0]['sql']
+        self.assertNotIn('"text"', sql)
+        self.assertNotIn('posts_group', sql)
+
+    def test_unknown_field(self):
+        response = self.client.get(reverse('api:posts'), {'fields': 'secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.json()['detail'])
+
+    def test_filters(self):
+        response = self.client.get(
+            reverse('api:posts'), {'group': self.group.slug}
+        )
+        self.assertEqual(
+            {post['group'] for post in response.json()['results']},
+            {self.group.slug},
+        )
+        response = self.client.get(reverse('api:posts'), {'author': 'nobody'})
+        self.assertEqual(response.json()['results'], [])
+
+    def test_bulk_read_keeps_order(self):
+        ids = [self.posts[2].pk, 0, self.posts[0].pk]
+        response = self.client.get(
+            reverse('api:posts_bulk'),
+            {'ids': ','.join(map(str, ids)), 'fields': 'id'},
+        )
+        self.assertEqual(
+            response.json()['results'],
+            [{'id': self.posts[2].pk}, {'id': self.posts[0].pk}],
+        )
+
+    def test_bulk_read_rejects_oversized_ids(self):
+        for ids in (str(2 ** 63), f'1,{-2 ** 64}'):
+            with self.subTest(ids=ids):
+                response = self.client.get(
+                    reverse('api:posts_bulk'), {'ids': ids}
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('detail', response.json())
+
+    def test_oversized_post_id_is_not_found(self):
+        for name in ('api:post', 'api:comments'):
+            with self.subTest(name=name):
+                address = reverse(name, args=[1]).replace(
+                    '/1/', f'/{2 ** 63}/'
+                )
+                response = self.client.get(address)
+                self.assertEqual(response.status_code, 404)
+
+    def test_create_requires_login(self):
+        response = self.send(
+            self.client, 'post', reverse('api:posts'), {'text': 'Пост'}
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Post.objects.count(), len(self.posts))
+
+    def test_create(self):
+        response = self.send(
+            self.user_client,
+            'post',
+            reverse('api:posts'),
+            {'text': 'Из приложения', 'group': self.group.slug},
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['author'], 'reader')
+        self.assertEqual(response.json()['group'], self.group.slug)
+        self.assertTrue(
+            Post.objects.filter(
+                author=self.user, group=self.group, text='Из приложения'
+            ).exists()
+        )
+
+    def test_bulk_create_is_atomic(self):
+        address = reverse('api:posts_bulk')
+        response = self.send(
+            self.user_client,
+            'post',
+            address,
+            [{'text': 'Первый'}, {'text': ''}, {'group': 'missing'}],
+        )
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        self.assertEqual(errors[0], {})
+        self.assertIn('text', errors[1])
+        self.assertIn('group', errors[2])
+        self.assertFalse(Post.objects.filter(author=self.user).exists())
+        response = self.send(
+            self.user_client,
+            'post',
+            address,
+            [{'text': 'Первый'}, {'text': 'Второй'}],
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [post['text'] for post in response.json()['results']],
+            ['Первый', 'Второй'],
+        )
+        self.assertEqual(self.user.stats.posts_count, 2)
+
+    @override_settings(API_BULK_LIMIT=2)
+    def test_bulk_limit(self):
+        response = self.send(
+            self.user_client,
+            'post',
+            reverse('api:posts_bulk'),
+            [{'text': 'Пост'}] * 3,
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_edit_and_delete_by_author_only(self):
+        address = reverse('api:post', args=[self.post.pk])
+        response = self.send(
+            self.user_client, 'patch', address, {'text': 'Чужая правка'}
+        )
+        self.assertEqual(response.status_code, 403)
+        response = self.send(
+            self.author_client, 'patch', address, {'group': self.group.slug}
+        )
+        self.assertEqual(response.json()['text'], self.post.text)
+        self.assertEqual(response.json()['group'], self.group.slug)
+        response = self.author_client.delete(address)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get(address).status_code, 404)
+
+    def test_errors_are_json(self):
+        response = self.client.put(reverse('api:posts'))
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response['Allow'], 'GET, POST')
+        response = self.user_client.post(
+            reverse('api:posts'), 'не json', content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('api:group', args=['missing']))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'detail': 'Не найдено'})
+
+
+class CommentGroupFollowApiTests(ApiTestCase):
+    def test_comments(self):
+        address = reverse('api:comments', args=[self.post.pk])
+        response = self.send(
+            self.user_client, 'post', address, {'text': 'Второй ответ'}
+        )
+        self.assertEqual(response.status_code, 201)
+        data = self.client.get(address, {'fields': 'author,text'}).json()
+        self.assertEqual(
+            data['results'],
+            [
+                {'author': 'reader', 'text': 'Ответ'},
+                {'author': 'reader', 'text': 'Второй ответ'},
+            ],
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 2)
+
+    def test_groups(self):
+        data = self.client.get(reverse('api:groups')).json()
+        self.assertEqual(
+            data['results'],
+            [
+                {
+                    'id': self.group.pk,
+                    'slug': 'api',
+                    'title': 'Группа',
+                    'description': 'Описание',
+                }
+            ],
+        )
+        response = self.client.get(
+            reverse('api:group', args=['api']), {'fields': 'title'}
+        )
+        self.assertEqual(response.json(), {'title': 'Группа'})
+
+    def test_bulk_follow_and_unfollow(self):
+        User.objects.create_user(username='other')
+        address = reverse('api:follows')
+        response = self.send(
+            self.user_client,
+            'post',
+            address,
+            {'authors': ['author', 'other', 'reader', 'nobody', 'author']},
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            sorted(follow['author'] for follow in response.json()['results']),
+            ['author', 'other'],
+        )
+        response = self.send(
+            self.user_client, 'post', address, {'authors': ['author']}
+        )
+        self.assertEqual(response.json()['results'], [])
+        data = self.user_client.get(address).json()
+        self.assertEqual(len(data['results']), 2)
+        self.assertEqual(self.author.stats.followers_count, 1)
+        response = self.send(
+            self.user_client, 'delete', address, {'authors': ['author']}
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(
+            list(Follow.objects.values_list('author__username', flat=True)),
+            ['other'],
+        )
+        self.assertEqual(self.client.get(address).status_code, 403)
+
+    def test_follow_authors_must_be_names(self):
+        for authors in ([{}], ['author', 1], [['author']], 'author'):
+            with self.subTest(authors=authors):
+                response = self.send(
+                    self.user_client,
+                    'post',
+                    reverse('api:follows'),
+                    {'authors': authors},
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('detail', response.json())
+        self.assertFalse(Follow.objects.exists())
+
+    @override_settings(RATE_LIMITS={'follow': {'user': '1/m'}})
+    def test_bulk_write_takes_one_token(self):
+        User.objects.create_user(username='other')
+        address = reverse('api:follows')
+        response = self.send(
+            self.user_client, 'post', address, {'authors': ['author', 'other']}
+        )
+        self.assertEqual(response.status_code, 201)
+        response = self.send(
+            self.user_client, 'delete', address, {'authors': ['author']}
+        )
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(response.json(), {'detail': 'Слишком много запросов'})
+        self.assertEqual(self.user_client.get(address).status_code, 200)
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class ApiQueryBudgetTests(ApiTestCase):
+    def test_every_view_declares_budget(self):
+        for pattern in urlpatterns:
+            with self.subTest(view=pattern.name):
+                self.assertIsInstance(
+                    getattr(pattern.callback, 'query_budget', None), int
+                )
+
+    def test_views_stay_within_budget(self):
+        registry.reset()
+        post = [self.post.pk]
+        ids = ','.join(str(post.pk) for post in self.posts)
+        for client in (self.client, self.user_client):
+            client.get(reverse('api:posts'))
+            client.get(reverse('api:posts_bulk'), {'ids': ids})
+            client.get(reverse('api:post', args=post))
+            client.get(reverse('api:comments', args=post))
+            client.get(reverse('api:groups'))
+            client.get(reverse('api:group', args=['api']))
+            client.get(reverse('api:follows'))
+        self.send(
+            self.user_client,
+            'post',
+            reverse('api:posts'),
+            {'text': 'Пост'},
+        )
+        self.send(
+            self.user_client,
+            'post',
+            reverse('api:posts_bulk'),
+            [{'text': f'Пост {i}'} for i in range(5)],
+        )
+        self.send(
+            self.user_client,
+            'post',
+            reverse('api:comments', args=post),
+            {'text': 'Ответ'},
+        )
+        self.send(
+            self.user_client,
+            'post',
+            reverse('api:follows'),
+            {'authors': ['author']},
+        )
+        self.send(
+            self.author_client,
+            'patch',
+            reverse('api:post', args=post),
+            {'text': 'Правка'},
+        )
+        self.author_client.delete(reverse('api:post', args=post))
+        stats = registry.snapshot()
+        self.assertEqual(stats['api:posts']['requests'], 3)
+        self.assertEqual(stats['api:post']['requests'], 4)
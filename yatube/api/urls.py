@@ -0,0 +1,20 @@
+from django.urls import path, register_converter
+
+from . import views
+from .converters import IdConverter
+
+register_converter(IdConverter, 'id')
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', views.posts, name='posts'),
+    path('posts/bulk/', views.posts_bulk, name='posts_bulk'),
+    path('posts/<id:post_id>/', views.post, name='post'),
+    path(
+        'posts/<id:post_id>/comments/', views.comments, name='comments'
+    ),
+    path('groups/', views.groups, name='groups'),
+    path('groups/<slug:slug>/', views.group, name='group'),
+    path('follows/', views.follows, name='follows'),
+]
@@ -0,0 +1,338 @@
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+
+from core.metrics import query_budget
+from core.middleware import SAFE_METHODS
+from core.ratelimit import RateLimited, consume
+from posts import suggestions
+from posts.forms import CommentForm
+from posts.models import Follow, Group, Post
+from posts.utils import MAX_INTEGER, CursorPaginator
+
+from .forms import PostForm
+from .serializers import COMMENTS, FOLLOWS, GROUPS, POSTS, FieldError
+
+User = get_user_model()
+
+# Запросов на одну запись в пачке: INSERT и сигналы (индекс поиска,
+# счётчики, раскладка по лентам).
+POST_WRITE_QUERIES = 7
+FOLLOW_WRITE_QUERIES = 6
+# Пересчёт рекомендаций после подписок запроса: чтение подграфа, BEGIN,
+# DELETE и INSERT.
+SUGGESTIONS_QUERIES = 4
+
+
+class ApiError(Exception):
+    def __init__(self, status, detail, headers=None, **extra):
+        super().__init__(detail)
+        self.status = status
+        self.headers = headers or {}
+        self.data = {'detail': detail, **extra}
+
+
+def _check(request, methods, rate_limit):
+    if request.method not in methods:
+        raise ApiError(
+            405, 'Метод не поддерживается', {'Allow': ', '.join(methods)}
+        )
+    if request.method in SAFE_METHODS:
+        return
+    if not request.user.is_authenticated:
+        raise ApiError(403, 'Требуется авторизация')
+    if rate_limit is None:
+        return
+    try:
+        consume(request, rate_limit)
+    except RateLimited as error:
+        raise ApiError(
+            429,
+            'Слишком много запросов',
+            {'Retry-After': str(error.retry_after)},
+        )
+
+
+def api_view(*methods, rate_limit=None):
+    """JSON-view API: допустимые методы, вход и лимит частоты для записи
+    (``core.ratelimit``, группа ``rate_limit``), ошибки в JSON.
+
+    Пакетный запрос берёт из корзины один токен, как одна транзакция.
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            try:
+                _check(request, methods, rate_limit)
+                return view_func(request, *args, **kwargs)
+            except Http404:
+                error = ApiError(404, 'Не найдено')
+            except ApiError as raised:
+                error = raised
+            response = JsonResponse(error.data, status=error.status)
+            for name, value in error.headers.items():
+                response[name] = value
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def _fields(request, resource):
+    try:
+        return resource.select(request.GET.get('fields'))
+    except FieldError as error:
+        raise ApiError(400, str(error))
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        raise ApiError(400, 'limit должен быть числом')
+    return max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+
+def _page(request, resource, queryset):
+    """Страница ресурса по курсору ``?after=`` с полями из ``?fields=``."""
+    names = _fields(request, resource)
+    paginator = CursorPaginator(
+        resource.values(queryset, names),
+        _limit(request),
+        ordering=resource.ordering,
+    )
+    page = paginator.get_cursor_page(after=request.GET.get('after'))
+    return JsonResponse({
+        'next': paginator.next_cursor if paginator.has_next else None,
+        'results': resource.serialize(page, names),
+    })
+
+
+def _rows(request, resource, queryset, ids):
+    """Объекты ``ids`` в порядке ``ids``; отсутствующие пропускаются."""
+    names = _fields(request, resource)
+    rows = resource.values(queryset.filter(pk__in=ids).order_by(), names)
+    by_id = {row['id']: row for row in rows}
+    return resource.serialize(
+        [by_id[pk] for pk in ids if pk in by_id], names
+    )
+
+
+def _one(request, resource, queryset, pk, status=200):
+    rows = _rows(request, resource, queryset, [pk])
+    if not rows:
+        raise Http404
+    return JsonResponse(rows[0], status=status)
+
+
+def _payload(request):
+    try:
+        return json.loads(request.body or b'null')
+    except ValueError:
+        raise ApiError(400, 'Тело запроса — не JSON')
+
+
+def _object(data):
+    if not isinstance(data, dict):
+        raise ApiError(400, 'Ожидается JSON-объект')
+    return data
+
+
+def _items(data):
+    if not isinstance(data, list) or not data:
+        raise ApiError(400, 'Ожидается непустой JSON-массив')
+    if len(data) > settings.API_BULK_LIMIT:
+        raise ApiError(
+            400, f'Не больше {settings.API_BULK_LIMIT} объектов за запрос'
+        )
+    return data
+
+
+def _valid(forms):
+    if not all(form.is_valid() for form in forms):
+        raise ApiError(
+            400,
+            'Ошибка в данных',
+            errors=[form.errors.get_json_data() for form in forms],
+        )
+
+
+@transaction.atomic
+def _create_posts(user, payloads):
+    forms = [PostForm(_object(payload)) for payload in payloads]
+    _valid(forms)
+    ids = []
+    for form in forms:
+        form.instance.author = user
+        ids.append(form.save().pk)
+    return ids
+
+
+@query_budget(14)
+@api_view('GET', 'POST', rate_limit='post')
+def posts(request):
+    """Лента постов (фильтры ``?group=``, ``?author=``) и новый пост."""
+    if request.method == 'POST':
+        (pk,) = _create_posts(request.user, [_payload(request)])
+        return _one(request, POSTS, Post.objects, pk, status=201)
+    queryset = Post.objects.all()
+    if request.GET.get('group'):
+        queryset = queryset.filter(group__slug=request.GET['group'])
+    if request.GET.get('author'):
+        queryset = queryset.filter(author__username=request.GET['author'])
+    return _page(request, POSTS, queryset)
+
+
+@query_budget(4 + POST_WRITE_QUERIES * settings.API_BULK_LIMIT)
+@api_view('GET', 'POST', rate_limit='post')
+def posts_bulk(request):
+    """Посты по ``?ids=1,2,3`` или пачка новых постов одной транзакцией.
+
+    Пачка сохраняется целиком или не сохраняется вовсе: при ошибке в
+    любом посте ответ 400 с ошибками по каждому.
+    """
+    if request.method == 'POST':
+        ids = _create_posts(request.user, _items(_payload(request)))
+        return JsonResponse(
+            {'results': _rows(request, POSTS, Post.objects, ids)},
+            status=201,
+        )
+    try:
+        ids = [int(pk) for pk in request.GET.get('ids', '').split(',')]
+    except ValueError:
+        raise ApiError(400, 'ids — номера постов через запятую')
+    # Больший номер SQLite не свяжет как параметр.
+    if any(not -MAX_INTEGER - 1 <= pk <= MAX_INTEGER for pk in ids):
+        raise ApiError(400, 'ids — номера постов через запятую')
+    _items(ids)
+    return JsonResponse({'results': _rows(request, POSTS, Post.objects, ids)})
+
+
+@transaction.atomic
+def _change_post(request, post_id):
+    post = get_object_or_404(Post.objects.select_related('group'), pk=post_id)
+    if post.author_id != request.user.pk:
+        raise ApiError(403, 'Изменять пост может только автор')
+    if request.method == 'DELETE':
+        post.delete()
+        return None
+    data = {
+        'text': post.text,
+        'group': post.group.slug if post.group else None,
+        **_object(_payload(request)),
+    }
+    form = PostForm(data, instance=post)
+    _valid([form])
+    return form.save().pk
+
+
+# Удаление поста дороже на пару запросов за каждый его комментарий.
+@query_budget(16)
+@api_view('GET', 'PATCH', 'DELETE', rate_limit='post')
+def post(request, post_id):
+    if request.method != 'GET':
+        post_id = _change_post(request, post_id)
+        if post_id is None:
+            return HttpResponse(status=204)
+    return _one(request, POSTS, Post.objects, post_id)
+
+
+@transaction.atomic
+def _create_comment(request, post):
+    form = CommentForm(_object(_payload(request)))
+    _valid([form])
+    form.instance.author = request.user
+    form.instance.post = post
+    return form.save().pk
+
+
+@query_budget(10)
+@api_view('GET', 'POST', rate_limit='comment')
+def comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    if request.method == 'GET':
+        return _page(request, COMMENTS, post.comments.all())
+    pk = _create_comment(request, post)
+    return _one(request, COMMENTS, post.comments.all(), pk, status=201)
+
+
+@query_budget(3)
+@api_view('GET')
+def groups(request):
+    return _page(request, GROUPS, Group.objects.all())
+
+
+@query_budget(3)
+@api_view('GET')
+def group(request, slug):
+    names = _fields(request, GROUPS)
+    rows = GROUPS.values(Group.objects.filter(slug=slug), names)
+    row = get_object_or_404(rows)
+    return JsonResponse(GROUPS.serialize([row], names)[0])
+
+
+def _authors(data):
+    usernames = _items(_object(data).get('authors'))
+    if not all(isinstance(name, str) for name in usernames):
+        raise ApiError(400, 'authors — массив имён пользователей')
+    return list(dict.fromkeys(usernames))
+
+
+@transaction.atomic
+def _follow(user, usernames):
+    """Подписывает на авторов; неизвестные имена, сам пользователь и
+    уже оформленные подписки пропускаются."""
+    followed = user.follower.filter(author__username__in=usernames)
+    authors = (
+        User.objects.filter(username__in=usernames)
+        .exclude(pk=user.pk)
+        .exclude(pk__in=followed.values('author_id'))
+        .only('pk')
+    )
+    ids = [
+        Follow.objects.create(user=user, author=author).pk
+        for author in authors
+    ]
+    if ids:
+        suggestions.refresh_on_commit(user.pk)
+    return ids
+
+
+@transaction.atomic
+def _unfollow(user, usernames):
+    deleted, _ = user.follower.filter(
+        author__username__in=usernames
+    ).delete()
+    if deleted:
+        suggestions.refresh_on_commit(user.pk)
+
+
+@query_budget(
+    6 + FOLLOW_WRITE_QUERIES * settings.API_BULK_LIMIT + SUGGESTIONS_QUERIES
+)
+@api_view('GET', 'POST', 'DELETE', rate_limit='follow')
+def follows(request):
+    """Подписки пользователя; подписка и отписка пачкой авторов.
+
+    Тело POST и DELETE — ``{"authors": ["имя", ...]}``.
+    """
+    if request.method == 'GET':
+        if not request.user.is_authenticated:
+            raise ApiError(403, 'Требуется авторизация')
+        return _page(request, FOLLOWS, request.user.follower.all())
+    usernames = _authors(_payload(request))
+    if request.method == 'DELETE':
+        _unfollow(request.user, usernames)
+        return HttpResponse(status=204)
+    ids = _follow(request.user, usernames)
+    return JsonResponse(
+        {'results': _rows(request, FOLLOWS, Follow.objects, ids)},
+        status=201,
+    )
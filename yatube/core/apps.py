@@ -1,5 +1,18 @@
 from django.apps import AppConfig
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .auth import invalidate
+        from .sqlite import configure
+
+        connection_created.connect(configure, dispatch_uid='core.sqlite')
+        for signal in (post_save, post_delete):
+            signal.connect(
+                invalidate, sender=get_user_model(), dispatch_uid='core.auth'
+            )
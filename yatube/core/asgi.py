@@ -0,0 +1,399 @@
+"""ASGI-режим для Django 2.2 и минимальный HTTP/1.1-сервер к нему.
+
+Django 2.2 не умеет асинхронные view и middleware, поэтому
+``ASGIHandler`` целиком выполняет обычный синхронный обработчик Django
+(middleware, view, шаблоны) в ограниченном пуле потоков
+``ASGI_THREADS``. Цикл событий в это время только принимает соединения и
+передаёт тела запросов и ответов: медленный клиент или простаивающее
+keep-alive соединение не занимают поток, а медленный запрос к SQLite
+занимает один поток пула, а не весь воркер.
+
+Один запрос от начала до ``close()`` ответа выполняется в одном потоке:
+соединения с базой, ``core.metrics`` и ``core.db_router`` хранят
+состояние запроса в ``threading.local``.
+"""
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+
+# Заголовки, которые WSGI передаёт без префикса HTTP_.
+UNPREFIXED = {
+    'content-type': 'CONTENT_TYPE',
+    'content-length': 'CONTENT_LENGTH',
+}
+
+# Пределы заголовка запроса сервера ``serve``: длина строки запроса или
+# заголовка и число заголовков.
+MAX_LINE = 8190
+MAX_HEADERS = 100
+
+
+def environ_from_scope(scope, body):
+    """WSGI-окружение из ASGI-scope запроса и его тела."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        # WSGI передаёт путь байтами в latin-1, Django раскодирует UTF-8.
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin-1').lower()
+        value = value.decode('latin-1')
+        key = UNPREFIXED.get(name, 'HTTP_' + name.upper().replace('-', '_'))
+        if key in environ:
+            separator = '; ' if key == 'HTTP_COOKIE' else ','
+            value = environ[key] + separator + value
+        environ[key] = value
+    return environ
+
+
+class ASGIHandler:
+    """ASGI-приложение поверх синхронного ``WSGIHandler``."""
+
+    def __init__(self, threads=None):
+        self.handler = WSGIHandler()
+        self.executor = ThreadPoolExecutor(
+            threads or settings.ASGI_THREADS, thread_name_prefix='asgi'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError(f'Неподдерживаемый тип ASGI: {scope["type"]}')
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # Ожидание потоков пула не должно останавливать цикл.
+                await asyncio.get_running_loop().run_in_executor(
+                    None, partial(self.executor.shutdown, wait=True)
+                )
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        body = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        environ = environ_from_scope(scope, b''.join(body))
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            self.executor, self.respond, environ, loop, send
+        )
+        if result is None:
+            return
+        status, headers, content = result
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': headers,
+        })
+        await send({'type': 'http.response.body', 'body': content})
+
+    def respond(self, environ, loop, send):
+        """Выполняет запрос в потоке пула.
+
+        Обычный ответ возвращается целиком и уходит клиенту из цикла
+        событий, поток сразу свободен. Потоковый ответ может читать базу
+        при итерации, поэтому этот поток сам отдаёт его кусками.
+        """
+        response = self.handler(environ, lambda status, headers: None)
+        try:
+            status = response.status_code
+            headers = [
+                (name.lower().encode('latin-1'), str(value).encode('latin-1'))
+                for name, value in response.items()
+            ]
+            headers += [
+                (b'set-cookie', cookie.output(header='').strip().encode())
+                for cookie in response.cookies.values()
+            ]
+            if environ['REQUEST_METHOD'] == 'HEAD':
+                # Заголовки те же, что у GET, включая Content-Length;
+                # потоковое тело не читается вовсе.
+                return status, headers, b''
+            if not response.streaming:
+                return status, headers, b''.join(response)
+
+            def send_now(message):
+                asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+            send_now({
+                'type': 'http.response.start',
+                'status': status,
+                'headers': headers,
+            })
+            for chunk in response:
+                send_now({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+            send_now({'type': 'http.response.body', 'body': b''})
+            return None
+        finally:
+            # request_finished закрывает соединения с базой этого потока.
+            response.close()
+
+
+class BadRequest(Exception):
+    """Запрос, на который сервер отвечает ошибкой и закрывает соединение."""
+
+    def __init__(self, status=HTTPStatus.BAD_REQUEST):
+        super().__init__(status)
+        self.status = HTTPStatus(status)
+
+
+class Connection:
+    """Одно HTTP/1.1-соединение сервера ``serve`` с keep-alive."""
+
+    def __init__(self, app, reader, writer):
+        self.app = app
+        self.reader = reader
+        self.writer = writer
+        self.server = writer.get_extra_info('sockname')[:2]
+        self.client = writer.get_extra_info('peername')[:2]
+
+    async def run(self):
+        try:
+            while await self.handle_request():
+                pass
+        except BadRequest as error:
+            await self.reject(error.status)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.writer.close()
+
+    async def reject(self, status):
+        body = f'{status.value} {status.phrase}\n'.encode()
+        self.writer.write(
+            f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+            f'Content-Type: text/plain; charset=utf-8\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: close\r\n\r\n'.encode() + body
+        )
+        await self.writer.drain()
+
+    async def read_line(self, status):
+        try:
+            line = await self.reader.readline()
+        except ValueError:
+            # Строка длиннее буфера StreamReader.
+            raise BadRequest(status)
+        if len(line) > MAX_LINE:
+            raise BadRequest(status)
+        return line
+
+    async def read_head(self):
+        request_line = await self.read_line(HTTPStatus.REQUEST_URI_TOO_LONG)
+        if not request_line:
+            return None
+        try:
+            method, target, version = request_line.decode('latin-1').split()
+        except ValueError:
+            raise BadRequest
+        if version not in ('HTTP/1.0', 'HTTP/1.1'):
+            raise BadRequest(HTTPStatus.HTTP_VERSION_NOT_SUPPORTED)
+        headers = []
+        while True:
+            line = await self.read_line(
+                HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE
+            )
+            if line in (b'\r\n', b'\n', b''):
+                return method, target, version, headers
+            if len(headers) == MAX_HEADERS:
+                raise BadRequest(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+            name, colon, value = line.decode('latin-1').partition(':')
+            if not colon or not name or name != name.strip():
+                raise BadRequest
+            headers.append(
+                (name.lower().encode('latin-1'),
+                 value.strip().encode('latin-1'))
+            )
+
+    async def read_chunked(self):
+        body = []
+        while True:
+            line = await self.read_line(HTTPStatus.BAD_REQUEST)
+            size = line.split(b';', 1)[0].strip()
+            if not size or size.strip(b'0123456789abcdefABCDEF'):
+                raise BadRequest
+            size = int(size, 16)
+            if not size:
+                break
+            body.append(await self.reader.readexactly(size))
+            if await self.reader.readexactly(2) != b'\r\n':
+                raise BadRequest
+        # Трейлеры после последнего куска не нужны приложению.
+        for _ in range(MAX_HEADERS + 1):
+            if await self.read_line(HTTPStatus.BAD_REQUEST) in (
+                b'\r\n', b'\n', b''
+            ):
+                return b''.join(body)
+        raise BadRequest(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+
+    async def read_body(self, headers):
+        """Тело по Content-Length или chunked.
+
+        Запрос, где граница тела неоднозначна, отклоняется: иначе часть
+        тела прочиталась бы как следующий запрос keep-alive соединения.
+        """
+        lengths = {value for name, value in headers
+                   if name == b'content-length'}
+        encodings = [value for name, value in headers
+                     if name == b'transfer-encoding']
+        if encodings:
+            if lengths:
+                raise BadRequest
+            if [value.lower() for value in encodings] != [b'chunked']:
+                raise BadRequest(HTTPStatus.NOT_IMPLEMENTED)
+            return await self.read_chunked()
+        if not lengths:
+            return b''
+        if len(lengths) > 1:
+            raise BadRequest
+        length = lengths.pop()
+        if not length.isdigit():
+            raise BadRequest
+        length = int(length)
+        return await self.reader.readexactly(length) if length else b''
+
+    async def handle_request(self):
+        head = await self.read_head()
+        if head is None:
+            return False
+        method, target, version, headers = head
+        fields = dict(headers)
+        body = await self.read_body(headers)
+        path, _, query = target.partition('?')
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': version.split('/')[-1],
+            'method': method,
+            'scheme': 'http',
+            'path': unquote(path),
+            'raw_path': path.encode('latin-1'),
+            'query_string': query.encode('latin-1'),
+            'root_path': '',
+            'headers': headers,
+            'server': self.server,
+            'client': self.client,
+        }
+        self.keep_alive = (
+            version == 'HTTP/1.1'
+            and fields.get(b'connection', b'').lower() != b'close'
+        )
+        self.chunked = False
+        # Ответ на HEAD — только заголовки, как у такого же GET: байты
+        # тела клиент прочёл бы как начало следующего ответа.
+        self.head = method == 'HEAD'
+        received = False
+
+        async def receive():
+            nonlocal received
+            if received:
+                return {'type': 'http.disconnect'}
+            received = True
+            return {'type': 'http.request', 'body': body}
+
+        await self.app(scope, receive, self.send)
+        return self.keep_alive
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            status = HTTPStatus(message['status'])
+            lines = [f'HTTP/1.1 {status.value} {status.phrase}']
+            names = set()
+            for name, value in message['headers']:
+                names.add(name.lower())
+                lines.append(
+                    f'{name.decode("latin-1")}: {value.decode("latin-1")}'
+                )
+            if b'content-length' not in names and not self.head:
+                self.chunked = self.keep_alive
+                lines.append(
+                    'Transfer-Encoding: chunked' if self.chunked
+                    else 'Connection: close'
+                )
+                self.keep_alive = self.chunked
+            self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode())
+            return
+        body = message.get('body', b'')
+        more = message.get('more_body', False)
+        if self.head:
+            return
+        if self.chunked:
+            if body:
+                self.writer.write(b'%x\r\n%s\r\n' % (len(body), body))
+            if not more:
+                self.writer.write(b'0\r\n\r\n')
+        else:
+            self.writer.write(body)
+        await self.writer.drain()
+
+
+async def serve(app, host='127.0.0.1', port=8000, started=None):
+    """Обслуживает ASGI-приложение по HTTP/1.1 до отмены задачи.
+
+    Для локального запуска и бенчмарков; в продакшене — uvicorn или
+    другой ASGI-сервер с ``yatube.asgi:application``.
+    """
+    connections = set()
+
+    async def accept(reader, writer):
+        task = asyncio.current_task()
+        connections.add(task)
+        try:
+            await Connection(app, reader, writer).run()
+        except asyncio.CancelledError:
+            # Отмена при остановке сервера — штатное завершение: иначе
+            # asyncio пишет в лог ошибку отменённой задачи соединения.
+            pass
+        finally:
+            connections.discard(task)
+
+    server = await asyncio.start_server(accept, host, port)
+    if started is not None:
+        started(server.sockets[0].getsockname()[:2])
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        # Простаивающие keep-alive соединения сами не закроются.
+        for task in connections:
+            task.cancel()
+        await asyncio.gather(*connections, return_exceptions=True)
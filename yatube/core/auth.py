@@ -0,0 +1,73 @@
+"""Пользователь запроса из кэша вместо SELECT из ``auth_user``.
+
+``CachedAuthenticationMiddleware`` заменяет стандартный
+``AuthenticationMiddleware``: ``request.user`` берётся из кэша
+``USER_CACHE_ALIAS`` по id из сессии, а база читается только при
+промахе. Проверки те же, что в ``django.contrib.auth.get_user``: бэкенд
+из сессии должен быть в ``AUTHENTICATION_BACKENDS``, а хэш сессии —
+совпадать с хэшем пароля, так что смена пароля по-прежнему завершает
+остальные сессии.
+
+Запись пользователя (профиль, пароль, ``last_login``) и удаление
+сбрасывают его из кэша. Правки через ``QuerySet.update()`` сигналов не
+шлют: их видно не позже, чем через ``USER_CACHE_TIMEOUT``.
+"""
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+
+def _cache():
+    return caches[settings.USER_CACHE_ALIAS]
+
+
+def _key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def invalidate(sender, instance, **kwargs):
+    """Приёмник post_save и post_delete модели пользователя."""
+    _cache().delete(_key(instance.pk))
+
+
+def _load(user_id, backend_path):
+    key = _key(user_id)
+    user = _cache().get(key)
+    if user is None:
+        user = auth.load_backend(backend_path).get_user(user_id)
+        if user is not None:
+            _cache().set(key, user, settings.USER_CACHE_TIMEOUT)
+    return user
+
+
+def get_user(request):
+    """Как ``django.contrib.auth.get_user``, но через кэш."""
+    try:
+        user_id = auth._get_user_session_key(request)
+        backend_path = request.session[auth.BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+    user = _load(user_id, backend_path)
+    if user is None:
+        return AnonymousUser()
+    session_hash = request.session.get(auth.HASH_SESSION_KEY)
+    if not (
+        session_hash
+        and constant_time_compare(session_hash, user.get_session_auth_hash())
+    ):
+        request.session.flush()
+        return AnonymousUser()
+    return user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    # Подкласс стандартного: на него рассчитаны проверки админки.
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
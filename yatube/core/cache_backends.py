@@ -0,0 +1,191 @@
+"""Общий для всех процессов кэш на SQLite.
+
+В отличие от ``LocMemCache`` один файл видят все воркеры gunicorn, и
+фрагменты шаблонов и ключи sorl-thumbnail хранятся один раз. Внешний
+сервис не нужен. Размер ограничен ``MAX_SIZE`` байт и ``MAX_ENTRIES``
+записей; при переполнении вытесняются давно не читанные записи (LRU).
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' size INTEGER NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE TABLE IF NOT EXISTS stats ('
+    ' id INTEGER PRIMARY KEY CHECK (id = 1),'
+    ' size INTEGER NOT NULL,'
+    ' entries INTEGER NOT NULL'
+    ')',
+    'INSERT OR IGNORE INTO stats VALUES (1, 0, 0)',
+    'CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN'
+    ' UPDATE stats SET size = size + new.size, entries = entries + 1;'
+    ' END',
+    'CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN'
+    ' UPDATE stats SET size = size - old.size, entries = entries - 1;'
+    ' END',
+    'CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache'
+    ' BEGIN UPDATE stats SET size = size - old.size + new.size; END',
+)
+
+
+class SQLiteCache(BaseCache):
+    """Бэкенд кэша Django поверх файла SQLite в режиме WAL.
+
+    Параметры ``OPTIONS``: ``MAX_SIZE`` — предел размера значений в
+    байтах, ``LRU_RESOLUTION`` — не чаще какого интервала (в секундах)
+    обновлять время последнего чтения записи.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = int(options.get('MAX_SIZE', 64 * 1024 * 1024))
+        self._lru_resolution = float(options.get('LRU_RESOLUTION', 60))
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        # Соединение своё у каждого потока и у каждого процесса после fork.
+        if getattr(self._local, 'pid', None) != os.getpid():
+            db = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                db.execute(statement)
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return self._local.db
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _write(self, key, value, timeout, replace):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute(
+                'SELECT expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            alive = row is not None and (row[0] is None or row[0] > now)
+            if alive and not replace:
+                db.execute('COMMIT')
+                return False
+            db.execute(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)',
+                (key, data, len(data), self.get_backend_timeout(timeout), now),
+            )
+            self._cull(db, now)
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return True
+
+    def _overflow(self, db):
+        row = db.execute('SELECT size, entries FROM stats').fetchone()
+        size, entries = row
+        if size > self._max_size or entries > self._max_entries:
+            return entries
+        return 0
+
+    def _cull(self, db, now):
+        if not self._overflow(db):
+            return
+        db.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        entries = self._overflow(db)
+        while entries:
+            db.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (max(1, entries // self._cull_frequency),),
+            )
+            entries = self._overflow(db)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._write(self._key(key, version), value, timeout, False)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write(self._key(key, version), value, timeout, True)
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        row = self._db.execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return default
+        value, expires, accessed = row
+        if expires is not None and expires <= now:
+            self._db.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?', (key, now)
+            )
+            return default
+        if now - accessed > self._lru_resolution:
+            self._db.execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?', (now, key)
+            )
+        return pickle.loads(value)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        cursor = self._db.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        self._db.execute(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),)
+        )
+
+    def has_key(self, key, version=None):
+        row = self._db.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self._key(key, version), time.time()),
+        ).fetchone()
+        return row is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or row[1] is not None and row[1] <= time.time():
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            db.execute(
+                'UPDATE cache SET value = ?, size = ? WHERE key = ?',
+                (data, len(data), key),
+            )
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return value
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
@@ -0,0 +1,111 @@
+"""Чтение с реплик, запись в основную базу.
+
+На реплики уходят только чтения внутри HTTP-запроса, который
+``ReplicaRoutingMiddleware`` разрешил читать с реплик. Команды, фоновые
+потоки и view с ``@use_primary`` читают из ``default``. После записи
+запрос и следующие запросы того же браузера в течение
+``REPLICA_PIN_SECONDS`` читают из ``default``, чтобы автор сразу видел
+свой пост или комментарий, даже если реплика ещё отстаёт.
+"""
+import os
+import random
+import sqlite3
+import threading
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Сессии всегда из основной базы: сессия, которой ещё нет на реплике,
+# сбрасывается как пустая, и пользователь оказывается разлогинен.
+PRIMARY_APPS = {'sessions'}
+
+_state = threading.local()
+
+
+def use_primary(view_func):
+    """Весь запрос к view читает из основной базы."""
+    view_func.use_primary = True
+    return view_func
+
+
+def start_request(pinned):
+    _state.replicas = True
+    _state.pinned = pinned
+    _state.wrote = False
+
+
+def pin():
+    _state.pinned = True
+
+
+def end_request():
+    """Завершает запрос; возвращает True, если в нём была запись."""
+    wrote = getattr(_state, 'wrote', False)
+    _state.replicas = False
+    _state.pinned = False
+    _state.wrote = False
+    return wrote
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        replicas = settings.DATABASE_REPLICAS
+        if (
+            not replicas
+            or model._meta.app_label in PRIMARY_APPS
+            or not getattr(_state, 'replicas', False)
+            or _state.pinned
+            or _state.wrote
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы, объекты из них совместимы.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема попадает на реплики вместе с данными при репликации.
+        return db == DEFAULT_DB_ALIAS
+
+
+def replica_path(alias):
+    """Путь к файлу реплики из ``NAME`` вида ``file:путь?mode=ro``."""
+    name = connections.databases[alias]['NAME']
+    if name.startswith('file:'):
+        return urlsplit(name).path
+    return name
+
+
+def replicate():
+    """Копирует основную базу во все реплики; возвращает их пути.
+
+    Имитация репликации для локальной работы: снимок делается через
+    backup API во временный файл рядом с репликой и подменяет её
+    атомарно, так что читатели видят либо старую, либо новую копию.
+    """
+    primary = connections[DEFAULT_DB_ALIAS]
+    primary.ensure_connection()
+    paths = []
+    for alias in settings.DATABASE_REPLICAS:
+        path = replica_path(alias)
+        temporary = f'{path}.tmp'
+        target = sqlite3.connect(temporary)
+        try:
+            primary.connection.backup(target)
+            target.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            target.close()
+        os.replace(temporary, path)
+        connections[alias].close()
+        paths.append(path)
+    return paths
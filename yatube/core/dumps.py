@@ -0,0 +1,301 @@
+"""Потоковый импорт и экспорт фикстур Django для больших дампов.
+
+``loaddata`` сохраняет объекты по одному с сигналами. Здесь дамп
+читается из файла по кусочку, объекты раскладываются по моделям во
+временные файлы и загружаются ``bulk_create`` в порядке зависимостей по
+внешним ключам: сначала пользователи и группы, потом посты, потом
+комментарии. Экспорт читает строки через ``iterator()``.
+"""
+import json
+import os
+import tempfile
+import time
+from itertools import chain, islice
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.core.serializers.json import Serializer as JSONSerializer
+from django.core.serializers.python import Deserializer
+from django.db import connection, transaction
+
+CHUNK_SIZE = 64 * 1024
+# Между элементами массива: пробелы и запятые.
+SEPARATORS = ' \t\n\r,'
+
+
+def _skip(buffer, position):
+    while position < len(buffer) and buffer[position] in SEPARATORS:
+        position += 1
+    return position
+
+
+def _open_array(stream, chunk_size):
+    """Читает поток до ``[`` и возвращает то, что прочитано после."""
+    buffer = ''
+    while not buffer:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            raise ValueError('Дамп пуст')
+        buffer = chunk.lstrip(SEPARATORS)
+    if not buffer.startswith('['):
+        raise ValueError('Дамп должен быть JSON-массивом')
+    return buffer[1:]
+
+
+def iter_objects(stream, chunk_size=CHUNK_SIZE):
+    """Объекты JSON-массива из потока без чтения его целиком."""
+    decoder = json.JSONDecoder()
+    buffer = _open_array(stream, chunk_size)
+    while True:
+        chunk = stream.read(chunk_size)
+        buffer += chunk
+        position = _skip(buffer, 0)
+        while position < len(buffer):
+            if buffer[position] == ']':
+                return
+            try:
+                obj, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise
+                # Объект ещё не дочитан: нужен следующий кусок.
+                break
+            yield obj
+            position = _skip(buffer, position)
+        buffer = buffer[position:]
+        if not chunk:
+            raise ValueError('Дамп оборвался до закрывающей скобки')
+
+
+def dependencies(model):
+    """Модели, на которые ссылаются внешние ключи и M2M модели."""
+    related = {
+        field.related_model
+        for field in chain(
+            model._meta.concrete_fields, model._meta.local_many_to_many
+        )
+        if field.is_relation and field.related_model is not None
+    }
+    related.discard(model)
+    return related
+
+
+def sort_models(models):
+    """Модели в порядке зависимостей; звенья циклов идут последними."""
+    models = set(models)
+    pending = {
+        model: dependencies(model) & models for model in models
+    }
+    ordered = []
+    while pending:
+        ready = sorted(
+            (model for model, deps in pending.items() if not deps),
+            key=lambda model: model._meta.label,
+        )
+        if not ready:
+            ordered += sorted(pending, key=lambda model: model._meta.label)
+            break
+        for model in ready:
+            ordered.append(model)
+            del pending[model]
+        for deps in pending.values():
+            deps.difference_update(ready)
+    return ordered
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Report:
+    """Счётчик объектов и скорости по моделям."""
+
+    def __init__(self):
+        self.models = []
+        self.started = time.perf_counter()
+
+    def add(self, label, count, seconds):
+        self.models.append((label, count, seconds))
+
+    @property
+    def total(self):
+        return sum(count for _, count, _ in self.models)
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self.started
+
+    def lines(self):
+        for label, count, seconds in self.models:
+            yield _line(label, count, seconds)
+        yield _line('всего', self.total, self.seconds)
+
+
+def _line(label, count, seconds):
+    rate = count / seconds if seconds else 0
+    return f'{label}: {count:,} объектов за {seconds:.2f} с ({rate:,.0f}/с)'
+
+
+class Importer:
+    """Загружает дамп пачками ``batch_size`` и коммитит каждые
+    ``commit_every`` объектов модели.
+
+    Проверка внешних ключей отключается на время загрузки и делается
+    один раз в конце, как в ``loaddata``.
+    """
+
+    def __init__(self, batch_size=2000, commit_every=100000,
+                 exclude=(), ignore_conflicts=False):
+        self.batch_size = batch_size
+        self.commit_every = commit_every
+        self.exclude = set(exclude)
+        self.ignore_conflicts = ignore_conflicts
+        self.report = Report()
+
+    def excluded(self, label):
+        app_label = label.split('.')[0]
+        return label in self.exclude or app_label in self.exclude
+
+    def spool(self, stream, directory):
+        """Раскладывает объекты по файлам моделей: {модель: путь}."""
+        files = {}
+        try:
+            for obj in iter_objects(stream):
+                label = obj['model'].lower()
+                if self.excluded(label):
+                    continue
+                if label not in files:
+                    path = os.path.join(directory, f'{label}.jsonl')
+                    files[label] = open(path, 'w', encoding='utf-8')
+                files[label].write(json.dumps(obj, ensure_ascii=False))
+                files[label].write('\n')
+        finally:
+            for spool_file in files.values():
+                spool_file.close()
+        return {
+            apps.get_model(label): spool_file.name
+            for label, spool_file in files.items()
+        }
+
+    def load(self, stream):
+        with tempfile.TemporaryDirectory() as directory:
+            spools = self.spool(stream, directory)
+            models = sort_models(spools)
+            with connection.constraint_checks_disabled():
+                for model in models:
+                    self.load_model(model, spools[model])
+            connection.check_constraints(
+                table_names=[model._meta.db_table for model in models]
+            )
+        sequence_sql = connection.ops.sequence_reset_sql(no_style(), models)
+        if sequence_sql:
+            with connection.cursor() as cursor:
+                for sql in sequence_sql:
+                    cursor.execute(sql)
+        return models
+
+    def load_model(self, model, path):
+        started = time.perf_counter()
+        count = 0
+        per_commit = max(1, self.commit_every // self.batch_size)
+        with open(path, encoding='utf-8') as spool_file:
+            objects = (json.loads(line) for line in spool_file)
+            batches = _batches(objects, self.batch_size)
+            loaded = True
+            while loaded:
+                loaded = 0
+                with transaction.atomic():
+                    for batch in islice(batches, per_commit):
+                        loaded += self.load_batch(model, batch)
+                count += loaded
+        self.report.add(
+            model._meta.label, count, time.perf_counter() - started
+        )
+
+    def load_batch(self, model, batch):
+        instances = []
+        relations = []
+        for deserialized in Deserializer(batch, ignorenonexistent=True):
+            instances.append(deserialized.object)
+            relations.append(deserialized.m2m_data or {})
+        # Размер INSERT под ограничения СУБД Django подберёт сам.
+        model._default_manager.bulk_create(
+            instances, ignore_conflicts=self.ignore_conflicts
+        )
+        for field in model._meta.local_many_to_many:
+            through = field.remote_field.through
+            source = field.m2m_field_name()
+            target = field.m2m_reverse_field_name()
+            through.objects.bulk_create(
+                [
+                    through(**{
+                        f'{source}_id': instance.pk,
+                        f'{target}_id': related_pk,
+                    })
+                    for instance, m2m in zip(instances, relations)
+                    for related_pk in m2m.get(field.name, ())
+                ],
+                ignore_conflicts=self.ignore_conflicts,
+            )
+        return len(instances)
+
+
+class Serializer(JSONSerializer):
+    """JSON-сериализатор, который берёт M2M из ``prefetch_related``.
+
+    Штатный всегда вызывает ``iterator()`` и делает по запросу на каждое
+    M2M-поле каждого объекта.
+    """
+
+    def handle_m2m_field(self, obj, field):
+        if field.remote_field.through._meta.auto_created:
+            self._current[field.name] = [
+                self._value_from_field(related, related._meta.pk)
+                for related in getattr(obj, field.name).all()
+            ]
+
+
+def _iterate(queryset, chunk_size):
+    """Строки модели через ``iterator()``, с M2M — порциями по ключу.
+
+    ``iterator()`` не умеет ``prefetch_related``.
+    """
+    m2m = [field.name for field in queryset.model._meta.many_to_many]
+    if not m2m:
+        yield from queryset.iterator(chunk_size=chunk_size)
+        return
+    queryset = queryset.prefetch_related(*m2m)
+    chunk = list(queryset[:chunk_size])
+    while chunk:
+        yield from chunk
+        chunk = list(queryset.filter(pk__gt=chunk[-1].pk)[:chunk_size])
+
+
+def _rows(querysets, report, chunk_size):
+    for queryset in querysets:
+        started = time.perf_counter()
+        count = 0
+        for obj in _iterate(queryset, chunk_size):
+            count += 1
+            yield obj
+        report.add(
+            queryset.model._meta.label, count, time.perf_counter() - started
+        )
+
+
+def export(stream, models, chunk_size=2000):
+    """Пишет JSON-фикстуру моделей в порядке зависимостей."""
+    report = Report()
+    querysets = [
+        model._default_manager.order_by(model._meta.pk.name)
+        for model in sort_models(models)
+    ]
+    Serializer().serialize(
+        _rows(querysets, report, chunk_size), stream=stream
+    )
+    return report
@@ -0,0 +1,26 @@
+"""Адрес клиента за обратными прокси."""
+from django.conf import settings
+
+
+def client_ip(request):
+    """Адрес клиента с учётом ``TRUSTED_PROXIES``.
+
+    За доверенным прокси ``REMOTE_ADDR`` — адрес самого прокси, а адрес
+    клиента — в ``X-Forwarded-For``. Заголовок читается справа налево:
+    каждый прокси дописывает в конец того, кто к нему подключился, и
+    первый адрес не из доверенных — клиент. Без прокси заголовок не
+    читается: его может прислать сам клиент.
+    """
+    address = request.META.get('REMOTE_ADDR', '')
+    trusted = settings.TRUSTED_PROXIES
+    if address not in trusted:
+        return address
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    for hop in reversed(forwarded.split(',')):
+        hop = hop.strip()
+        if not hop:
+            continue
+        address = hop
+        if hop not in trusted:
+            break
+    return address
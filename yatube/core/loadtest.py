@@ -0,0 +1,438 @@
+"""Нагрузочный прогон: синтетические данные, обход маршрутов, сводка.
+
+``seed`` заполняет базу воспроизводимым набором данных, ``Runner``
+проходит по всем маршрутам ``posts``, ``users`` и ``about`` через
+тестовый клиент Django или настоящий WSGI-сервер и собирает задержку,
+число SQL-запросов (по ``core.metrics``) и RSS процесса. Запускается
+командой ``loadtest``.
+"""
+import abc
+import io
+import random
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.storage import default_storage
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils import timezone
+from PIL import Image
+
+from posts import counters, search, thumbnails
+from posts.models import Comment, FeedEntry, Follow, Group, Post
+
+from . import metrics
+
+User = get_user_model()
+
+NAMESPACES = ('posts', 'users', 'about')
+PASSWORD = 'loadtest-password'
+WORDS = (
+    'лента пост автор группа подписка комментарий картинка новости '
+    'город погода музыка кино книга спорт код python django sqlite'
+).split()
+# Маршруты, которые нельзя открывать авторизованным: сбросят сессию.
+ANONYMOUS_ONLY = {'users:logout'}
+
+
+@contextmanager
+def _explicit_dates(*fields):
+    """Отключает auto_now_add, чтобы bulk_create сохранил свои даты."""
+    fields = [model._meta.get_field(name) for model, name in fields]
+    saved = [field.auto_now_add for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in zip(fields, saved):
+            field.auto_now_add = value
+
+
+@contextmanager
+def temporary_site():
+    """Временные база, медиа и кэш для прогона; удаляются после него."""
+    with tempfile.TemporaryDirectory() as directory:
+        overrides = {
+            'MEDIA_ROOT': os.path.join(directory, 'media'),
+            'CACHES': {
+                'default': {
+                    **settings.CACHES['default'],
+                    'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+                },
+            },
+            'THUMBNAIL_ASYNC': False,
+            'ALLOWED_HOSTS': ['127.0.0.1', 'testserver'],
+            # Прогон пишет быстрее любого лимита: ответы 429 подменили бы
+            # измерение записи.
+            'RATE_LIMIT_ENABLED': False,
+        }
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        test_settings['NAME'] = os.path.join(directory, 'db.sqlite3')
+        with override_settings(**overrides):
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                yield directory
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def _text(rng, words):
+    return ' '.join(rng.choices(WORDS, k=words)).capitalize()
+
+
+def _image(rng, index):
+    buffer = io.BytesIO()
+    color = tuple(rng.randrange(256) for _ in range(3))
+    Image.new('RGB', (1200, 800), color).save(buffer, 'JPEG')
+    return default_storage.save(f'posts/loadtest-{index}.jpg', buffer)
+
+
+def seed(users=200, groups=20, posts=5000, follows=20, comments=10000,
+         images=50, random_seed=0):
+    """Создаёт воспроизводимый набор данных; возвращает его размеры.
+
+    Авторы постов и подписок выбираются по закону Ципфа: несколько
+    популярных авторов и длинный хвост, как в настоящей ленте.
+    """
+    rng = random.Random(random_seed)
+    now = timezone.now()
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(
+        [
+            User(username=f'loadtest-{i}', password=password)
+            for i in range(users)
+        ]
+    )
+    user_ids = list(
+        User.objects.filter(username__startswith='loadtest-')
+        .order_by('pk').values_list('pk', flat=True)
+    )
+    popularity = list(
+        accumulate(1 / rank for rank in range(1, len(user_ids) + 1))
+    )
+    Group.objects.bulk_create(
+        [
+            Group(
+                title=f'Группа {i}',
+                slug=f'loadtest-{i}',
+                description=_text(rng, 12),
+            )
+            for i in range(groups)
+        ]
+    )
+    group_ids = list(
+        Group.objects.filter(slug__startswith='loadtest-')
+        .values_list('pk', flat=True)
+    )
+    # Треть постов без группы.
+    group_ids += [None] * (len(group_ids) // 2)
+    authors = rng.choices(user_ids, cum_weights=popularity, k=posts)
+    with _explicit_dates((Post, 'pub_date'), (Comment, 'created')):
+        Post.objects.bulk_create(
+            [
+                Post(
+                    author_id=author_id,
+                    group_id=rng.choice(group_ids) if group_ids else None,
+                    text=_text(rng, rng.randint(5, 60)),
+                    pub_date=now - timedelta(minutes=posts - i),
+                )
+                for i, author_id in enumerate(authors)
+            ]
+        )
+        post_rows = list(
+            Post.objects.values_list('pk', 'author_id', 'pub_date')
+        )
+        Comment.objects.bulk_create(
+            [
+                Comment(
+                    post_id=post_id,
+                    author_id=rng.choice(user_ids),
+                    text=_text(rng, rng.randint(3, 20)),
+                    created=pub_date + timedelta(seconds=rng.randint(1, 600)),
+                )
+                for post_id, _, pub_date in rng.choices(post_rows, k=comments)
+            ]
+        )
+    pairs = set()
+    for user_id in user_ids:
+        following = set()
+        while len(following) < min(follows, len(user_ids) - 1):
+            author_id = rng.choices(user_ids, cum_weights=popularity)[0]
+            if author_id != user_id:
+                following.add(author_id)
+        pairs.update((user_id, author_id) for author_id in following)
+    Follow.objects.bulk_create(
+        [Follow(user_id=user, author_id=author) for user, author in pairs]
+    )
+    by_author = {}
+    for post_id, author_id, pub_date in post_rows:
+        by_author.setdefault(author_id, []).append((post_id, pub_date))
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for user_id, author_id in pairs
+            for post_id, pub_date in by_author.get(author_id, ())
+        )
+    )
+    for index, (post_id, _, _) in enumerate(
+        rng.sample(post_rows, min(images, len(post_rows)))
+    ):
+        name = _image(rng, index)
+        Post.objects.filter(pk=post_id).update(image=name)
+        thumbnails.generate(name)
+    counters.recount()
+    if search.is_available():
+        search.rebuild()
+    return {
+        'users': users,
+        'groups': groups,
+        'posts': posts,
+        'follows': follows,
+        'comments': comments,
+        'images': images,
+        'seed': random_seed,
+    }
+
+
+def _patterns(resolver, namespace):
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _patterns(pattern, pattern.namespace or namespace)
+        elif isinstance(pattern, URLPattern) and namespace in NAMESPACES:
+            yield f'{namespace}:{pattern.name}', pattern
+
+
+def routes():
+    """Имена маршрутов и аргументы, которые они принимают."""
+    return [
+        (name, sorted(pattern.pattern.regex.groupindex))
+        for name, pattern in _patterns(get_resolver(), None)
+    ]
+
+
+def rss_mb():
+    """Текущий RSS процесса; без /proc — пиковый, без модуля ``resource``
+    (Windows) — 0."""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * resource.getpagesize() / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(samples, fraction):
+    """Перцентиль отсортированных ``samples`` с линейной интерполяцией
+    между соседними замерами (как ``method='inclusive'`` у
+    ``statistics.quantiles``, которого нет до Python 3.8)."""
+    position = (len(samples) - 1) * fraction
+    low = int(position)
+    high = min(low + 1, len(samples) - 1)
+    return samples[low] + (samples[high] - samples[low]) * (position - low)
+
+
+def summarize(latencies, queries, requests_count):
+    """Перцентили задержки в мс и среднее число запросов к БД.
+
+    Без замеров перцентили нулевые.
+    """
+    samples = sorted(latencies) or [0]
+    p50, p95, p99 = (
+        percentile(samples, fraction) for fraction in (0.5, 0.95, 0.99)
+    )
+    return {
+        'p50': round(p50 * 1000, 3),
+        'p95': round(p95 * 1000, 3),
+        'p99': round(p99 * 1000, 3),
+        'queries': round(queries / max(requests_count, 1), 2),
+    }
+
+
+class Runner(abc.ABC):
+    """Обходит маршруты ролями ``anonymous`` и ``user``."""
+
+    def __init__(self, requests_per_route=50, warmup=5, seed=0):
+        self.requests = requests_per_route
+        self.warmup = warmup
+        self.seed = seed
+        self.usernames = list(
+            User.objects.filter(username__startswith='loadtest-')
+            .values_list('username', flat=True)
+        )
+        self.values = {
+            'username': self.usernames,
+            'slug': list(Group.objects.values_list('slug', flat=True)),
+            'post_id': list(Post.objects.values_list('pk', flat=True)),
+        }
+        self.user = User.objects.get(username=self.usernames[0])
+
+    def address(self, name, arguments):
+        kwargs = {
+            argument: self.rng.choice(self.values[argument])
+            for argument in arguments
+        }
+        return reverse(name, kwargs=kwargs)
+
+    @abc.abstractmethod
+    def get(self, role, address):
+        """Запрашивает ``address`` от имени ``role``; вернёт статус."""
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def run(self, selected=None):
+        """Возвращает {"маршрут роль": сводка} и пиковый RSS в МБ."""
+        results = {}
+        self.start()
+        try:
+            for name, arguments in routes():
+                if selected and name not in selected:
+                    continue
+                for role in ('anonymous', 'user'):
+                    if role == 'user' and name in ANONYMOUS_ONLY:
+                        continue
+                    results[f'{name} {role}'] = self.run_route(
+                        name, arguments, role
+                    )
+        finally:
+            self.stop()
+        return results
+
+    def run_route(self, name, arguments, role):
+        # Одни и те же адреса в любом режиме и при любом наборе маршрутов.
+        self.rng = random.Random(f'{self.seed}:{name}:{role}')
+        for _ in range(self.warmup):
+            self.get(role, self.address(name, arguments))
+        metrics.registry.reset()
+        latencies = []
+        statuses = set()
+        for _ in range(self.requests):
+            address = self.address(name, arguments)
+            started = time.perf_counter()
+            status = self.get(role, address)
+            latencies.append(time.perf_counter() - started)
+            statuses.add(status)
+        stats = metrics.registry.snapshot().get(name, {})
+        summary = summarize(
+            latencies, stats.get('queries', 0), stats.get('requests', 0)
+        )
+        summary['rss_mb'] = round(rss_mb(), 1)
+        summary['status'] = sorted(statuses)
+        return summary
+
+
+class ClientRunner(Runner):
+    """Запросы через ``django.test.Client`` в том же потоке."""
+
+    def start(self):
+        self.clients = {'anonymous': Client(), 'user': Client()}
+        self.clients['user'].force_login(self.user)
+
+    def get(self, role, address):
+        try:
+            return self.clients[role].get(address).status_code
+        except Exception:
+            # Тестовый клиент пробрасывает исключения view, сервер бы
+            # ответил 500.
+            return 500
+
+
+class WSGIRunner(Runner):
+    """Запросы по HTTP к многопоточному WSGI-серверу Django."""
+
+    def start(self):
+        self.server = ThreadedWSGIServer(
+            ('127.0.0.1', 0), QuietRequestHandler, allow_reuse_address=False
+        )
+        self.server.set_app(WSGIHandler())
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        )
+        self.thread.start()
+        host, port = self.server.server_address
+        self.base = f'http://{host}:{port}'
+        client = Client()
+        client.force_login(self.user)
+        session = client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.sessions = {
+            'anonymous': requests.Session(),
+            'user': requests.Session(),
+        }
+        self.sessions['user'].cookies.set(
+            settings.SESSION_COOKIE_NAME, session
+        )
+
+    def get(self, role, address):
+        response = self.sessions[role].get(
+            self.base + address, allow_redirects=False
+        )
+        return response.status_code
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        for session in self.sessions.values():
+            session.close()
+        # Потоки сервера открывали свои соединения с БД.
+        connections.close_all()
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    # Заголовки и тело уходят разными send(); без TCP_NODELAY ответ
+    # ждёт отложенного ACK клиента (~40 мс).
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+RUNNERS = {'client': ClientRunner, 'wsgi': WSGIRunner}
+
+
+def compare(results, baseline, tolerance=0.2, floor_ms=1.0):
+    """Регрессии относительно сохранённых результатов.
+
+    Задержка считается выросшей, если p95 больше базового на
+    ``tolerance`` и хотя бы на ``floor_ms``; число запросов к БД не
+    должно расти совсем.
+    """
+    regressions = []
+    for key, summary in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        limit = max(base['p95'] * (1 + tolerance), base['p95'] + floor_ms)
+        if summary['p95'] > limit:
+            regressions.append(
+                f'{key}: p95 {summary["p95"]} мс, было {base["p95"]} мс'
+            )
+        if summary['queries'] > base['queries']:
+            regressions.append(
+                f'{key}: запросов к БД {summary["queries"]}, '
+                f'было {base["queries"]}'
+            )
+    return regressions
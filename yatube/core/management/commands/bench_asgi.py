@@ -0,0 +1,225 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import WSGIServer
+from django.db import connections
+from django.test import Client
+
+from core import loadtest
+from core.asgi import ASGIHandler, serve
+
+# Лента, группа, профиль, пост и подписки — маршруты, которые читают
+# больше всего; follow_index открывают только авторизованные.
+ROUTES = (
+    ('posts:index', ()),
+    ('posts:group_list', ('slug',)),
+    ('posts:profile', ('username',)),
+    ('posts:post_detail', ('post_id',)),
+)
+USER_ROUTES = ROUTES + (('posts:follow_index', ()),)
+
+
+class PooledWSGIServer(WSGIServer):
+    """WSGI-сервер с фиксированным пулом потоков, как воркер gunicorn
+    с ``--threads``: keep-alive соединение держит поток до закрытия."""
+
+    request_queue_size = 128
+
+    def __init__(self, address, threads):
+        super().__init__(
+            address, loadtest.QuietRequestHandler, allow_reuse_address=False
+        )
+        self.executor = ThreadPoolExecutor(threads)
+        self.set_app(WSGIHandler())
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process, request, client_address)
+
+    def process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class WSGIServerThread:
+    def __init__(self, threads):
+        self.server = PooledWSGIServer(('127.0.0.1', 0), threads)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        )
+
+    def __enter__(self):
+        self.thread.start()
+        return 'http://127.0.0.1:%s' % self.server.server_address[1]
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+        self.server.executor.shutdown(wait=True)
+        self.thread.join()
+
+
+class ASGIServerThread:
+    def __init__(self, threads):
+        self.application = ASGIHandler(threads)
+        self.started = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        self.task = self.loop.create_task(
+            serve(self.application, port=0, started=self.on_start)
+        )
+        try:
+            self.loop.run_until_complete(self.task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.loop.close()
+
+    def on_start(self, address):
+        self.address = address
+        self.started.set()
+
+    def __enter__(self):
+        self.thread.start()
+        self.started.wait()
+        return 'http://%s:%s' % self.address
+
+    def __exit__(self, *exc_info):
+        self.loop.call_soon_threadsafe(self.task.cancel)
+        self.thread.join()
+        self.application.executor.shutdown(wait=True)
+
+
+SERVERS = {'wsgi': WSGIServerThread, 'asgi': ASGIServerThread}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность ленты под WSGI и ASGI при '
+        'множестве одновременных keep-alive соединений на одних данных'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--comments', type=int, default=4000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--connections',
+            type=int,
+            action='append',
+            help='Одновременных соединений; можно несколько',
+        )
+        parser.add_argument(
+            '--threads', type=int, default=8, help='Потоков у обоих серверов'
+        )
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument(
+            '--think-ms',
+            type=float,
+            default=20,
+            help='Пауза клиента между запросами в соединении',
+        )
+        parser.add_argument(
+            '--server', choices=sorted(SERVERS), action='append'
+        )
+
+    def handle(self, *args, **options):
+        with loadtest.temporary_site():
+            loadtest.seed(
+                users=options['users'],
+                posts=options['posts'],
+                comments=options['comments'],
+                images=0,
+                random_seed=options['seed'],
+            )
+            runner = loadtest.ClientRunner(seed=options['seed'])
+            client = Client()
+            client.force_login(runner.user)
+            session = client.cookies[settings.SESSION_COOKIE_NAME].value
+            connections.close_all()
+            self.stdout.write(
+                f'{"сервер":<6} {"соединений":>10} {"запросов/с":>11} '
+                f'{"p50":>8} {"p95":>8} {"p99":>8} {"ошибок":>7}'
+            )
+            for count in options['connections'] or [8, 64]:
+                for name in options['server'] or sorted(SERVERS):
+                    with SERVERS[name](options['threads']) as base:
+                        result = self.load(
+                            base, runner, session, count, options
+                        )
+                    connections.close_all()
+                    self.write_row(name, count, result, options['seconds'])
+
+    def plan(self, runner, index, authorized, seed):
+        """Одинаковая для обоих серверов последовательность адресов."""
+        runner.rng = random.Random(f'{seed}:{index}')
+        routes = USER_ROUTES if authorized else ROUTES
+        return [
+            runner.address(*runner.rng.choice(routes)) for _ in range(500)
+        ]
+
+    def load(self, base, runner, session, count, options):
+        plans = [
+            self.plan(runner, index, index % 2 == 1, options['seed'])
+            for index in range(count)
+        ]
+        latencies = []
+        errors = []
+        deadline = time.perf_counter() + options['seconds']
+        think = options['think_ms'] / 1000
+
+        def connection(index):
+            addresses = plans[index]
+            with requests.Session() as http:
+                # Половина соединений — авторизованный пользователь.
+                if index % 2 == 1:
+                    http.cookies.set(settings.SESSION_COOKIE_NAME, session)
+                position = 0
+                while time.perf_counter() < deadline:
+                    address = addresses[position % len(addresses)]
+                    position += 1
+                    started = time.perf_counter()
+                    try:
+                        response = http.get(
+                            base + address, allow_redirects=False, timeout=30
+                        )
+                    except requests.RequestException as error:
+                        errors.append(error)
+                        continue
+                    if response.status_code >= 500:
+                        errors.append(response.status_code)
+                        continue
+                    latencies.append(time.perf_counter() - started)
+                    time.sleep(think)
+
+        threads = [
+            threading.Thread(target=connection, args=(index,))
+            for index in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, errors
+
+    def write_row(self, name, count, result, seconds):
+        latencies, errors = result
+        summary = loadtest.summarize(latencies, 0, 1)
+        self.stdout.write(
+            f'{name:<6} {count:>10} {len(latencies) / seconds:>11,.1f} '
+            f'{summary["p50"]:>8.1f} {summary["p95"]:>8.1f} '
+            f'{summary["p99"]:>8.1f} {len(errors):>7}'
+        )
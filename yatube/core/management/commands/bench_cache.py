@@ -0,0 +1,77 @@
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'sqlite': 'core.cache_backends.SQLiteCache',
+}
+
+
+def run_worker(backend, location, keys, operations, seed, queue):
+    """Читает ключи с распределением Ципфа, промах дорисовывает и кладёт."""
+    cache = import_string(BACKENDS[backend])(
+        location, {'TIMEOUT': None, 'OPTIONS': {'MAX_ENTRIES': keys * 2}}
+    )
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, keys + 1)]
+    chosen = rng.choices(range(keys), weights=weights, k=operations)
+    hits = 0
+    started = time.perf_counter()
+    for key in chosen:
+        if cache.get(f'fragment:{key}') is None:
+            cache.set(f'fragment:{key}', 'x' * 2048)
+        else:
+            hits += 1
+    queue.put((hits, time.perf_counter() - started))
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает долю попаданий кэша в нескольких процессах-воркерах'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--keys', type=int, default=2000)
+        parser.add_argument('--operations', type=int, default=20000)
+        parser.add_argument(
+            '--backend', choices=sorted(BACKENDS), action='append'
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        for backend in options['backend'] or sorted(BACKENDS):
+            with tempfile.TemporaryDirectory() as directory:
+                location = os.path.join(directory, 'cache.sqlite3')
+                queue = multiprocessing.Queue()
+                processes = [
+                    multiprocessing.Process(
+                        target=run_worker,
+                        args=(
+                            backend,
+                            location,
+                            options['keys'],
+                            options['operations'],
+                            seed,
+                            queue,
+                        ),
+                    )
+                    for seed in range(workers)
+                ]
+                for process in processes:
+                    process.start()
+                results = [queue.get() for _ in processes]
+                for process in processes:
+                    process.join()
+            hits = sum(hits for hits, _ in results)
+            elapsed = max(elapsed for _, elapsed in results)
+            total = options['operations'] * workers
+            self.stdout.write(
+                f'{backend:>8}: воркеров {workers}, '
+                f'попаданий {hits / total:.1%}, '
+                f'{total / elapsed:,.0f} операций/с'
+            )
@@ -0,0 +1,233 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.core.signals import got_request_exception
+from django.db import OperationalError, connections
+from django.db.backends.signals import connection_created
+from django.test import Client, RequestFactory
+from django.urls import reverse
+
+from core import loadtest
+from posts.models import Post
+
+User = get_user_model()
+
+# До: SQLite и Django по умолчанию; после: режим производительности.
+MODES = {'default': '0', 'tuned': '1'}
+CSRF_SECRET = 'b' * 32
+
+
+def run_worker(username, seconds, write_ratio, seed, queue):
+    """Шлёт запросы прямо в ``WSGIHandler``, как воркер gunicorn.
+
+    Считает успешные ответы, ошибки «database is locked» и открытые
+    соединения с базой.
+    """
+    logging.disable(logging.CRITICAL)
+    opened = []
+    failures = []
+    connection_created.connect(
+        lambda sender, connection, **kwargs: opened.append(connection.alias),
+        weak=False,
+    )
+    got_request_exception.connect(
+        lambda sender, **kwargs: failures.append(sys.exc_info()[1]),
+        weak=False,
+    )
+    rng = random.Random(seed)
+    client = Client()
+    client.force_login(User.objects.get(username=username))
+    factory = RequestFactory()
+    factory.cookies = client.cookies
+    factory.cookies[settings.CSRF_COOKIE_NAME] = CSRF_SECRET
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    authors = list(
+        User.objects.exclude(username=username)
+        .values_list('username', flat=True)
+    )
+    handler = WSGIHandler()
+    stats = {
+        kind: {'ok': 0, 'locked': 0, 'errors': 0, 'latencies': []}
+        for kind in ('read', 'write')
+    }
+    connections.close_all()
+    opened.clear()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        if rng.random() < write_ratio:
+            kind = 'write'
+            if rng.random() < 0.5:
+                address = reverse(
+                    'posts:add_comment', args=[rng.choice(post_ids)]
+                )
+            else:
+                action = rng.choice(('profile_follow', 'profile_unfollow'))
+                address = reverse(
+                    f'posts:{action}', args=[rng.choice(authors)]
+                )
+            request = factory.post(
+                address,
+                {
+                    'text': f'Комментарий {seed}',
+                    'csrfmiddlewaretoken': CSRF_SECRET,
+                },
+            )
+        else:
+            kind = 'read'
+            request = factory.get(reverse('posts:index'))
+        failures.clear()
+        started = time.perf_counter()
+        response = handler(request.environ, lambda status, headers: None)
+        b''.join(response)
+        # Как сервер: close() шлёт request_finished, и Django закрывает
+        # соединения старше CONN_MAX_AGE.
+        response.close()
+        elapsed = time.perf_counter() - started
+        # 403, 404 и 429 — тоже несостоявшиеся записи, а не успехи.
+        if 200 <= response.status_code < 400:
+            stats[kind]['ok'] += 1
+            stats[kind]['latencies'].append(elapsed)
+        elif any(
+            isinstance(error, OperationalError) and 'locked' in str(error)
+            for error in failures
+        ):
+            stats[kind]['locked'] += 1
+        else:
+            stats[kind]['errors'] += 1
+    connections.close_all()
+    queue.put((stats, len(opened)))
+
+
+class Command(BaseCommand):
+    help = (
+        'Конкурентная нагрузка чтением и записью на временной базе SQLite: '
+        'доля ошибок «database is locked» и пропускная способность записи '
+        'с настройками по умолчанию и в режиме SQLITE_PERFORMANCE'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument(
+            '--seconds', type=float, default=5, help='Длительность прогона'
+        )
+        parser.add_argument(
+            '--write-ratio', type=float, default=0.5, help='Доля записей'
+        )
+        parser.add_argument('--mode', choices=sorted(MODES), action='append')
+        # Один режим в этом процессе, результат — JSON в stdout.
+        parser.add_argument(
+            '--json', action='store_true', help=argparse.SUPPRESS
+        )
+
+    def handle(self, *args, **options):
+        if options['json']:
+            self.stdout.write(json.dumps(self.run_mode(options)))
+            return
+        self.stdout.write(
+            f'{"режим":<8} {"записей/с":>10} {"блокировок":>11} '
+            f'{"запись p95":>11} {"чтений/с":>9} {"чтение p95":>11} '
+            f'{"соединений":>10}'
+        )
+        for mode in options['mode'] or MODES:
+            self.write_row(mode, self.run_child(mode, options), options)
+
+    def run_child(self, mode, options):
+        # Движок базы и прагмы выбираются при загрузке настроек, поэтому
+        # каждый режим — отдельный процесс со своим SQLITE_PERFORMANCE.
+        output = subprocess.run(
+            [
+                sys.executable,
+                os.path.join(settings.BASE_DIR, 'manage.py'),
+                'bench_sqlite',
+                '--json',
+                '--workers', str(options['workers']),
+                '--seconds', str(options['seconds']),
+                '--write-ratio', str(options['write_ratio']),
+            ],
+            env={**os.environ, 'SQLITE_PERFORMANCE': MODES[mode]},
+            stdout=subprocess.PIPE,
+            check=True,
+        ).stdout
+        return json.loads(output)
+
+    def run_mode(self, options):
+        with loadtest.temporary_site():
+            return self.run_workers(options)
+
+    def run_workers(self, options):
+        workers = options['workers']
+        loadtest.seed(
+            users=max(workers * 2, 20),
+            groups=2,
+            posts=200,
+            follows=3,
+            comments=0,
+            images=0,
+        )
+        usernames = list(
+            User.objects.order_by('pk')[:workers]
+            .values_list('username', flat=True)
+        )
+        # Процессы наследуют настройки при fork, но не соединения.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        queue = context.Queue()
+        processes = [
+            context.Process(
+                target=run_worker,
+                args=(
+                    username,
+                    options['seconds'],
+                    options['write_ratio'],
+                    seed,
+                    queue,
+                ),
+            )
+            for seed, username in enumerate(usernames)
+        ]
+        for process in processes:
+            process.start()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+        return results
+
+    def write_row(self, mode, results, options):
+        seconds = options['seconds']
+        totals = {}
+        for kind in ('read', 'write'):
+            ok = sum(stats[kind]['ok'] for stats, _ in results)
+            failed = sum(
+                stats[kind]['locked'] + stats[kind]['errors']
+                for stats, _ in results
+            )
+            locked = sum(stats[kind]['locked'] for stats, _ in results)
+            latencies = [
+                latency
+                for stats, _ in results
+                for latency in stats[kind]['latencies']
+            ]
+            totals[kind] = {
+                'rate': ok / seconds,
+                'locked': locked / max(ok + failed, 1),
+                'p95': loadtest.summarize(latencies, 0, 1)['p95'],
+            }
+        opened = sum(count for _, count in results)
+        self.stdout.write(
+            f'{mode:<8} {totals["write"]["rate"]:>10,.1f} '
+            f'{totals["write"]["locked"]:>11.1%} '
+            f'{totals["write"]["p95"]:>8.1f} мс '
+            f'{totals["read"]["rate"]:>9,.1f} '
+            f'{totals["read"]["p95"]:>8.1f} мс {opened:>10}'
+        )
@@ -0,0 +1,67 @@
+import sys
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from core.dumps import export
+
+# Производные таблицы: import_dump собирает их заново.
+DERIVED = ('posts.feedentry', 'posts.suggestion', 'posts.userstats')
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково выгружает модели в JSON-фикстуру, читая строки через '
+        'iterator(); объекты идут в порядке внешних ключей'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'labels', nargs='*', help='app_label или app_label.Model'
+        )
+        parser.add_argument('-o', '--output', help='Файл вместо stdout')
+        parser.add_argument(
+            '-e', '--exclude', action='append', default=[]
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def get_models(self, labels, exclude):
+        models = []
+        try:
+            for label in labels:
+                if '.' in label:
+                    models.append(apps.get_model(label))
+                else:
+                    models += self.app_models(apps.get_app_config(label))
+        except LookupError as error:
+            raise CommandError(error)
+        if not labels:
+            for app_config in apps.get_app_configs():
+                models += self.app_models(app_config)
+        return [
+            model for model in models
+            if model._meta.label_lower not in exclude
+            and model._meta.app_label not in exclude
+        ]
+
+    def app_models(self, app_config):
+        return [
+            model for model in app_config.get_models()
+            if not model._meta.proxy
+            and model._meta.label_lower not in DERIVED
+        ]
+
+    def handle(self, *args, **options):
+        models = self.get_models(
+            options['labels'],
+            {label.lower() for label in options['exclude']},
+        )
+        output = options['output']
+        stream = open(output, 'w', encoding='utf-8') if output else sys.stdout
+        try:
+            report = export(stream, models, options['chunk_size'])
+        finally:
+            if output:
+                stream.close()
+        for line in report.lines():
+            self.stderr.write(line)
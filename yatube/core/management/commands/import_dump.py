@@ -0,0 +1,67 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from core.dumps import Importer
+from posts import search
+from posts.cache import bump_generation
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково загружает JSON-фикстуру: bulk_create по моделям в '
+        'порядке внешних ключей вместо построчного loaddata'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument(
+            '--commit-every',
+            type=int,
+            default=100000,
+            help='Объектов модели в одной транзакции',
+        )
+        parser.add_argument(
+            '-e',
+            '--exclude',
+            action='append',
+            default=[],
+            help='Приложение или модель (app_label.model), которые пропустить',
+        )
+        parser.add_argument(
+            '--ignore-conflicts',
+            action='store_true',
+            help='Пропускать объекты, которые уже есть в базе',
+        )
+        parser.add_argument(
+            '--no-rebuild',
+            action='store_true',
+            help=(
+                'Не пересчитывать счётчики, ленты, рекомендации и поисковый '
+                'индекс'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        importer = Importer(
+            batch_size=options['batch_size'],
+            commit_every=options['commit_every'],
+            exclude=[label.lower() for label in options['exclude']],
+            ignore_conflicts=options['ignore_conflicts'],
+        )
+        with open(options['path'], encoding='utf-8') as stream:
+            importer.load(stream)
+        for line in importer.report.lines():
+            self.stdout.write(line)
+        if not options['no_rebuild']:
+            self.rebuild()
+
+    def rebuild(self):
+        # bulk_create не шлёт сигналов, поэтому производные данные
+        # собираются заново одним проходом.
+        call_command('recount_stats', stdout=self.stdout)
+        call_command('rebuild_feeds', stdout=self.stdout)
+        call_command('rebuild_suggestions', stdout=self.stdout)
+        if search.is_available():
+            call_command('rebuild_search_index', stdout=self.stdout)
+        bump_generation()
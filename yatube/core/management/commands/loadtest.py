@@ -0,0 +1,131 @@
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон маршрутов posts, users и about на временной '
+        'базе с синтетическими данными; сравнение с сохранённой базовой '
+        'линией'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument(
+            '--follows', type=int, default=20, help='Подписок на пользователя'
+        )
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--images', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--requests', type=int, default=50, help='Запросов на маршрут'
+        )
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--mode',
+            choices=sorted(loadtest.RUNNERS),
+            action='append',
+            help='client — тестовый клиент, wsgi — HTTP-сервер',
+        )
+        parser.add_argument(
+            '--route', action='append', help='Только эти маршруты'
+        )
+        parser.add_argument(
+            '--baseline',
+            default=os.path.join(settings.BASE_DIR, 'loadtest-baseline.json'),
+        )
+        parser.add_argument(
+            '--save-baseline',
+            action='store_true',
+            help='Записать результаты как новую базовую линию',
+        )
+        parser.add_argument('--tolerance', type=float, default=0.2)
+
+    def handle(self, *args, **options):
+        with loadtest.temporary_site():
+            results = self.run(options)
+        self.report_baseline(results, options)
+
+    def run(self, options):
+        started = time.perf_counter()
+        dataset = loadtest.seed(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            follows=options['follows'],
+            comments=options['comments'],
+            images=options['images'],
+            random_seed=options['seed'],
+        )
+        self.stdout.write(
+            'Данные: '
+            + ', '.join(f'{key} {value}' for key, value in dataset.items())
+            + f'; заполнение {time.perf_counter() - started:.1f} с'
+        )
+        results = {'dataset': dataset}
+        for mode in options['mode'] or sorted(loadtest.RUNNERS):
+            runner = loadtest.RUNNERS[mode](
+                requests_per_route=options['requests'],
+                warmup=options['warmup'],
+                seed=options['seed'],
+            )
+            results[mode] = runner.run(options['route'])
+            self.write_table(mode, results[mode])
+        return results
+
+    def write_table(self, mode, summaries):
+        self.stdout.write(
+            f'\n{mode}\n{"маршрут":<40} {"p50":>8} {"p95":>8} {"p99":>8} '
+            f'{"SQL":>6} {"RSS МБ":>8}  статус'
+        )
+        for key, summary in summaries.items():
+            self.stdout.write(
+                f'{key:<40} {summary["p50"]:>8.2f} {summary["p95"]:>8.2f} '
+                f'{summary["p99"]:>8.2f} {summary["queries"]:>6.1f} '
+                f'{summary["rss_mb"]:>8.1f}  '
+                + ','.join(map(str, summary['status']))
+            )
+            if any(status >= 500 for status in summary['status']):
+                self.stderr.write(f'{key}: ошибка сервера')
+
+    def report_baseline(self, results, options):
+        path = options['baseline']
+        if options['save_baseline']:
+            with open(path, 'w') as baseline_file:
+                json.dump(results, baseline_file, indent=2, sort_keys=True)
+            self.stdout.write(f'\nБазовая линия сохранена в {path}')
+            return
+        if not os.path.exists(path):
+            self.stdout.write(
+                f'\nБазовой линии {path} нет; сохраните её --save-baseline'
+            )
+            return
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get('dataset') != results['dataset']:
+            self.stderr.write(
+                'Базовая линия снята на других данных, сравнение неточно'
+            )
+        regressions = []
+        for mode in loadtest.RUNNERS:
+            if mode in results and mode in baseline:
+                regressions += [
+                    f'{mode} {line}'
+                    for line in loadtest.compare(
+                        results[mode], baseline[mode], options['tolerance']
+                    )
+                ]
+        if regressions:
+            raise CommandError(
+                'Регрессии относительно базовой линии:\n'
+                + '\n'.join(regressions)
+            )
+        self.stdout.write('\nРегрессий относительно базовой линии нет')
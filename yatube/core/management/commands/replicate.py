@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.db_router import replicate
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу в реплики из DATABASE_REPLICAS; '
+        'с --interval повторяет копирование, имитируя отставание реплик'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Секунд между копиями; 0 — скопировать один раз',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError(
+                'Реплики не настроены: задайте DATABASE_REPLICAS'
+            )
+        while True:
+            started = time.perf_counter()
+            paths = replicate()
+            self.stdout.write(
+                f'Скопировано в {", ".join(paths)} '
+                f'за {time.perf_counter() - started:.2f} с'
+            )
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
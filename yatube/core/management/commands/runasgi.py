@@ -0,0 +1,34 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from core.asgi import ASGIHandler, serve
+
+
+class Command(BaseCommand):
+    help = 'Запускает yatube в ASGI-режиме на встроенном HTTP/1.1-сервере'
+
+    def add_arguments(self, parser):
+        parser.add_argument('addrport', nargs='?', default='127.0.0.1:8000')
+        parser.add_argument(
+            '--threads',
+            type=int,
+            help='Потоков пула, по умолчанию ASGI_THREADS',
+        )
+
+    def handle(self, *args, **options):
+        host, _, port = options['addrport'].rpartition(':')
+        application = ASGIHandler(options['threads'])
+        try:
+            asyncio.run(
+                serve(
+                    application,
+                    host or '127.0.0.1',
+                    int(port),
+                    started=lambda address: self.stdout.write(
+                        'ASGI: http://%s:%s/' % address
+                    ),
+                )
+            )
+        except KeyboardInterrupt:
+            pass
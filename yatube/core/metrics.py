@@ -0,0 +1,159 @@
+"""Метрики запросов: число и время SQL, время шаблонов, задержка.
+
+Значения копятся в памяти процесса по имени view и отдаются в текстовом
+формате Prometheus (``/metrics/``) или пишутся в лог ``yatube.metrics``
+по одной JSON-записи на запрос. У каждого процесса gunicorn свои
+счётчики, суммирует их Prometheus по метке ``instance``.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+# Верхние границы корзин гистограммы задержки, в секундах.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+_local = threading.local()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """View сделал больше SQL-запросов, чем объявил в ``query_budget``."""
+
+
+def query_budget(queries):
+    """Объявляет для view предельное число SQL-запросов на запрос.
+
+    Бюджет считает все запросы, включая сессию и пользователя, и
+    проверяется ``MetricsMiddleware``.
+    """
+    def decorator(view_func):
+        view_func.query_budget = queries
+        return view_func
+
+    return decorator
+
+
+class RequestMetrics:
+    """Замеры одного запроса; SQL и шаблоны дописываются по ходу."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.total_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Обёртка для connection.execute_wrapper.
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_seconds += time.perf_counter() - started
+
+    def finish(self):
+        self.total_seconds = time.perf_counter() - self.started
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'sql_ms': round(self.sql_seconds * 1000, 3),
+            'template_ms': round(self.template_seconds * 1000, 3),
+            'total_ms': round(self.total_seconds * 1000, 3),
+        }
+
+
+def current():
+    """Замеры текущего запроса или None вне ``MetricsMiddleware``."""
+    return getattr(_local, 'metrics', None)
+
+
+def activate(metrics):
+    _local.metrics = metrics
+
+
+def deactivate():
+    _local.metrics = None
+
+
+class Registry:
+    """Накопленные по view счётчики процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._views = defaultdict(lambda: {
+                'requests': 0,
+                'queries': 0,
+                'sql_seconds': 0.0,
+                'template_seconds': 0.0,
+                'total_seconds': 0.0,
+                'budget_exceeded': 0,
+                'buckets': [0] * len(LATENCY_BUCKETS),
+            })
+
+    def observe(self, view, metrics, over_budget=False):
+        with self._lock:
+            stats = self._views[view]
+            stats['requests'] += 1
+            stats['queries'] += metrics.queries
+            stats['sql_seconds'] += metrics.sql_seconds
+            stats['template_seconds'] += metrics.template_seconds
+            stats['total_seconds'] += metrics.total_seconds
+            stats['budget_exceeded'] += over_budget
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if metrics.total_seconds <= bound:
+                    stats['buckets'][i] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                view: {**stats, 'buckets': list(stats['buckets'])}
+                for view, stats in self._views.items()
+            }
+
+    def render(self):
+        """Счётчики в текстовом формате экспозиции Prometheus."""
+        prefix = settings.METRICS_PREFIX
+        counters = (
+            ('requests', 'requests_total', 'Обработано запросов'),
+            ('queries', 'sql_queries_total', 'Выполнено SQL-запросов'),
+            ('sql_seconds', 'sql_seconds_total', 'Время SQL'),
+            ('template_seconds', 'template_seconds_total', 'Время шаблонов'),
+            (
+                'budget_exceeded',
+                'query_budget_exceeded_total',
+                'Запросы сверх бюджета SQL',
+            ),
+        )
+        snapshot = self.snapshot()
+        lines = []
+        for key, name, help_text in counters:
+            lines.append(f'# HELP {prefix}_{name} {help_text}')
+            lines.append(f'# TYPE {prefix}_{name} counter')
+            for view, stats in sorted(snapshot.items()):
+                lines.append(f'{prefix}_{name}{{view="{view}"}} {stats[key]}')
+        name = f'{prefix}_request_seconds'
+        lines.append(f'# HELP {name} Полное время обработки запроса')
+        lines.append(f'# TYPE {name} histogram')
+        for view, stats in sorted(snapshot.items()):
+            for bound, count in zip(LATENCY_BUCKETS, stats['buckets']):
+                lines.append(
+                    f'{name}_bucket{{view="{view}",le="{bound}"}} {count}'
+                )
+            lines.append(
+                f'{name}_bucket{{view="{view}",le="+Inf"}} {stats["requests"]}'
+            )
+            lines.append(
+                f'{name}_sum{{view="{view}"}} {stats["total_seconds"]}'
+            )
+            lines.append(f'{name}_count{{view="{view}"}} {stats["requests"]}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
@@ -0,0 +1,99 @@
+import json
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import db_router, metrics
+
+logger = logging.getLogger('yatube.metrics')
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class MetricsMiddleware:
+    """Замеряет SQL, шаблоны и задержку каждого запроса по имени view.
+
+    Если view превысил объявленный ``query_budget``, это пишется в лог,
+    а при ``QUERY_BUDGET_RAISE`` (в тестах) поднимается исключение.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics = metrics.RequestMetrics()
+        metrics.activate(request_metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(request_metrics)
+                    )
+                response = self.get_response(request)
+        finally:
+            metrics.deactivate()
+        request_metrics.finish()
+        self.record(request, response, request_metrics)
+        return response
+
+    def record(self, request, response, request_metrics):
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        budget = getattr(match.func, 'query_budget', None) if match else None
+        over_budget = budget is not None and request_metrics.queries > budget
+        metrics.registry.observe(view, request_metrics, over_budget)
+        data = {
+            'view': view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **request_metrics.as_dict(),
+        }
+        if over_budget:
+            logger.warning(
+                'query budget exceeded: %s',
+                json.dumps({**data, 'budget': budget}),
+            )
+            if settings.QUERY_BUDGET_RAISE:
+                raise metrics.QueryBudgetExceeded(
+                    f'{view}: {request_metrics.queries} SQL-запросов '
+                    f'при бюджете {budget}'
+                )
+        elif settings.METRICS_LOG:
+            logger.info(json.dumps(data))
+
+
+class ReplicaRoutingMiddleware:
+    """Разрешает запросу читать с реплик, если он не пишет.
+
+    Небезопасные методы, view с ``@use_primary`` и браузеры с недавней
+    записью (кука ``REPLICA_PIN_COOKIE``) читают из основной базы.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        db_router.start_request(
+            pinned=request.method not in SAFE_METHODS
+            or settings.REPLICA_PIN_COOKIE in request.COOKIES
+        )
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = db_router.end_request()
+        if wrote:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(view_func, 'use_primary', False):
+            db_router.pin()
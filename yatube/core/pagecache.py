@@ -0,0 +1,170 @@
+"""Кэш целых страниц для читателей без входа.
+
+Страница для анонимного читателя одинакова у всех, поэтому ответ view
+целиком (тело и заголовки) кладётся в кэш по хосту и пути с query.
+Повторный запрос отдаётся из кэша без SQL, сессии и шаблонов.
+
+Запрос с кукой сессии или сообщений идёт мимо кэша: такой посетитель
+может быть вошедшим или видеть свои сообщения. Не сохраняются ответы
+не 200, потоковые и использовавшие CSRF-токен. Ключ включает версию от
+``version()`` — у лент это поколение ``posts.cache``, и запись в посты,
+комментарии или группы сразу делает старые страницы недоступными.
+"""
+import hashlib
+import threading
+from collections import defaultdict
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import parse_http_date_safe
+
+# Заголовки, которые в кэше не хранятся: их ставит middleware заново.
+SKIP_HEADERS = frozenset(('set-cookie', 'vary'))
+
+
+class Stats:
+    """Попадания, промахи и сэкономленные байты по view процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._requests = defaultdict(int)
+            self._bytes = defaultdict(int)
+
+    def observe(self, view, result, size=0):
+        with self._lock:
+            self._requests[view, result] += 1
+            self._bytes[view] += size
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._requests), dict(self._bytes)
+
+    def render(self):
+        """Счётчики в текстовом формате экспозиции Prometheus."""
+        prefix = f'{settings.METRICS_PREFIX}_page_cache'
+        requests, saved = self.snapshot()
+        lines = [
+            f'# HELP {prefix}_requests_total Запросы к кэшу страниц',
+            f'# TYPE {prefix}_requests_total counter',
+        ]
+        for (view, result), count in sorted(requests.items()):
+            lines.append(
+                f'{prefix}_requests_total{{view="{view}",result="{result}"}} '
+                f'{count}'
+            )
+        lines += [
+            f'# HELP {prefix}_bytes_saved_total Байты, отданные из кэша',
+            f'# TYPE {prefix}_bytes_saved_total counter',
+        ]
+        for view, size in sorted(saved.items()):
+            lines.append(
+                f'{prefix}_bytes_saved_total{{view="{view}"}} {size}'
+            )
+        lines += [
+            f'# HELP {prefix}_hit_ratio Доля попаданий среди запросов к кэшу',
+            f'# TYPE {prefix}_hit_ratio gauge',
+        ]
+        for view in sorted({view for view, _ in requests}):
+            hits = requests.get((view, 'hit'), 0)
+            looked_up = hits + requests.get((view, 'miss'), 0)
+            if looked_up:
+                lines.append(
+                    f'{prefix}_hit_ratio{{view="{view}"}} '
+                    f'{hits / looked_up:.4f}'
+                )
+        return '\n'.join(lines) + '\n'
+
+
+stats = Stats()
+
+
+def _cache():
+    return caches[settings.PAGE_CACHE_ALIAS]
+
+
+def _bypass(request):
+    return (
+        not settings.PAGE_CACHE_ENABLED
+        or request.method not in ('GET', 'HEAD')
+        or any(
+            name in request.COOKIES
+            for name in settings.PAGE_CACHE_BYPASS_COOKIES
+        )
+    )
+
+
+def _storable(request, response):
+    return (
+        request.method == 'GET'
+        and response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_USED')
+    )
+
+
+def _key(request, version):
+    parts = (version, request.get_host(), request.get_full_path())
+    return 'page:' + hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def _restore(request, entry):
+    content, headers = entry
+    headers = dict(headers)
+    last_modified = parse_http_date_safe(headers.get('Last-Modified', ''))
+    response = get_conditional_response(
+        request, etag=headers.get('ETag'), last_modified=last_modified
+    )
+    if response is None:
+        response = HttpResponse(content)
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+def anonymous_page(version):
+    """Кэширует страницы view для читателей без сессии.
+
+    ``version`` — функция без аргументов; смена её значения сбрасывает
+    все сохранённые страницы.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            view = request.resolver_match.view_name
+            if _bypass(request):
+                stats.observe(view, 'bypass')
+                return view_func(request, *args, **kwargs)
+            key = _key(request, version())
+            entry = _cache().get(key)
+            if entry is not None:
+                response = _restore(request, entry)
+                stats.observe(view, 'hit', len(entry[0]))
+            else:
+                response = view_func(request, *args, **kwargs)
+                stats.observe(view, 'miss')
+                if _storable(request, response):
+                    headers = [
+                        (name, value) for name, value in response.items()
+                        if name.lower() not in SKIP_HEADERS
+                    ]
+                    _cache().set(
+                        key,
+                        (response.content, headers),
+                        settings.PAGE_CACHE_TIMEOUT,
+                    )
+            # Вошедшим нужна другая страница: промежуточные кэши должны
+            # различать ответы по кукам.
+            patch_vary_headers(response, ('Cookie',))
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,230 @@
+"""Ограничение частоты записи: корзина токенов на пользователя и на IP.
+
+Лимит ``"N/период"`` из ``RATE_LIMITS`` — корзина на N токенов, которая
+наполняется N токенами за период (``s``, ``m``, ``h``, ``d``): можно
+сделать N записей подряд, а дальше — не чаще, чем корзина наполняется.
+Пустая корзина даёт ответ 429 с ``Retry-After`` ещё до транзакции
+view, так что отклонённый запрос не берёт блокировку записи SQLite.
+Токен берётся сразу из всех корзин запроса или ни из одной: запрос,
+отклонённый по IP, не тратит токен пользователя. Корзина IP — по адресу
+клиента из ``core.http.client_ip``, с учётом доверенных прокси.
+
+Состояние корзин хранит ``RATE_LIMIT_BACKEND``: ``CacheBackend`` — в
+общем кэше Django, его видят все воркеры; ``LocalBackend`` — в памяти
+процесса, без обращений к кэшу, но у каждого воркера свои корзины.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from functools import lru_cache, wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.shortcuts import render
+from django.utils.module_loading import import_string
+
+from .http import client_ip
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+class RateLimited(Exception):
+    """Корзина пуста; повторить можно через ``retry_after`` секунд."""
+
+    def __init__(self, scope, retry_after):
+        super().__init__(f'{scope}: повторите через {retry_after} с')
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+def parse_rate(rate):
+    """``"10/m"`` -> (10 токенов в корзине, 10 / 60 токена в секунду)."""
+    count, _, period = rate.partition('/')
+    count = int(count)
+    return count, count / PERIODS[period]
+
+
+def take(state, now, capacity, refill):
+    """Шаг корзины токенов.
+
+    ``state`` — (токенов, время) или None для новой корзины. Возвращает
+    новое состояние и 0, если токен взят, или сколько секунд ждать,
+    пока он появится.
+    """
+    tokens, updated = state or (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * refill)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), math.ceil((1 - tokens) / refill)
+
+
+def take_all(states, now, buckets):
+    """Шаг нескольких корзин: токен берётся из всех или ни из одной.
+
+    ``buckets`` — пары (ёмкость, скорость) для ``states``. Возвращает
+    новые состояния (None, если хоть одна корзина пуста) и сколько
+    секунд ждать каждой корзины.
+    """
+    results = [
+        take(state, now, capacity, refill)
+        for state, (capacity, refill) in zip(states, buckets)
+    ]
+    waits = [retry_after for _, retry_after in results]
+    if any(waits):
+        return None, waits
+    return [state for state, _ in results], waits
+
+
+class LocalBackend:
+    """Корзины в памяти процесса; самые давние вытесняются."""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, keys, buckets):
+        with self._lock:
+            states = [self._buckets.pop(key, None) for key in keys]
+            taken, waits = take_all(states, time.monotonic(), buckets)
+            for key, state in zip(keys, taken or states):
+                if state is not None:
+                    self._buckets[key] = state
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return waits
+
+
+class CacheBackend:
+    """Корзины в кэше Django, общие для всех воркеров.
+
+    Чтение и запись состояния не атомарны: одновременные запросы с одним
+    ключом из разных процессов могут изредка взять на токен больше.
+    """
+
+    def __init__(self, alias=None):
+        self.alias = alias or settings.RATE_LIMIT_CACHE_ALIAS
+
+    def consume(self, keys, buckets):
+        cache = caches[self.alias]
+        stored = cache.get_many(keys)
+        taken, waits = take_all(
+            [stored.get(key) for key in keys], time.time(), buckets
+        )
+        for key, state, (capacity, refill) in zip(
+            keys, taken or (), buckets
+        ):
+            # Полная корзина и отсутствующий ключ — одно и то же.
+            cache.set(key, state, math.ceil(capacity / refill))
+        return waits
+
+
+@lru_cache(maxsize=None)
+def _backend(path):
+    return import_string(path)()
+
+
+def backend():
+    return _backend(settings.RATE_LIMIT_BACKEND)
+
+
+class Stats:
+    """Счётчики пропущенных и отклонённых запросов процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = defaultdict(int)
+
+    def observe(self, scope, limit, allowed):
+        with self._lock:
+            self._counts[scope, limit, allowed] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def render(self):
+        """Счётчики в текстовом формате экспозиции Prometheus."""
+        name = f'{settings.METRICS_PREFIX}_rate_limit_requests_total'
+        lines = [
+            f'# HELP {name} Запросы, проверенные ограничением частоты',
+            f'# TYPE {name} counter',
+        ]
+        for (scope, limit, allowed), count in sorted(self.snapshot().items()):
+            result = 'allowed' if allowed else 'rejected'
+            lines.append(
+                f'{name}{{scope="{scope}",limit="{limit}",'
+                f'result="{result}"}} {count}'
+            )
+        return '\n'.join(lines) + '\n'
+
+
+stats = Stats()
+
+
+def _buckets(request, scope):
+    limits = settings.RATE_LIMITS.get(scope, {})
+    if 'user' in limits and request.user.is_authenticated:
+        yield 'user', f'user:{request.user.pk}', limits['user']
+    if 'ip' in limits:
+        yield 'ip', f'ip:{client_ip(request)}', limits['ip']
+
+
+def consume(request, scope):
+    """Берёт по токену из корзин пользователя и IP для ``scope``.
+
+    Поднимает ``RateLimited``, если хотя бы одна корзина пуста; тогда
+    токены не берутся ни из одной.
+    """
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    buckets = list(_buckets(request, scope))
+    if not buckets:
+        return
+    waits = backend().consume(
+        [f'ratelimit:{scope}:{client}' for _, client, _ in buckets],
+        [parse_rate(rate) for _, _, rate in buckets],
+    )
+    for (limit, _, _), retry_after in zip(buckets, waits):
+        # При отказе учитываются только корзины, которые его вызвали.
+        if not any(waits) or retry_after:
+            stats.observe(scope, limit, not retry_after)
+    if any(waits):
+        raise RateLimited(scope, max(waits))
+
+
+def too_many_requests(request, error):
+    response = render(
+        request,
+        'core/429.html',
+        {'retry_after': error.retry_after},
+        status=429,
+    )
+    response['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def rate_limit(scope, methods=('POST',)):
+    """Ограничивает view лимитами ``RATE_LIMITS[scope]``.
+
+    Считаются только запросы методами ``methods`` (все — при None):
+    показ формы запись не делает.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if methods is None or request.method in methods:
+                try:
+                    consume(request, scope)
+                except RateLimited as error:
+                    return too_many_requests(request, error)
+            return view_func(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,30 @@
+"""Прагмы SQLite для каждого нового соединения Django.
+
+Подключается к сигналу ``connection_created`` в ``CoreConfig.ready``.
+Значения берутся из ``settings.SQLITE_PRAGMAS``: WAL позволяет читать во
+время записи, ``busy_timeout`` заставляет писателя ждать блокировку, а
+не сразу падать с «database is locked», ``mmap_size`` и ``cache_size``
+держат горячие страницы в памяти процесса.
+"""
+from django.conf import settings
+
+# Режим журнала хранится в файле базы, а не в соединении: поменять его
+# может только соединение с правом записи.
+PERSISTENT = {'journal_mode'}
+
+
+def is_read_only(connection):
+    return 'mode=ro' in str(connection.settings_dict['NAME'])
+
+
+def configure(sender, connection, **kwargs):
+    """Выполняет ``PRAGMA`` из ``SQLITE_PRAGMAS`` на новом соединении."""
+    if connection.vendor != 'sqlite':
+        return
+    read_only = is_read_only(connection)
+    # Напрямую в sqlite3, мимо курсора Django: прагмы не должны попадать
+    # в счётчик запросов core.metrics.
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        if read_only and name in PERSISTENT:
+            continue
+        connection.connection.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,23 @@
+"""Бэкенд SQLite, который открывает транзакции ``BEGIN IMMEDIATE``.
+
+Штатный бэкенд начинает ``atomic`` с отложенной транзакции: она берёт
+блокировку на запись только на первом INSERT или UPDATE. Если до этого
+транзакция уже читала, а другой процесс успел записать, SQLite не ждёт
+``busy_timeout``, а сразу отвечает «database is locked»: иначе писатели
+заблокировали бы друг друга. ``BEGIN IMMEDIATE`` берёт блокировку на
+запись в начале ``atomic`` и ждёт её по ``busy_timeout``.
+"""
+from django.db.backends.sqlite3 import base, features
+
+
+class DatabaseFeatures(features.DatabaseFeatures):
+    # Транзакцию открывает _start_transaction_under_autocommit, а не
+    # модуль sqlite3 перед первой записью.
+    autocommits_when_autocommit_is_off = True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    features_class = DatabaseFeatures
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,157 @@
+"""Статика с хэшем в имени и заранее сжатыми копиями.
+
+``CompressedManifestStaticFilesStorage`` при ``collectstatic`` пишет
+файлы с хэшем содержимого в имени (``app.3f2a9c1b7d4e.css``) и рядом с
+каждым текстовым — ``.gz`` и, если установлен пакет ``brotli``, ``.br``.
+Сжимается один раз при сборке, а не на каждый запрос.
+
+``serve`` отдаёт собранную статику: выбирает по ``Accept-Encoding``
+сжатую копию и помечает файлы с хэшем неизменяемыми на год — новая
+версия файла получит другое имя, и браузер не перепроверяет старое.
+"""
+import gzip
+import io
+import mimetypes
+import os
+import posixpath
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage,
+    staticfiles_storage,
+)
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.functional import cached_property
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = frozenset((
+    '.css', '.js', '.map', '.json', '.svg', '.txt', '.xml', '.html', '.ico',
+))
+# Сжатая копия нужна, только если заметно меньше оригинала.
+MIN_RATIO = 0.9
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def _gzip(data):
+    # mtime=0: одинаковый файл даёт одинаковый архив при каждой сборке.
+    # У gzip.compress параметр mtime есть только с Python 3.8.
+    buffer = io.BytesIO()
+    with gzip.GzipFile(
+        fileobj=buffer, mode='wb', compresslevel=9, mtime=0
+    ) as archive:
+        archive.write(data)
+    return buffer.getvalue()
+
+
+def _brotli(data):
+    return brotli.compress(data, quality=11)
+
+
+def encoders():
+    """(кодировка, расширение, функция) в порядке предпочтения."""
+    found = [('gzip', '.gz', _gzip)]
+    if brotli is not None:
+        found.insert(0, ('br', '.br', _brotli))
+    return found
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            if not dry_run and processed and not isinstance(
+                processed, Exception
+            ):
+                self.compress(hashed_name)
+            yield name, hashed_name, processed
+
+    def compress(self, name):
+        """Кладёт рядом с ``name`` сжатые копии; возвращает их имена."""
+        if os.path.splitext(name)[1] not in COMPRESSIBLE:
+            return []
+        with self.open(name) as source:
+            data = source.read()
+        written = []
+        for _, suffix, encode in encoders():
+            compressed = encode(data)
+            if len(compressed) > len(data) * MIN_RATIO:
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            written.append(self._save(name + suffix, ContentFile(compressed)))
+        return written
+
+    @cached_property
+    def hashed_names(self):
+        return frozenset(self.hashed_files.values())
+
+
+def accepted_encodings(header):
+    """``Accept-Encoding`` как словарь {кодировка: вес}."""
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        name, _, value = params.partition('=')
+        try:
+            accepted[coding] = float(value) if name.strip() == 'q' else 1.0
+        except ValueError:
+            accepted[coding] = 0.0
+    return accepted
+
+
+def _variant(path, header):
+    """Путь к файлу для ответа и его Content-Encoding."""
+    accepted = accepted_encodings(header)
+    for encoding, suffix, _ in encoders():
+        quality = accepted.get(encoding, accepted.get('*', 0))
+        if quality > 0 and os.path.isfile(path + suffix):
+            return path + suffix, encoding
+    return path, None
+
+
+def serve(request, path):
+    """Файл из ``STATIC_ROOT`` со сжатием по ``Accept-Encoding``."""
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    file_path, encoding = _variant(
+        full_path, request.META.get('HTTP_ACCEPT_ENCODING', '')
+    )
+    stat = os.stat(file_path)
+    if not was_modified_since(
+        request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime, stat.st_size
+    ):
+        response = HttpResponseNotModified()
+    else:
+        content_type, _ = mimetypes.guess_type(full_path)
+        response = FileResponse(
+            open(file_path, 'rb'),
+            content_type=content_type or 'application/octet-stream',
+        )
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        if encoding:
+            response['Content-Encoding'] = encoding
+    hashed = getattr(staticfiles_storage, 'hashed_names', frozenset())
+    response['Cache-Control'] = (
+        IMMUTABLE if path in hashed else 'public, max-age=0, must-revalidate'
+    )
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -0,0 +1,31 @@
+"""Шаблонизатор Django, который замеряет время рендеринга.
+
+Время попадает в ``core.metrics`` текущего запроса. Считаются только
+шаблоны верхнего уровня: ``{% include %}`` рендерится внутри них.
+"""
+import time
+
+from django.template.backends.django import DjangoTemplates, Template
+
+from . import metrics
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        current = metrics.current()
+        if current is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            current.template_seconds += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
@@ -0,0 +1,41 @@
+"""Настройки прогона тестов.
+
+Кэш по умолчанию — общий файл ``cache.sqlite3`` рядом с проектом: в нём
+сессии, корзины лимитов и страницы сервера разработки. Тесты чистят кэш
+через ``cache.clear()``, поэтому на время прогона все псевдонимы из
+``CACHES`` подменяются ``LocMemCache`` процесса — он пуст в начале
+каждого прогона и исчезает вместе с ним.
+
+Миниатюры строятся сразу, а не в фоновом пуле: поток пула пережил бы
+тест и писал бы во временный ``MEDIA_ROOT``, который тест уже удаляет.
+"""
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+def isolated_settings():
+    """``override_settings`` с ``LocMemCache`` на месте каждого кэша и
+    миниатюрами без фонового пула."""
+    caches = {
+        alias: {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': f'test-{alias}',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+        for alias in settings.CACHES
+    }
+    return override_settings(CACHES=caches, THUMBNAIL_ASYNC=False)
+
+
+class TestRunner(DiscoverRunner):
+    """``manage.py test`` с настройками из ``isolated_settings``."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.settings = isolated_settings()
+        self.settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,282 @@
+import asyncio
+import socket
+import threading
+from contextlib import contextmanager
+
+import requests
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TransactionTestCase
+from django.urls import reverse
+
+from core.asgi import MAX_HEADERS, ASGIHandler, environ_from_scope, serve
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+@contextmanager
+def running(application):
+    """Запускает ``serve`` в отдельном потоке; отдаёт (хост, порт)."""
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    address = []
+
+    def on_start(bound):
+        address.extend(bound)
+        started.set()
+
+    task = loop.create_task(serve(application, port=0, started=on_start))
+
+    def run():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    started.wait()
+    try:
+        yield tuple(address)
+    finally:
+        loop.call_soon_threadsafe(task.cancel)
+        thread.join()
+        loop.close()
+
+
+async def echo(scope, receive, send):
+    """Отвечает телом запроса."""
+    message = await receive()
+    body = message['body']
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def hello(scope, receive, send):
+    """Отвечает «hello»; на /stream — кусками без Content-Length."""
+    await receive()
+    stream = scope['path'] == '/stream'
+    headers = [] if stream else [(b'content-length', b'5')]
+    await send({
+        'type': 'http.response.start', 'status': 200, 'headers': headers,
+    })
+    for part in (b'hel', b'lo') if stream else (b'hello',):
+        await send({
+            'type': 'http.response.body', 'body': part, 'more_body': True,
+        })
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+def scope(method, path, query=b'', headers=()):
+    return {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': method,
+        'path': path,
+        'query_string': query,
+        'headers': list(headers),
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 5000),
+    }
+
+
+class EnvironTests(SimpleTestCase):
+    def test_scope_becomes_wsgi_environ(self):
+        environ = environ_from_scope(
+            scope(
+                'POST',
+                '/profile/имя/',
+                b'q=1',
+                [
+                    (b'content-type', b'text/plain'),
+                    (b'cookie', b'a=1'),
+                    (b'cookie', b'b=2'),
+                    (b'x-forwarded-for', b'10.0.0.1'),
+                ],
+            ),
+            b'body',
+        )
+        self.assertEqual(
+            environ['PATH_INFO'].encode('latin-1').decode(), '/profile/имя/'
+        )
+        self.assertEqual(environ['QUERY_STRING'], 'q=1')
+        self.assertEqual(environ['CONTENT_TYPE'], 'text/plain')
+        self.assertEqual(environ['HTTP_COOKIE'], 'a=1; b=2')
+        self.assertEqual(environ['HTTP_X_FORWARDED_FOR'], '10.0.0.1')
+        self.assertEqual(environ['REMOTE_ADDR'], '127.0.0.1')
+        self.assertEqual(environ['wsgi.input'].read(), b'body')
+
+
+class ASGIHandlerTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.application = ASGIHandler(threads=2)
+        self.addCleanup(self.application.executor.shutdown)
+        author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=author, text='Пост по ASGI')
+
+    def call(self, request_scope, body=b''):
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body}
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(self.application(request_scope, receive, send))
+        start, *chunks = messages
+        content = b''.join(chunk.get('body', b'') for chunk in chunks)
+        return start['status'], dict(start['headers']), content
+
+    def test_feed_page(self):
+        status, headers, content = self.call(
+            scope('GET', reverse('posts:index'))
+        )
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b'content-type'], b'text/html; charset=utf-8')
+        self.assertIn('Пост по ASGI', content.decode())
+
+    def test_head_keeps_headers_without_body(self):
+        address = reverse('posts:index')
+        _, _, content = self.call(scope('GET', address))
+        status, headers, head_content = self.call(scope('HEAD', address))
+        self.assertEqual(status, 200)
+        self.assertEqual(head_content, b'')
+        self.assertEqual(
+            headers[b'content-length'], str(len(content)).encode()
+        )
+
+    def test_redirect_and_cookies(self):
+        status, headers, _ = self.call(
+            scope('GET', reverse('posts:follow_index'))
+        )
+        self.assertEqual(status, 302)
+        self.assertTrue(headers[b'location'].startswith(b'/auth/login/'))
+        status, headers, _ = self.call(scope('GET', reverse('users:login')))
+        self.assertIn(b'csrftoken=', headers[b'set-cookie'])
+
+    def test_post_body_reaches_csrf_check(self):
+        status, _, _ = self.call(
+            scope(
+                'POST',
+                reverse('posts:add_comment', args=[self.post.pk]),
+                headers=[
+                    (b'content-type', b'application/x-www-form-urlencoded'),
+                ],
+            ),
+            b'text=hi',
+        )
+        # Без токена запрос не дошёл до login_required с его редиректом.
+        self.assertNotEqual(status, 302)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_keep_alive_server(self):
+        with running(self.application) as address:
+            with requests.Session() as http:
+                base = 'http://%s:%s' % address
+                for _ in range(2):
+                    response = http.get(base + reverse('posts:index'))
+                    self.assertEqual(response.status_code, 200)
+                    self.assertIn('Пост по ASGI', response.text)
+
+    def test_lifespan_shutdown(self):
+        messages = [{'type': 'lifespan.startup'},
+                    {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        asyncio.run(self.application({'type': 'lifespan'}, receive, send))
+        self.assertEqual(
+            sent,
+            ['lifespan.startup.complete', 'lifespan.shutdown.complete'],
+        )
+
+
+class ServerProtocolTests(SimpleTestCase):
+    def exchange(self, data, application=echo):
+        """Шлёт байты в одно соединение и читает всё до его закрытия."""
+        with running(application) as address:
+            with socket.create_connection(address, timeout=5) as client:
+                client.sendall(data)
+                received = []
+                while True:
+                    chunk = client.recv(65536)
+                    if not chunk:
+                        return b''.join(received)
+                    received.append(chunk)
+
+    def test_chunked_body_is_decoded(self):
+        response = self.exchange(
+            b'POST / HTTP/1.1\r\nHost: x\r\n'
+            b'Transfer-Encoding: chunked\r\n\r\n'
+            b'4\r\nWiki\r\n5;ext=1\r\npedia\r\n0\r\n\r\n'
+            b'GET / HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n'
+        )
+        self.assertEqual(response.count(b'HTTP/1.1 200 OK'), 2)
+        self.assertIn(b'\r\n\r\nWikipedia', response)
+
+    def test_head_response_has_no_body(self):
+        for path in ('/', '/stream'):
+            with self.subTest(path=path):
+                response = self.exchange(
+                    b'HEAD %s HTTP/1.1\r\nHost: x\r\n\r\n' % path.encode()
+                    + b'GET / HTTP/1.1\r\nHost: x\r\n'
+                    b'Connection: close\r\n\r\n',
+                    hello,
+                )
+                head, _, rest = response.partition(b'\r\n\r\n')
+                self.assertTrue(head.startswith(b'HTTP/1.1 200 OK'), head)
+                self.assertNotIn(b'transfer-encoding', head.lower())
+                if path == '/':
+                    self.assertIn(b'content-length: 5', head)
+                # Сразу за заголовками HEAD — ответ на GET.
+                self.assertTrue(rest.startswith(b'HTTP/1.1 200 OK'), rest)
+                self.assertTrue(rest.endswith(b'\r\n\r\nhello'), rest)
+
+    def test_ambiguous_bodies_are_rejected(self):
+        cases = {
+            b'Transfer-Encoding: chunked\r\nContent-Length: 3\r\n': 400,
+            b'Transfer-Encoding: gzip, chunked\r\n': 501,
+            b'Content-Length: -1\r\n': 400,
+            b'Content-Length: abc\r\n': 400,
+            b'Content-Length: 1\r\nContent-Length: 2\r\n': 400,
+        }
+        for headers, status in cases.items():
+            with self.subTest(headers=headers):
+                response = self.exchange(
+                    b'POST / HTTP/1.1\r\nHost: x\r\n' + headers + b'\r\n'
+                    b'GET / HTTP/1.1\r\nHost: x\r\n\r\n'
+                )
+                self.assertTrue(
+                    response.startswith(b'HTTP/1.1 %d ' % status), response
+                )
+                # Соединение закрыто, второй запрос не обработан.
+                self.assertEqual(response.count(b'HTTP/1.1 '), 1)
+
+    def test_malformed_heads_are_rejected(self):
+        cases = {
+            b'GARBAGE\r\n\r\n': 400,
+            b'GET / HTTP/2.0\r\n\r\n': 505,
+            b'GET /' + b'a' * 10000 + b' HTTP/1.1\r\n\r\n': 414,
+            b'GET / HTTP/1.1\r\nBroken header\r\n\r\n': 400,
+            b'GET / HTTP/1.1\r\nX: ' + b'a' * 10000 + b'\r\n\r\n': 431,
+            b'GET / HTTP/1.1\r\n'
+            + b'X: 1\r\n' * (MAX_HEADERS + 1) + b'\r\n': 431,
+        }
+        for data, status in cases.items():
+            with self.subTest(data=data[:40]):
+                response = self.exchange(data)
+                self.assertTrue(
+                    response.startswith(b'HTTP/1.1 %d ' % status), response
+                )
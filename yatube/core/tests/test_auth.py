@@ -0,0 +1,73 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, get_user_model
+from django.core.cache import cache
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from core import auth
+
+User = get_user_model()
+
+
+class CachedUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='reader', password='old-secret-1'
+        )
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def request(self):
+        engine = import_module(settings.SESSION_ENGINE)
+        request = RequestFactory().get('/')
+        request.session = engine.SessionStore(
+            self.client.session.session_key
+        )
+        return request
+
+    def test_hot_path_has_no_queries(self):
+        address = reverse('about:author')
+        self.client.get(address)
+        with self.assertNumQueries(0):
+            response = self.client.get(address)
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_user_is_cached(self):
+        self.assertEqual(auth.get_user(self.request()), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(auth.get_user(self.request()), self.user)
+
+    def test_profile_change_invalidates(self):
+        auth.get_user(self.request())
+        self.user.first_name = 'Читатель'
+        self.user.save()
+        self.assertEqual(auth.get_user(self.request()).first_name, 'Читатель')
+
+    def test_password_change_ends_session(self):
+        auth.get_user(self.request())
+        self.user.set_password('new-secret-2')
+        self.user.save()
+        request = self.request()
+        self.assertFalse(auth.get_user(request).is_authenticated)
+        self.assertIsNone(request.session.session_key)
+
+    def test_inactive_and_deleted_users(self):
+        auth.get_user(self.request())
+        self.user.is_active = False
+        self.user.save()
+        self.assertFalse(auth.get_user(self.request()).is_authenticated)
+        self.user.is_active = True
+        self.user.save()
+        key = auth._key(self.user.pk)
+        auth.get_user(self.request())
+        self.assertIsNotNone(cache.get(key))
+        self.user.delete()
+        self.assertIsNone(cache.get(key))
+
+    def test_unknown_backend(self):
+        request = self.request()
+        request.session[BACKEND_SESSION_KEY] = 'missing.Backend'
+        self.assertFalse(auth.get_user(request).is_authenticated)
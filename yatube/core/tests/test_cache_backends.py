@@ -0,0 +1,57 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from core.cache_backends import SQLiteCache
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        location = os.path.join(self.directory, 'cache.sqlite3')
+        return SQLiteCache(location, {'OPTIONS': options})
+
+    def test_set_get_delete(self):
+        self.cache.set('key', {'value': [1, 2]})
+        self.assertEqual(self.cache.get('key'), {'value': [1, 2]})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'other'))
+
+    def test_entries_are_shared_between_instances(self):
+        """Второй экземпляр (другой воркер) видит те же записи."""
+        self.cache.set('key', 'value')
+        self.assertEqual(self.make_cache().get('key'), 'value')
+
+    def test_expired_entries_are_not_returned(self):
+        self.cache.set('key', 'value', timeout=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.has_key('key'))
+
+    def test_incr(self):
+        self.cache.set('counter', 1, timeout=None)
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        self.assertEqual(self.cache.get('counter'), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = self.make_cache(MAX_SIZE=2500, LRU_RESOLUTION=0)
+        cache.set('old', 'x' * 1000)
+        cache.set('used', 'x' * 1000)
+        cache.get('old')
+        cache.set('new', 'x' * 1000)
+        self.assertIsNone(cache.get('used'))
+        self.assertIsNotNone(cache.get('old'))
+        self.assertIsNotNone(cache.get('new'))
@@ -0,0 +1,141 @@
+import os
+import sqlite3
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, TransactionTestCase,
+    override_settings,
+)
+from django.urls import resolve, reverse
+
+from core import db_router
+from core.db_router import PrimaryReplicaRouter, replicate, use_primary
+from core.middleware import ReplicaRoutingMiddleware
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class RouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.addCleanup(db_router.end_request)
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_request_reads_from_replica_until_write(self):
+        db_router.start_request(pinned=False)
+        self.assertEqual(self.router.db_for_read(Post), 'replica')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertTrue(db_router.end_request())
+
+    def test_sessions_read_from_primary(self):
+        db_router.start_request(pinned=False)
+        self.assertEqual(self.router.db_for_read(Session), 'default')
+
+    def test_pinned_request_reads_from_primary(self):
+        db_router.start_request(pinned=True)
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertFalse(db_router.end_request())
+
+    def test_migrations_only_on_primary(self):
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = PrimaryReplicaRouter()
+
+    def handle(self, request, view=None, write=False):
+        used = []
+
+        def get_response(request):
+            if view is not None:
+                middleware.process_view(request, view, (), {})
+            used.append(self.router.db_for_read(Post))
+            if write:
+                self.router.db_for_write(Post)
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        return middleware(request), used[0]
+
+    def test_get_reads_from_replica(self):
+        response, alias = self.handle(self.factory.get('/'))
+        self.assertEqual(alias, 'replica')
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_write_pins_following_requests(self):
+        response, alias = self.handle(self.factory.post('/'), write=True)
+        self.assertEqual(alias, 'default')
+        cookie = response.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SECONDS)
+
+        request = self.factory.get('/')
+        request.COOKIES[settings.REPLICA_PIN_COOKIE] = cookie.value
+        _, alias = self.handle(request)
+        self.assertEqual(alias, 'default')
+
+    def test_use_primary_view(self):
+        _, alias = self.handle(
+            self.factory.get('/'), view=use_primary(lambda request: None)
+        )
+        self.assertEqual(alias, 'default')
+
+    def test_follow_feed_reads_from_primary(self):
+        # Лента подписок дочитывает посты и пишет в FeedEntry прямо в GET.
+        view = resolve(reverse('posts:follow_index')).func
+        _, alias = self.handle(self.factory.get('/'), view=view)
+        self.assertEqual(alias, 'default')
+
+
+class StickyAfterWriteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.user, text='Пост')
+        self.client.force_login(self.user)
+
+    def test_comment_sets_pin_cookie(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        response = self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Комментарий'},
+        )
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+
+class ReplicateTests(TransactionTestCase):
+    def test_replica_receives_primary_copy(self):
+        Post.objects.create(
+            author=User.objects.create_user(username='author'), text='Пост'
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'replica.sqlite3')
+            connections.databases['replica'] = {
+                **connections.databases['default'],
+                'NAME': f'file:{path}?mode=ro',
+            }
+            self.addCleanup(connections.databases.pop, 'replica')
+            with override_settings(DATABASE_REPLICAS=['replica']):
+                self.assertEqual(replicate(), [path])
+            self.assertFalse(os.path.exists(f'{path}.tmp'))
+            replica = sqlite3.connect(path)
+            try:
+                texts = replica.execute('SELECT text FROM posts_post')
+                self.assertEqual(texts.fetchall(), [('Пост',)])
+            finally:
+                replica.close()
@@ -0,0 +1,127 @@
+import io
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from core.dumps import Importer, export, iter_objects, sort_models
+from posts.models import (
+    Comment, Follow, Group, Post, Suggestion, UserStats,
+)
+
+User = get_user_model()
+
+DUMP = os.path.join(settings.BASE_DIR, 'dump.json')
+
+
+class IterObjectsTests(SimpleTestCase):
+    def test_objects_split_across_chunks(self):
+        objects = [
+            {'pk': i, 'fields': {'text': 'a, ] [' * i}} for i in range(5)
+        ]
+        text = '\n ' + json.dumps(objects, indent=2)
+        for chunk_size in (1, 7, 1024):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(
+                    list(iter_objects(io.StringIO(text), chunk_size)),
+                    objects,
+                )
+
+    def test_truncated_dump_fails(self):
+        with self.assertRaises(ValueError):
+            list(iter_objects(io.StringIO('[{"pk": 1}, {"pk"'), 4))
+
+    def test_models_follow_foreign_keys(self):
+        order = sort_models([Comment, Post, Follow, Group, User])
+        self.assertLess(order.index(User), order.index(Post))
+        self.assertLess(order.index(Group), order.index(Post))
+        self.assertLess(order.index(Post), order.index(Comment))
+
+
+class DumpTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_import_project_dump(self):
+        output = io.StringIO()
+        call_command(
+            'import_dump',
+            DUMP,
+            '-e', 'contenttypes',
+            '-e', 'auth.permission',
+            '-e', 'admin',
+            '-e', 'sessions',
+            '-e', 'thumbnail',
+            stdout=output,
+        )
+        self.assertEqual(Post.objects.count(), 38)
+        self.assertEqual(User.objects.count(), 3)
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertIn('posts.Post: 38 объектов', output.getvalue())
+        commented = Comment.objects.first().post
+        self.assertEqual(
+            Post.objects.get(pk=commented.pk).comments_count,
+            commented.comments.count(),
+        )
+        self.assertEqual(UserStats.objects.count(), 3)
+
+    def test_export_import_round_trip(self):
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(title='Группа', slug='dump')
+        post = Post.objects.create(author=author, group=group, text='Пост')
+        Comment.objects.create(post=post, author=reader, text='Ответ')
+        Follow.objects.create(user=reader, author=author)
+        models = [User, Group, Post, Comment, Follow]
+        stream = io.StringIO()
+        report = export(stream, models)
+        self.assertEqual(report.total, 6)
+        for model in reversed(models):
+            model.objects.all().delete()
+
+        stream.seek(0)
+        importer = Importer(batch_size=2, commit_every=2)
+        importer.load(stream)
+        self.assertEqual(importer.report.total, 6)
+        post = Post.objects.get()
+        self.assertEqual(post.text, 'Пост')
+        self.assertEqual(post.group.slug, 'dump')
+        self.assertEqual(post.comments.get().author.username, 'reader')
+        self.assertTrue(Follow.objects.filter(user__username='reader'))
+
+    def test_suggestions_are_rebuilt_not_exported(self):
+        users = [
+            User.objects.create_user(username=name)
+            for name in ('reader', 'author', 'other')
+        ]
+        Follow.objects.create(user=users[0], author=users[1])
+        Follow.objects.create(user=users[1], author=users[2])
+        call_command('rebuild_suggestions', stdout=io.StringIO())
+        expected = list(Suggestion.objects.values_list(
+            'user__username', 'author__username'
+        ))
+        self.assertTrue(expected)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dump.json')
+            call_command(
+                'export_dump', 'auth.user', 'posts', '-o', path,
+                stderr=io.StringIO(),
+            )
+            with open(path, encoding='utf-8') as stream:
+                models = {item['model'] for item in json.load(stream)}
+            self.assertNotIn('posts.suggestion', models)
+            Suggestion.objects.all().delete()
+            Follow.objects.all().delete()
+            User.objects.all().delete()
+            call_command('import_dump', path, stdout=io.StringIO())
+        self.assertEqual(
+            list(Suggestion.objects.values_list(
+                'user__username', 'author__username'
+            )),
+            expected,
+        )
@@ -0,0 +1,30 @@
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.http import client_ip
+
+
+@override_settings(TRUSTED_PROXIES=['127.0.0.1', '10.0.0.1'])
+class ClientIpTests(SimpleTestCase):
+    def address(self, remote, forwarded=None):
+        headers = {'REMOTE_ADDR': remote}
+        if forwarded is not None:
+            headers['HTTP_X_FORWARDED_FOR'] = forwarded
+        return client_ip(RequestFactory().get('/', **headers))
+
+    def test_direct_client_cannot_spoof_header(self):
+        self.assertEqual(
+            self.address('203.0.113.5', '127.0.0.1'), '203.0.113.5'
+        )
+
+    def test_client_behind_proxies(self):
+        self.assertEqual(self.address('127.0.0.1', '203.0.113.5'),
+                         '203.0.113.5')
+        # Левые адреса приписал сам клиент, им верить нельзя.
+        self.assertEqual(
+            self.address('127.0.0.1', '1.1.1.1, 203.0.113.5, 10.0.0.1'),
+            '203.0.113.5',
+        )
+
+    def test_proxy_without_header(self):
+        self.assertEqual(self.address('127.0.0.1'), '127.0.0.1')
+        self.assertEqual(self.address('127.0.0.1', ' , '), '127.0.0.1')
@@ -0,0 +1,123 @@
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from core import loadtest
+from posts.models import FeedEntry, Post, UserStats
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class LoadTestTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.dataset = loadtest.seed(
+            users=6, groups=2, posts=30, follows=2, comments=20, images=1
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_seed_fills_derived_tables(self):
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(UserStats.objects.count(), 6)
+        self.assertTrue(FeedEntry.objects.exists())
+        self.assertEqual(Post.objects.exclude(image='').count(), 1)
+        dates = Post.objects.values_list('pub_date', flat=True)
+        self.assertEqual(len(set(dates)), 30)
+
+    def test_client_runner_covers_every_route(self):
+        runner = loadtest.ClientRunner(requests_per_route=2, warmup=0)
+        # Превышения бюджетов SQL здесь не проверяются, только шумят.
+        with mock.patch('core.middleware.logger'):
+            results = runner.run()
+        names = {name for name, _ in loadtest.routes()}
+        self.assertIn('posts:index', names)
+        self.assertIn('users:signup', names)
+        self.assertIn('about:tech', names)
+        for name in names:
+            self.assertIn(f'{name} anonymous', results)
+        self.assertNotIn('users:logout user', results)
+        for key, summary in results.items():
+            if key.startswith(('posts:', 'about:')):
+                with self.subTest(key=key):
+                    self.assertLess(max(summary['status']), 500)
+        # Первый запрос строит страницу, второй берёт её из кэша страниц.
+        self.assertEqual(results['posts:index anonymous']['queries'], 0.5)
+
+    def test_temporary_site_disables_rate_limits(self):
+        # Настоящую временную базу внутри TestCase не создать.
+        creation = mock.patch.multiple(
+            connection.creation,
+            create_test_db=mock.DEFAULT,
+            destroy_test_db=mock.DEFAULT,
+        )
+        with creation, mock.patch.dict(connection.settings_dict, TEST={}):
+            with loadtest.temporary_site():
+                self.assertFalse(settings.RATE_LIMIT_ENABLED)
+
+    def test_compare_reports_regressions(self):
+        baseline = {
+            'a': {'p95': 10.0, 'queries': 3},
+            'b': {'p95': 0.2, 'queries': 1},
+        }
+        results = {
+            'a': {'p95': 13.0, 'queries': 4},
+            'b': {'p95': 0.9, 'queries': 1},
+            'c': {'p95': 100.0, 'queries': 50},
+        }
+        regressions = loadtest.compare(results, baseline, tolerance=0.2)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all(line.startswith('a:') for line in regressions))
+
+    def test_summarize_percentiles(self):
+        summary = loadtest.summarize(
+            [i / 1000 for i in range(1, 101)], queries=300, requests_count=100
+        )
+        self.assertAlmostEqual(summary['p50'], 50.5, places=1)
+        self.assertAlmostEqual(summary['p99'], 99.01, places=1)
+        self.assertEqual(summary['queries'], 3)
+
+    @skipUnless(
+        hasattr(statistics, 'quantiles'), 'statistics.quantiles с Python 3.8'
+    )
+    def test_percentile_matches_statistics(self):
+        rng = random.Random(0)
+        samples = sorted(rng.random() for _ in range(37))
+        cuts = statistics.quantiles(samples, n=100, method='inclusive')
+        for fraction, cut in ((0.5, 49), (0.95, 94), (0.99, 98)):
+            with self.subTest(fraction=fraction):
+                self.assertAlmostEqual(
+                    loadtest.percentile(samples, fraction), cuts[cut]
+                )
+        self.assertEqual(loadtest.percentile([3], 0.95), 3)
+
+    def test_rss_without_resource_module(self):
+        with mock.patch.dict(sys.modules, {'resource': None}):
+            self.assertEqual(loadtest.rss_mb(), 0)
+        self.assertGreater(loadtest.rss_mb(), 0)
+
+    def test_summarize_without_samples(self):
+        self.assertEqual(
+            loadtest.summarize([], queries=0, requests_count=0),
+            {'p50': 0, 'p95': 0, 'p99': 0, 'queries': 0},
+        )
+
+    def test_runner_requires_get(self):
+        with self.assertRaises(TypeError):
+            loadtest.Runner()
@@ -0,0 +1,84 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import QueryBudgetExceeded, registry
+
+
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+
+    def test_request_is_measured(self):
+        self.client.get(reverse('posts:index'))
+        stats = registry.snapshot()['posts:index']
+        self.assertEqual(stats['requests'], 1)
+        self.assertEqual(stats['queries'], 1)
+        self.assertGreater(stats['template_seconds'], 0)
+        self.assertGreaterEqual(
+            stats['total_seconds'],
+            stats['sql_seconds'] + stats['template_seconds'],
+        )
+
+    def test_prometheus_endpoint(self):
+        self.client.get(reverse('about:author'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn('yatube_requests_total{view="about:author"} 1', text)
+        self.assertIn(
+            'yatube_request_seconds_bucket{view="about:author",le="+Inf"} 1',
+            text,
+        )
+
+    def test_prometheus_endpoint_is_internal(self):
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(TRUSTED_PROXIES=['127.0.0.1'])
+    def test_prometheus_endpoint_behind_proxy(self):
+        response = self.client.get(
+            reverse('metrics'), HTTP_X_FORWARDED_FOR='203.0.113.5'
+        )
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(
+            reverse('metrics'), HTTP_X_FORWARDED_FOR='127.0.0.1'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_prometheus_endpoint_token(self):
+        address = reverse('metrics')
+        self.assertEqual(self.client.get(address).status_code, 403)
+        response = self.client.get(address, HTTP_AUTHORIZATION='Bearer no')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(
+            address, HTTP_AUTHORIZATION='Bearer secret', REMOTE_ADDR='10.0.0.1'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    @mock.patch('posts.views.index.query_budget', 0)
+    def test_budget_exceeded_is_logged(self):
+        with self.assertLogs('yatube.metrics', 'WARNING') as logs:
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('"budget": 0', logs.output[0])
+        stats = registry.snapshot()['posts:index']
+        self.assertEqual(stats['budget_exceeded'], 1)
+
+    @override_settings(QUERY_BUDGET_RAISE=True)
+    @mock.patch('posts.views.index.query_budget', 0)
+    def test_budget_exceeded_raises_in_tests(self):
+        with self.assertLogs('yatube.metrics', 'WARNING'):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('posts:index'))
+
+    @override_settings(METRICS_LOG=True)
+    def test_structured_log(self):
+        with self.assertLogs('yatube.metrics', 'INFO') as logs:
+            self.client.get(reverse('posts:index'))
+        self.assertIn('"view": "posts:index"', logs.output[0])
+        self.assertIn('"queries": 1', logs.output[0])
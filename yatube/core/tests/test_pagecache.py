@@ -0,0 +1,118 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import pagecache
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='cached', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        pagecache.stats.reset()
+        self.pages = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        ]
+
+    def test_second_request_is_served_from_cache(self):
+        for address in self.pages:
+            with self.subTest(address=address):
+                first = self.client.get(address)
+                with self.assertNumQueries(0):
+                    second = self.client.get(address)
+                self.assertEqual(second.status_code, 200)
+                self.assertEqual(second.content, first.content)
+                self.assertEqual(second['Content-Type'], first['Content-Type'])
+                self.assertIn('Cookie', second['Vary'])
+
+    def test_query_string_is_part_of_key(self):
+        address = reverse('posts:index')
+        self.client.get(address)
+        response = self.client.get(address, {'page': 2})
+        self.assertIsNotNone(response.context)
+
+    def test_session_bypasses_cache(self):
+        client = Client()
+        client.force_login(self.author)
+        address = reverse('posts:index')
+        self.client.get(address)
+        for _ in range(2):
+            response = client.get(address)
+            self.assertIsNotNone(response.context)
+            self.assertContains(response, 'Выйти')
+
+    def test_writes_purge_pages(self):
+        address = reverse('posts:post_detail', args=[self.post.pk])
+        self.client.get(address)
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Свежий ответ'
+        )
+        self.assertContains(self.client.get(address), 'Свежий ответ')
+        self.client.get(reverse('posts:index'))
+        Post.objects.create(author=self.author, text='Новый пост')
+        self.assertContains(
+            self.client.get(reverse('posts:index')), 'Новый пост'
+        )
+
+    def test_errors_are_not_stored(self):
+        address = reverse('posts:profile', args=['nobody'])
+        self.assertEqual(self.client.get(address).status_code, 404)
+        response = self.client.get(address)
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNotNone(response.context)
+
+    @override_settings(PAGE_CACHE_ENABLED=False)
+    def test_disabled(self):
+        address = reverse('posts:index')
+        self.client.get(address)
+        self.assertIsNotNone(self.client.get(address).context)
+
+    def test_stats(self):
+        address = reverse('posts:index')
+        size = len(self.client.get(address).content)
+        self.client.get(address)
+        self.client.get(address)
+        client = Client()
+        client.force_login(self.author)
+        client.get(address)
+        requests, saved = pagecache.stats.snapshot()
+        self.assertEqual(
+            requests,
+            {
+                ('posts:index', 'miss'): 1,
+                ('posts:index', 'hit'): 2,
+                ('posts:index', 'bypass'): 1,
+            },
+        )
+        self.assertEqual(saved, {'posts:index': 2 * size})
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn(
+            'yatube_page_cache_requests_total'
+            '{view="posts:index",result="hit"} 2',
+            text,
+        )
+        self.assertIn(
+            f'yatube_page_cache_bytes_saved_total{{view="posts:index"}} '
+            f'{2 * size}',
+            text,
+        )
+        self.assertIn(
+            'yatube_page_cache_hit_ratio{view="posts:index"} 0.6667', text
+        )
@@ -0,0 +1,191 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import ratelimit
+from posts.models import Comment, Follow, Post
+
+User = get_user_model()
+
+LIMITS = {
+    'post': {'user': '2/m', 'ip': '60/m'},
+    'comment': {'user': '2/m', 'ip': '3/m'},
+    'follow': {'user': '1/h'},
+}
+
+
+class TokenBucketTests(TestCase):
+    def test_parse_rate(self):
+        self.assertEqual(ratelimit.parse_rate('10/m'), (10, 10 / 60))
+        self.assertEqual(ratelimit.parse_rate('2/s'), (2, 2))
+
+    def test_take(self):
+        state, retry_after = ratelimit.take(None, 100, 2, 0.5)
+        self.assertEqual((state, retry_after), ((1, 100), 0))
+        state, retry_after = ratelimit.take(state, 100, 2, 0.5)
+        self.assertEqual((state, retry_after), ((0, 100), 0))
+        state, retry_after = ratelimit.take(state, 101, 2, 0.5)
+        self.assertEqual(retry_after, 1)
+        # Через две секунды после последнего токена появляется новый.
+        state, retry_after = ratelimit.take(state, 102, 2, 0.5)
+        self.assertEqual(retry_after, 0)
+
+    def test_bucket_never_exceeds_capacity(self):
+        state, _ = ratelimit.take((0, 0), 10 ** 6, 2, 1)
+        self.assertEqual(state, (1, 10 ** 6))
+
+    def test_take_all_is_all_or_nothing(self):
+        buckets = [(2, 1), (1, 1)]
+        states, waits = ratelimit.take_all([None, None], 0, buckets)
+        self.assertEqual((states, waits), ([(1, 0), (0, 0)], [0, 0]))
+        taken, waits = ratelimit.take_all(states, 0, buckets)
+        self.assertIsNone(taken)
+        self.assertEqual(waits, [0, 1])
+
+    def check_backend(self, backend):
+        one = [(2, 1 / 60)]
+        self.assertEqual(backend.consume(['key'], one), [0])
+        self.assertEqual(backend.consume(['key'], one), [0])
+        self.assertGreater(backend.consume(['key'], one)[0], 0)
+        self.assertEqual(backend.consume(['other'], one), [0])
+        # Пустая корзина "key" не даёт взять токен из "third".
+        self.assertGreater(
+            max(backend.consume(['third', 'key'], one * 2)), 0
+        )
+        self.assertEqual(backend.consume(['third'], [(1, 1 / 60)]), [0])
+
+    def test_local_backend(self):
+        self.check_backend(ratelimit.LocalBackend())
+
+    def test_local_backend_evicts_oldest(self):
+        backend = ratelimit.LocalBackend(max_entries=2)
+        for key in ('first', 'second', 'third'):
+            backend.consume([key], [(1, 1 / 60)])
+        self.assertEqual(backend.consume(['first'], [(1, 1 / 60)]), [0])
+
+    def test_cache_backend(self):
+        cache.clear()
+        self.check_backend(ratelimit.CacheBackend('default'))
+
+
+@override_settings(RATE_LIMITS=LIMITS)
+class RateLimitViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='writer')
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        ratelimit.stats.reset()
+        self.client.force_login(self.user)
+
+    def comment(self, client, text='Ответ'):
+        return client.post(
+            reverse('posts:add_comment', args=[self.post.pk]), {'text': text}
+        )
+
+    def test_user_limit(self):
+        for _ in range(2):
+            self.assertEqual(self.comment(self.client).status_code, 302)
+        response = self.comment(self.client, text='Лишний')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertTemplateUsed(response, 'core/429.html')
+        self.assertFalse(Comment.objects.filter(text='Лишний').exists())
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_rejected_request_does_not_touch_database(self):
+        for _ in range(2):
+            self.comment(self.client)
+        with self.assertNumQueries(0):
+            # Сессия и пользователь из кэша; транзакции view нет.
+            self.comment(self.client)
+
+    def test_ip_limit_is_shared_by_users(self):
+        other = Client()
+        other.force_login(self.author)
+        self.comment(self.client)
+        self.comment(self.client)
+        self.assertEqual(self.comment(other).status_code, 302)
+        self.assertEqual(self.comment(other).status_code, 429)
+        other = Client(REMOTE_ADDR='10.0.0.2')
+        other.force_login(User.objects.create_user(username='elsewhere'))
+        self.assertEqual(self.comment(other).status_code, 302)
+
+    def test_rejected_by_ip_keeps_user_token(self):
+        for number in range(3):
+            other = Client()
+            other.force_login(User.objects.create_user(username=f'u{number}'))
+            self.assertEqual(self.comment(other).status_code, 302)
+        # IP исчерпан чужими запросами; отказ не тратит токены writer.
+        for _ in range(3):
+            self.assertEqual(self.comment(self.client).status_code, 429)
+        elsewhere = Client(REMOTE_ADDR='10.0.0.2')
+        elsewhere.force_login(self.user)
+        for _ in range(2):
+            self.assertEqual(self.comment(elsewhere).status_code, 302)
+
+    @override_settings(TRUSTED_PROXIES=['127.0.0.1'])
+    def test_ip_limit_behind_proxy(self):
+        for number, address in enumerate(('203.0.113.5', '203.0.113.6')):
+            client = Client(HTTP_X_FORWARDED_FOR=address)
+            client.force_login(
+                User.objects.create_user(username=f'proxied-{number}')
+            )
+            for _ in range(2):
+                self.assertEqual(self.comment(client).status_code, 302)
+
+    def test_form_display_is_not_limited(self):
+        for _ in range(3):
+            response = self.client.get(reverse('posts:post_create'))
+            self.assertEqual(response.status_code, 200)
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Новый'}
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_follow_limits_every_method(self):
+        self.client.get(reverse('posts:profile_follow', args=['author']))
+        response = self.client.get(
+            reverse('posts:profile_unfollow', args=['author'])
+        )
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(Follow.objects.filter(user=self.user).exists())
+
+    def test_stats_are_exported(self):
+        for _ in range(3):
+            self.comment(self.client)
+        self.assertEqual(
+            ratelimit.stats.snapshot(),
+            {
+                ('comment', 'user', True): 2,
+                ('comment', 'user', False): 1,
+                ('comment', 'ip', True): 2,
+            },
+        )
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn(
+            'yatube_rate_limit_requests_total'
+            '{scope="comment",limit="user",result="rejected"} 1',
+            text,
+        )
+
+    @override_settings(RATE_LIMIT_ENABLED=False)
+    def test_disabled(self):
+        for _ in range(4):
+            self.assertEqual(self.comment(self.client).status_code, 302)
+        self.assertEqual(ratelimit.stats.snapshot(), {})
+
+    @override_settings(RATE_LIMIT_BACKEND='core.ratelimit.LocalBackend')
+    def test_local_backend_setting(self):
+        with mock.patch.object(
+            ratelimit.LocalBackend, 'consume', return_value=[0, 7]
+        ):
+            response = self.comment(self.client)
+        self.assertEqual(response['Retry-After'], '7')
@@ -0,0 +1,59 @@
+import os
+import sqlite3
+import tempfile
+
+from django.db import connections, transaction
+from django.test import SimpleTestCase, override_settings
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 1234,
+}
+
+
+@override_settings(SQLITE_PRAGMAS=PRAGMAS)
+class SQLitePerformanceTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'db.sqlite3')
+        sqlite3.connect(self.path).close()
+
+    def connect(self, name):
+        connections.databases['tuned'] = {
+            **connections.databases['default'],
+            'ENGINE': 'core.sqlite',
+            'NAME': name,
+        }
+        self.addCleanup(connections.databases.pop, 'tuned')
+        connection = connections['tuned']
+        self.addCleanup(delattr, connections._connections, 'tuned')
+        self.addCleanup(connection.close)
+        return connection
+
+    def pragma(self, connection, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_new_connection_gets_pragmas(self):
+        connection = self.connect(self.path)
+        self.assertEqual(self.pragma(connection, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(connection, 'synchronous'), 1)
+        self.assertEqual(self.pragma(connection, 'busy_timeout'), 1234)
+
+    def test_read_only_connection_keeps_journal_mode(self):
+        connection = self.connect(f'file:{self.path}?mode=ro')
+        self.assertEqual(self.pragma(connection, 'journal_mode'), 'delete')
+        self.assertEqual(self.pragma(connection, 'busy_timeout'), 1234)
+
+    def test_atomic_takes_write_lock_at_start(self):
+        self.connect(self.path)
+        other = sqlite3.connect(self.path, timeout=0)
+        self.addCleanup(other.close)
+        with transaction.atomic(using='tuned'):
+            with self.assertRaisesMessage(
+                sqlite3.OperationalError, 'database is locked'
+            ):
+                other.execute('BEGIN IMMEDIATE')
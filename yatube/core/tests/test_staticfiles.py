@@ -0,0 +1,102 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from unittest import skipUnless
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core import staticfiles
+
+SCRIPT = 'function hello() { return "hello"; }\n' * 50
+
+
+class StaticFilesTests(SimpleTestCase):
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        os.makedirs(os.path.join(self.source, 'js'))
+        with open(os.path.join(self.source, 'js', 'app.js'), 'w') as file:
+            file.write(SCRIPT)
+        with open(os.path.join(self.source, 'tiny.txt'), 'w') as file:
+            file.write('x')
+        settings = override_settings(
+            STATICFILES_DIRS=[self.source],
+            STATIC_ROOT=self.root,
+            STATICFILES_STORAGE=(
+                'core.staticfiles.CompressedManifestStaticFilesStorage'
+            ),
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.name = staticfiles_storage.stored_name('js/app.js')
+        self.factory = RequestFactory()
+
+    def get(self, path, **headers):
+        return staticfiles.serve(self.factory.get('/', **headers), path)
+
+    def test_collectstatic_writes_hashed_and_compressed_files(self):
+        self.assertRegex(self.name, r'^js/app\.[0-9a-f]{12}\.js$')
+        with open(os.path.join(self.root, self.name + '.gz'), 'rb') as file:
+            self.assertEqual(gzip.decompress(file.read()).decode(), SCRIPT)
+        # Сжатие, которое почти ничего не даёт, не сохраняется.
+        tiny = staticfiles_storage.stored_name('tiny.txt')
+        self.assertFalse(os.path.exists(os.path.join(self.root, tiny + '.gz')))
+        with open(os.path.join(self.root, 'staticfiles.json')) as file:
+            paths = json.load(file)['paths']
+        self.assertEqual(paths['js/app.js'], self.name)
+
+    @skipUnless(staticfiles.brotli, 'нужен пакет brotli')
+    def test_brotli_is_preferred(self):
+        response = self.get(self.name, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+
+    def test_gzip_is_negotiated(self):
+        response = self.get(self.name, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('javascript', response['Content-Type'])
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        body = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(body.decode(), SCRIPT)
+        response.close()
+
+    def test_identity_when_compression_is_refused(self):
+        for header in ('', 'gzip;q=0', 'identity', 'deflate, *;q=0'):
+            with self.subTest(header=header):
+                response = self.get(self.name, HTTP_ACCEPT_ENCODING=header)
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertEqual(
+                    b''.join(response.streaming_content).decode(), SCRIPT
+                )
+                response.close()
+
+    def test_hashed_files_are_immutable(self):
+        response = self.get(self.name)
+        self.assertEqual(response['Cache-Control'], staticfiles.IMMUTABLE)
+        response.close()
+        response = self.get('js/app.js')
+        self.assertIn('must-revalidate', response['Cache-Control'])
+        response.close()
+
+    def test_not_modified(self):
+        response = self.get(self.name, HTTP_ACCEPT_ENCODING='gzip')
+        last_modified = response['Last-Modified']
+        response.close()
+        response = self.get(
+            self.name,
+            HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_MODIFIED_SINCE=last_modified,
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_and_outside_files(self):
+        for path in ('js/missing.js', '../settings.py', 'js'):
+            with self.subTest(path=path):
+                with self.assertRaises(staticfiles.Http404):
+                    self.get(path)
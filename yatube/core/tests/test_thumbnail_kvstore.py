@@ -0,0 +1,88 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from core import thumbnail_kvstore
+from core.thumbnail_kvstore import KVStore
+from posts import thumbnails
+
+
+class KVStoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media, THUMBNAIL_ASYNC=False)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.kvstore = KVStore()
+
+    def upload(self, name):
+        buffer = io.BytesIO()
+        Image.new('RGB', (800, 600), 'red').save(buffer, 'JPEG')
+        name = default.storage.save(name, ContentFile(buffer.getvalue()))
+        thumbnails.generate(name)
+        return name
+
+    def keys(self):
+        return self.kvstore._find_keys_raw(sorl_settings.THUMBNAIL_KEY_PREFIX)
+
+    def index_size(self):
+        shards = cache.get_many([
+            self.kvstore._index_key(shard)
+            for shard in range(thumbnail_kvstore.INDEX_SHARDS)
+        ])
+        return sum(len(index['keys']) for index in shards.values())
+
+    def test_keys_are_listed(self):
+        name = self.upload('posts/listed.jpg')
+        image = self.kvstore.get(ImageFile(name, default.storage))
+        self.assertIsNotNone(image)
+        keys = self.keys()
+        self.assertIn(f'{sorl_settings.THUMBNAIL_KEY_PREFIX}||image||'
+                      f'{image.key}', keys)
+        self.assertEqual(
+            len(keys), len(thumbnails.variants()) + 2, keys
+        )
+
+    def test_cleanup_drops_missing_images(self):
+        kept = self.upload('posts/kept.jpg')
+        gone = self.upload('posts/gone.jpg')
+        default.storage.delete(gone)
+        call_command('thumbnail', 'cleanup', verbosity=0)
+        self.assertIsNotNone(
+            self.kvstore.get(ImageFile(kept, default.storage))
+        )
+        self.assertIsNone(self.kvstore.get(ImageFile(gone, default.storage)))
+
+    def test_clear_drops_every_key(self):
+        self.upload('posts/cleared.jpg')
+        call_command('thumbnail', 'clear', verbosity=0)
+        self.assertEqual(self.keys(), [])
+
+    @mock.patch.object(thumbnail_kvstore, 'INDEX_PRUNE_SIZE', 4)
+    @mock.patch.object(thumbnail_kvstore, 'INDEX_SHARDS', 1)
+    def test_index_forgets_evicted_keys(self):
+        prefix = f'{sorl_settings.THUMBNAIL_KEY_PREFIX}||image||'
+        for number in range(50):
+            self.kvstore._set_raw(f'{prefix}{number}', 'value')
+            # Запись вытеснена или истекла без ведома хранилища.
+            cache.delete(f'{prefix}{number}')
+        self.assertLessEqual(self.index_size(), 5)
+        self.kvstore._set_raw(f'{prefix}kept', 'value')
+        self.kvstore._set_raw(f'{prefix}dropped', 'value')
+        cache.delete(f'{prefix}dropped')
+        self.assertEqual(self.keys(), [f'{prefix}kept'])
+        self.assertEqual(self.index_size(), 1)
+        self.kvstore._delete_raw(f'{prefix}kept')
+        self.assertEqual(self.index_size(), 0)
@@ -0,0 +1,96 @@
+"""Хранилище ключей sorl-thumbnail только в кэше, без таблицы в базе.
+
+У каждой картинки поста несколько вариантов, и в ``cached_db_kvstore``
+запись о каждом — транзакция SQLite из фонового потока миниатюр, которая
+спорит за блокировку записи с запросами. Общий кэш
+(``core.cache_backends``) и так переживает перезапуск; вытесненную
+запись sorl восстановит без Pillow, найдя готовый файл миниатюры.
+
+Кэш не умеет перечислять ключи, а командам ``thumbnail cleanup`` и
+``thumbnail clear`` это нужно, поэтому рядом с ключами ведётся их
+список, разбитый на ``INDEX_SHARDS`` частей: новая запись читает и
+переписывает одну небольшую часть. Список ведётся без блокировок, и
+при одновременной записи из двух процессов ключ может в него не
+попасть; такой ключ команды пропустят, а кэш вытеснит его сам.
+
+Истёкшие и вытесненные записи кэш удаляет молча, поэтому часть списка
+сверяется с кэшем, когда вырастает вдвое с прошлой сверки (и не меньше
+чем до ``INDEX_PRUNE_SIZE``), а также при каждом перечислении ключей.
+Так список не растёт без предела, а сверка в среднем стоит O(1) на
+запись.
+"""
+import zlib
+
+from django.core.cache import caches
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.kvstores.base import KVStoreBase
+
+INDEX_SHARDS = 64
+INDEX_PRUNE_SIZE = 256
+
+
+class KVStore(KVStoreBase):
+    @property
+    def cache(self):
+        return caches[settings.THUMBNAIL_CACHE]
+
+    def _index_key(self, shard):
+        # Не начинается с THUMBNAIL_KEY_PREFIX: clear() не удалит список
+        # вместе с ключами.
+        return f'index||{settings.THUMBNAIL_KEY_PREFIX}||{shard}'
+
+    def _shard(self, key):
+        return self._index_key(zlib.crc32(key.encode()) % INDEX_SHARDS)
+
+    def _live(self, keys):
+        """Ключи, значения которых ещё лежат в кэше."""
+        return set(self.cache.get_many(list(keys)))
+
+    def _save(self, shard, keys, limit):
+        self.cache.set(
+            shard,
+            {'keys': keys, 'limit': limit},
+            settings.THUMBNAIL_CACHE_TIMEOUT,
+        )
+
+    def _update_index(self, keys, add):
+        by_shard = {}
+        for key in keys:
+            by_shard.setdefault(self._shard(key), set()).add(key)
+        for shard, shard_keys in by_shard.items():
+            index = self.cache.get(shard) or {
+                'keys': set(), 'limit': INDEX_PRUNE_SIZE,
+            }
+            updated = (
+                index['keys'] | shard_keys if add
+                else index['keys'] - shard_keys
+            )
+            limit = index['limit']
+            if len(updated) > limit:
+                updated = self._live(updated)
+                limit = max(INDEX_PRUNE_SIZE, 2 * len(updated))
+            if updated != index['keys'] or limit != index['limit']:
+                self._save(shard, updated, limit)
+
+    def _get_raw(self, key):
+        return self.cache.get(key)
+
+    def _set_raw(self, key, value):
+        self.cache.set(key, value, settings.THUMBNAIL_CACHE_TIMEOUT)
+        self._update_index([key], add=True)
+
+    def _delete_raw(self, *keys):
+        self.cache.delete_many(keys)
+        self._update_index(keys, add=False)
+
+    def _find_keys_raw(self, prefix):
+        shards = self.cache.get_many(
+            [self._index_key(shard) for shard in range(INDEX_SHARDS)]
+        )
+        found = []
+        for shard, index in shards.items():
+            live = self._live(index['keys'])
+            if live != index['keys']:
+                self._save(shard, live, index['limit'])
+            found += [key for key in live if key.startswith(prefix)]
+        return found
@@ -1,5 +1,13 @@
 # core/views.py
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from . import pagecache, ratelimit
+from .http import client_ip
+from .metrics import registry
 
 
 def page_not_found(request, exception):
@@ -18,3 +26,23 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+def _metrics_allowed(request):
+    if settings.METRICS_TOKEN:
+        return constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''),
+            f'Bearer {settings.METRICS_TOKEN}',
+        )
+    return client_ip(request) in settings.METRICS_ALLOWED_IPS
+
+
+def metrics(request):
+    if not _metrics_allowed(request):
+        raise PermissionDenied
+    return HttpResponse(
+        registry.render()
+        + ratelimit.stats.render()
+        + pagecache.stats.render(),
+        content_type='text/plain; version=0.0.4'
+    )
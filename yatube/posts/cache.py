@@ -0,0 +1,54 @@
+"""Кэш фрагментов лент с точной инвалидацией.
+
+Ключи фрагментов включают номер поколения. Любая запись в посты,
+комментарии или группы увеличивает поколение, и все старые фрагменты
+перестают читаться сразу, а не по истечении таймаута; сами записи
+вытесняются бэкендом кэша.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+GENERATION_KEY = 'posts:generation'
+
+
+def _cache():
+    return caches[settings.FEED_CACHE_ALIAS]
+
+
+def _initial_generation():
+    # Если ключ вытеснен, новое поколение всё равно больше всех прежних.
+    return int(time.time() * 1000)
+
+
+def get_generation():
+    cache = _cache()
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, _initial_generation(), None)
+        generation = cache.get(GENERATION_KEY, _initial_generation())
+    return generation
+
+
+def _bump():
+    cache = _cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, _initial_generation(), None)
+
+
+def bump_generation():
+    """Сбрасывает фрагменты сейчас и ещё раз после коммита, чтобы
+    параллельный запрос не закэшировал старые данные под новым ключом."""
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def fragment_context():
+    return {
+        'cache_generation': get_generation(),
+        'cache_timeout': settings.FEED_CACHE_TIMEOUT,
+    }
@@ -0,0 +1,86 @@
+"""Валидаторы условных GET для страниц поста, группы и профиля.
+
+ETag считается одним запросом к базе до вызова view: по ``Post.updated``
+(правка поста или изменение числа его комментариев), числу постов и
+комментариев; для поста — ещё по названию и slug его группы. В ETag
+входят также пользователь, для которого отрисована страница, и его
+подписка на автора профиля. Если ETag совпал с
+присланным в ``If-None-Match``, view не вызывается и ответ — 304.
+
+Last-Modified эти страницы не отдают: ни одна дата не покрывает всего,
+что входит в ETag. Максимум ``updated`` уменьшается при удалении
+последнего изменённого поста и не меняется от правки группы, подписки
+или смены читателя, и по одному ``If-Modified-Since`` клиент получил бы
+304 на изменившуюся страницу.
+"""
+import hashlib
+
+from django.db.models import Count, Exists, Max, OuterRef, Sum
+from django.views.decorators.http import condition
+
+from .models import Follow, Group, Post, get_user_model
+
+User = get_user_model()
+
+
+def _etag(request, *parts):
+    viewer = request.user.pk if request.user.is_authenticated else 0
+    raw = '|'.join(str(part) for part in (viewer, *parts))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def conditional(validators):
+    """Как ``condition`` с ETag от ``validators(request, **kwargs)``;
+    ``None`` — страницы нет."""
+    return condition(etag_func=validators)
+
+
+def _first(queryset):
+    # first() добавил бы ORDER BY, а строк здесь не больше одной.
+    return next(iter(queryset.order_by()[:1]), None)
+
+
+def post_validators(request, post_id):
+    row = _first(
+        Post.objects.filter(pk=post_id).values_list(
+            'updated',
+            'comments_count',
+            'author__stats__posts_count',
+            'group__title',
+            'group__slug',
+        )
+    )
+    if row is None:
+        return None
+    return _etag(request, *row)
+
+
+def _summary(queryset, *fields):
+    return queryset.values(*fields).annotate(
+        last_updated=Max('posts__updated'),
+        posts_total=Count('posts'),
+        comments_total=Sum('posts__comments_count'),
+    )
+
+
+def group_validators(request, slug):
+    row = _first(
+        _summary(Group.objects.filter(slug=slug), 'title', 'description')
+    )
+    if row is None:
+        return None
+    return _etag(request, *row.values())
+
+
+def profile_validators(request, username):
+    authors = _summary(User.objects.filter(username=username), 'pk')
+    if request.user.is_authenticated:
+        authors = authors.annotate(
+            viewer_follows=Exists(
+                Follow.objects.filter(user=request.user, author=OuterRef('pk'))
+            )
+        )
+    row = _first(authors)
+    if row is None:
+        return None
+    return _etag(request, *row.values())
@@ -0,0 +1,87 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются одним ``UPDATE ... SET x = x + 1`` в той же транзакции,
+что и запись, которая их меняет. ``recount`` пересчитывает их с нуля.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Comment, Follow, Post, UserStats
+from .utils import bulk_batch_size
+
+User = get_user_model()
+
+
+def _count(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(count=Count('pk'))
+            .values('count')
+        ),
+        0,
+    )
+
+
+def _user_counts(users):
+    return users.annotate(
+        posts_total=_count(Post.objects.all(), 'author'),
+        followers_total=_count(Follow.objects.all(), 'author'),
+        following_total=_count(Follow.objects.all(), 'user'),
+    ).values_list('pk', 'posts_total', 'followers_total', 'following_total')
+
+
+def _stats_from_counts(counts):
+    return [
+        UserStats(
+            user_id=user_id,
+            posts_count=posts,
+            followers_count=followers,
+            following_count=following,
+        )
+        for user_id, posts, followers, following in counts
+    ]
+
+
+def bump_user(user_id, field, delta):
+    # Greatest: после рассинхронизации счётчик не уходит ниже нуля и не
+    # нарушает CHECK у PositiveIntegerField посреди удаления.
+    updated = UserStats.objects.filter(user_id=user_id).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+    if not updated and delta > 0:
+        get_stats(user_id)
+
+
+def bump_comments(post_id, delta):
+    # update() не трогает auto_now: время изменения ставится явно, чтобы
+    # сменились валидаторы условных GET. Now() в SQLite — CURRENT_TIMESTAMP
+    # с точностью до секунды, а auto_now пишет микросекунды.
+    Post.objects.filter(pk=post_id).update(
+        comments_count=Greatest(F('comments_count') + delta, 0),
+        updated=timezone.now(),
+    )
+
+
+def get_stats(user_id):
+    """Счётчики пользователя; строка создаётся пересчётом, если её нет."""
+    stats = UserStats.objects.filter(user_id=user_id).first()
+    if stats is None:
+        (stats,) = _stats_from_counts(
+            _user_counts(User.objects.filter(pk=user_id))
+        )
+        UserStats.objects.bulk_create([stats], ignore_conflicts=True)
+    return stats
+
+
+def recount(batch_size=1000):
+    UserStats.objects.all().delete()
+    stats = _stats_from_counts(_user_counts(User.objects.all()).iterator())
+    UserStats.objects.bulk_create(
+        stats, batch_size=bulk_batch_size(UserStats, batch_size)
+    )
+    Post.objects.update(comments_count=_count(Comment.objects.all(), 'post'))
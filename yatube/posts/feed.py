@@ -0,0 +1,89 @@
+"""Лента подписок, материализованная по пользователям.
+
+Новый пост раскладывается во входящие ленты подписчиков при записи,
+поэтому страница ``follow_index`` читается одним диапазоном по индексу
+``(user, pub_date)``. Посты авторов с очень большим числом подписчиков
+в ленты не раскладываются: они дочитываются в ленту подписчика при её
+открытии (fan-out-on-read).
+"""
+from django.conf import settings
+from django.utils import timezone
+
+from .models import FeedEntry, Follow, Post, UserStats
+from .utils import bulk_batch_size, get_page_obj
+
+FEED_ORDERING = ('-pub_date', '-post_id')
+
+
+def is_pull_author(author_id):
+    return UserStats.objects.filter(
+        user_id=author_id, followers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).exists()
+
+
+def _bulk_add(entries):
+    FeedEntry.objects.bulk_create(
+        entries,
+        batch_size=bulk_batch_size(FeedEntry, settings.FEED_BATCH_SIZE),
+        ignore_conflicts=True,
+    )
+
+
+def fan_out(post):
+    """Кладёт новый пост во входящие ленты подписчиков автора."""
+    if is_pull_author(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True
+    )
+    _bulk_add(
+        FeedEntry(user_id=user_id, post_id=post.pk, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def backfill(user_id, author_id, since=None):
+    """Добавляет в ленту пользователя посты автора (новее ``since``)."""
+    posts = Post.objects.filter(author_id=author_id)
+    if since is not None:
+        posts = posts.filter(pub_date__gte=since)
+    _bulk_add(
+        FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.values_list('pk', 'pub_date').iterator()
+    )
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты пользователя посты автора после отписки."""
+    FeedEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def pull(user):
+    """Дочитывает в ленту посты авторов, которые не раскладываются."""
+    limit = settings.FEED_FANOUT_LIMIT
+    pull_follows = Follow.objects.filter(
+        user=user, author__stats__followers_count__gt=limit
+    )
+    for follow in pull_follows:
+        started = timezone.now()
+        backfill(user.pk, follow.author_id, since=follow.synced)
+        Follow.objects.filter(pk=follow.pk).update(synced=started)
+
+
+def rebuild(user):
+    FeedEntry.objects.filter(user=user).delete()
+    for author_id in user.follower.values_list('author_id', flat=True):
+        backfill(user.pk, author_id)
+
+
+def get_feed_page(user, request):
+    """Страница ленты подписок: сначала записи ленты, затем сами посты."""
+    pull(user)
+    entries = FeedEntry.objects.filter(user=user).values('post_id', 'pub_date')
+    page_obj = get_page_obj(entries, request, ordering=FEED_ORDERING)
+    ids = [entry['post_id'] for entry in page_obj.object_list]
+    posts = Post.objects.for_feed().in_bulk(ids)
+    page_obj.object_list = [posts[pk] for pk in ids if pk in posts]
+    return page_obj
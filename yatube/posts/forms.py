@@ -1,9 +1,23 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from . import images, thumbnails
 from .models import Comment, Post
 
 
 class PostForm(forms.ModelForm):
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return images.process_upload(image)
+        return image
+
+    def save(self, commit=True):
+        post = super().save(commit=commit)
+        if commit and 'image' in self.changed_data and post.image:
+            thumbnails.schedule(post.image.name)
+        return post
+
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
@@ -0,0 +1,132 @@
+"""Обработка картинки поста при загрузке.
+
+Оригинал сохраняется без метаданных (EXIF и XMP с координатами и
+моделью камеры) и не больше ``IMAGE_MAX_SIZE`` точек по длинной
+стороне; поворот из EXIF применяется к самим точкам. Анимация
+обрабатывается покадрово и сохраняет все кадры. Формат и имя файла не
+меняются. Варианты для лент строит ``posts.thumbnails``.
+"""
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, ImageSequence
+
+# Параметры пересохранения по форматам; остальные — умолчания Pillow.
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 90},
+}
+# Поворот кадра в EXIF.
+ORIENTATION = 0x0112
+# Ключи ``image.info`` с метаданными: EXIF, XMP из WebP и XMP из PNG.
+METADATA = ('exif', 'xmp', 'XML:com.adobe.xmp')
+# XMP в JPEG — сегмент APP1 с этим заголовком; в ``info`` его нет.
+XMP_HEADER = b'http://ns.adobe.com/xap/1.0/\x00'
+
+
+def _has_metadata(image):
+    if any(key in image.info for key in METADATA):
+        return True
+    return any(
+        marker == 'APP1' and content.startswith(XMP_HEADER)
+        for marker, content in getattr(image, 'applist', ())
+    )
+
+
+def _needs_processing(image):
+    return (
+        _has_metadata(image)
+        or max(image.size) > settings.IMAGE_MAX_SIZE
+    )
+
+
+def _frames(image, format_):
+    """Кадры картинки и их длительности; у статичной — None.
+
+    Если Pillow не пишет многокадровый ``format_``, остаётся первый кадр.
+    """
+    animated = getattr(image, 'is_animated', False)
+    if not animated or format_ not in Image.SAVE_ALL:
+        return [image], None
+    frames = []
+    durations = []
+    for frame in ImageSequence.Iterator(image):
+        frames.append(frame.copy())
+        durations.append(frame.info.get('duration', 0))
+    return frames, durations
+
+
+def _clean(frame, format_):
+    if frame.getexif().get(ORIENTATION, 1) != 1:
+        frame = ImageOps.exif_transpose(frame)
+    limit = settings.IMAGE_MAX_SIZE
+    frame.thumbnail((limit, limit), Image.LANCZOS)
+    for key in METADATA:
+        frame.info.pop(key, None)
+    if format_ == 'JPEG' and frame.mode not in ('RGB', 'L', 'CMYK'):
+        frame = frame.convert('RGB')
+    return frame
+
+
+def normalize(data):
+    """Байты картинки без метаданных и не больше ``IMAGE_MAX_SIZE``.
+
+    Возвращает None, если менять нечего: картинка без EXIF и XMP и уже
+    нужного размера остаётся байт в байт прежней.
+    """
+    image = Image.open(io.BytesIO(data))
+    if not _needs_processing(image):
+        return None
+    format_ = image.format
+    if format_ == 'MPO':
+        # Снимок телефона: JPEG с кадрами глубины или превью. Остаётся
+        # только основной кадр.
+        format_ = 'JPEG'
+    options = dict(SAVE_OPTIONS.get(format_, {}))
+    options['icc_profile'] = image.info.get('icc_profile')
+    if 'loop' in image.info:
+        options['loop'] = image.info['loop']
+    frames, durations = _frames(image, format_)
+    frames = [_clean(frame, format_) for frame in frames]
+    if durations is not None:
+        options.update(
+            save_all=True, append_images=frames[1:], duration=durations
+        )
+    buffer = io.BytesIO()
+    frames[0].save(buffer, format_, **options)
+    return buffer.getvalue()
+
+
+def process_upload(uploaded):
+    """Загруженный файл после ``normalize`` под прежним именем."""
+    uploaded.seek(0)
+    data = normalize(uploaded.read())
+    uploaded.seek(0)
+    if data is None:
+        return uploaded
+    return ContentFile(data, name=uploaded.name)
+
+
+def process_stored(name):
+    """Переписывает уже сохранённый оригинал; True, если он изменился.
+
+    Новые байты сначала пишутся во временный файл рядом и затем
+    атомарно подменяют оригинал, так что сбой посередине его не теряет.
+    """
+    with default_storage.open(name) as stored:
+        data = normalize(stored.read())
+    if data is None:
+        return False
+    temporary = default_storage.save(f'{name}.tmp', ContentFile(data))
+    try:
+        os.replace(
+            default_storage.path(temporary), default_storage.path(name)
+        )
+    except BaseException:
+        default_storage.delete(temporary)
+        raise
+    return True
@@ -0,0 +1,93 @@
+import itertools
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.search import match_expression
+
+WORDS = (
+    'борщ обед рецепт город река лето зима книга кино музыка дорога '
+    'работа отпуск кофе утро вечер друг семья море горы лес поезд '
+    'самолёт история новости спорт футбол погода дождь солнце снег '
+    'python django sqlite поиск индекс запрос страница лента пост'
+).split()
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает поиск через FTS5 и через LIKE (icontains) по постам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--queries', type=int, default=20)
+        parser.add_argument('--words', type=int, default=20)
+
+    def fill(self, db, count, words):
+        rng = random.Random(0)
+        # Редкие слова встречаются в немногих постах, как в живой ленте.
+        vocabulary = WORDS + [f'слово{i}' for i in range(5000)]
+        cum = list(itertools.accumulate(
+            1 / rank for rank in range(1, len(vocabulary) + 1)
+        ))
+        db.execute('CREATE TABLE posts_post (id INTEGER PRIMARY KEY, text)')
+        batch = 10_000
+        for start in range(0, count, batch):
+            rows = (
+                (' '.join(rng.choices(vocabulary, cum_weights=cum, k=words)),)
+                for _ in range(min(batch, count - start))
+            )
+            db.executemany('INSERT INTO posts_post (text) VALUES (?)', rows)
+        db.execute(
+            'CREATE VIRTUAL TABLE posts_post_fts USING fts5('
+            "text, tokenize='unicode61 remove_diacritics 2')"
+        )
+        db.execute(
+            'INSERT INTO posts_post_fts (rowid, text) '
+            'SELECT id, text FROM posts_post'
+        )
+        db.commit()
+        return vocabulary
+
+    def measure(self, db, sql, params):
+        timings = []
+        for param in params:
+            started = time.perf_counter()
+            db.execute(sql, (param,)).fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), max(timings)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            db = sqlite3.connect(os.path.join(directory, 'bench.sqlite3'))
+            started = time.perf_counter()
+            vocabulary = self.fill(db, options['posts'], options['words'])
+            self.stdout.write(
+                f'Постов: {options["posts"]:,}, '
+                f'заполнение {time.perf_counter() - started:.1f} с'
+            )
+            rng = random.Random(1)
+            terms = rng.sample(vocabulary, options['queries'])
+            cases = {
+                'icontains': (
+                    'SELECT id FROM posts_post WHERE text LIKE ? '
+                    'ORDER BY id DESC LIMIT 10',
+                    [f'%{term}%' for term in terms],
+                ),
+                'fts5': (
+                    'SELECT rowid FROM posts_post_fts '
+                    'WHERE posts_post_fts MATCH ? '
+                    'ORDER BY bm25(posts_post_fts) LIMIT 10',
+                    [match_expression(term) for term in terms],
+                ),
+            }
+            for name, (sql, params) in cases.items():
+                median, worst = self.measure(db, sql, params)
+                self.stdout.write(
+                    f'{name:>10}: медиана {median:.2f} мс, '
+                    f'худший {worst:.2f} мс'
+                )
+            db.close()
@@ -0,0 +1,56 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts import images, thumbnails
+from posts.models import Post
+
+
+def process_original(name):
+    if images.process_stored(name):
+        # Миниатюры и размеры в хранилище sorl — от прежнего оригинала.
+        default.kvstore.delete(ImageFile(name, default.storage))
+
+
+def generate_chunk(names, originals=False):
+    for name in names:
+        if originals:
+            process_original(name)
+        thumbnails.generate(name)
+    connections.close_all()
+    return len(names)
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит варианты картинок постов для лент в нескольких процессах; '
+        'с --originals сначала убирает EXIF и ужимает сами оригиналы'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None)
+        parser.add_argument('--chunk-size', type=int, default=50)
+        parser.add_argument('--originals', action='store_true')
+
+    def handle(self, *args, **options):
+        names = list(
+            Post.objects.exclude(image='')
+            .order_by()
+            .values_list('image', flat=True)
+            .distinct()
+        )
+        size = options['chunk_size']
+        chunks = [names[i:i + size] for i in range(0, len(names), size)]
+        # Дочерние процессы не должны унаследовать открытые соединения.
+        connections.close_all()
+        done = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            work = partial(generate_chunk, originals=options['originals'])
+            for count in pool.map(work, chunks):
+                done += count
+                self.stdout.write(f'Готово {done} из {len(names)}')
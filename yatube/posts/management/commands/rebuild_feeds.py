@@ -0,0 +1,23 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts import feed
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок из таблицы Follow'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(follower__isnull=False).distinct()
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        count = 0
+        for user in users.iterator():
+            feed.rebuild(user)
+            count += 1
+        self.stdout.write(f'Пересобрано лент: {count}')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс постов и комментариев'
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError('Индекс FTS5 доступен только на SQLite')
+        with transaction.atomic():
+            search.rebuild()
+        self.stdout.write('Индекс пересобран')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации «Кого почитать» по таблице Follow'
+
+    def handle(self, *args, **options):
+        count = suggestions.rebuild()
+        self.stdout.write(f'Сохранено рекомендаций: {count}')
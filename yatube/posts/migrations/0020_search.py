@@ -0,0 +1,45 @@
+from django.db import migrations, utils
+
+TABLES = ('posts_post_fts', 'posts_comment_fts')
+
+
+def create_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            for table in TABLES:
+                cursor.execute(
+                    f'CREATE VIRTUAL TABLE {table} USING fts5('
+                    "text, tokenize='unicode61 remove_diacritics 2')"
+                )
+        except utils.OperationalError:
+            # SQLite собран без FTS5: поиск будет работать через icontains.
+            return
+        cursor.execute(
+            'INSERT INTO posts_post_fts (rowid, text) '
+            'SELECT id, text FROM posts_post'
+        )
+        cursor.execute(
+            'INSERT INTO posts_comment_fts (rowid, text) '
+            'SELECT id, text FROM posts_comment'
+        )
+
+
+def drop_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table in TABLES:
+            cursor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
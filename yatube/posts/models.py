@@ -4,12 +4,33 @@ from django.db.models import UniqueConstraint
 
 User = get_user_model()
 
+FEED_FIELDS = (
+    'text',
+    'pub_date',
+    'image',
+    'comments_count',
+    'author',
+    'author__username',
+    'group',
+    'group__slug',
+    'group__title',
+)
+
+
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для списков: автор и группа одним запросом,
+        без лишних колонок."""
+        return self.select_related('author', 'group').only(*FEED_FIELDS)
+
 
 class Post(models.Model):
     text = models.TextField(verbose_name='Текст')
     pub_date = models.DateTimeField(
         auto_now_add=True, verbose_name='Дата публикации'
     )
+    # Меняется при правке поста и при изменении числа комментариев.
+    updated = models.DateTimeField(auto_now=True, verbose_name='Изменён')
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -25,10 +46,29 @@ class Post(models.Model):
         verbose_name='Группа',
     )
     image = models.ImageField('Картинка', upload_to='posts/', blank=True)
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Комментариев', default=0, editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = [
             '-pub_date',
+            '-id',
+        ]
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='posts_post_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='posts_post_group_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='posts_post_author_date_idx',
+            ),
         ]
 
     def __str__(self) -> str:
@@ -65,6 +105,17 @@ class Comment(models.Model):
     )
 
     class Meta:
+        ordering = [
+            'created',
+            'id',
+        ]
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='posts_comment_post_idx',
+            ),
+        ]
+
         def __str__(self):
             return self.text
 
@@ -82,6 +133,9 @@ class Follow(models.Model):
         related_name='following',
         verbose_name='Автор',
     )
+    synced = models.DateTimeField(
+        verbose_name='Лента синхронизирована', blank=True, null=True
+    )
 
     class Meta:
         constraints = [
@@ -92,3 +146,89 @@ class Follow(models.Model):
 
         def __str__(self):
             return self.user.username
+
+
+class FeedEntry(models.Model):
+    """Запись в ленте подписок пользователя (fan-out-on-write)."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик',
+    )
+    post = models.ForeignKey(
+        'Post',
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'post'], name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='posts_feed_user_date_idx',
+            )
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые поддерживаются при записи."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Постов', default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков', default=0
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name='Подписок', default=0
+    )
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class Suggestion(models.Model):
+    """Автор, которого стоит почитать пользователю (top-K, см. suggestions)."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggestions',
+        verbose_name='Пользователь',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    score = models.FloatField(verbose_name='Вес')
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'author'], name='unique_suggestion'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-score'],
+                name='posts_suggestion_user_idx',
+            )
+        ]
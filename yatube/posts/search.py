@@ -0,0 +1,144 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+На SQLite тексты индексируются в виртуальных таблицах FTS5 (rowid равен
+id поста или комментария), результаты ранжируются по bm25. На других
+СУБД или без FTS5 поиск работает через ``icontains``.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Post
+
+POST_TABLE = 'posts_post_fts'
+COMMENT_TABLE = 'posts_comment_fts'
+# Совпадение в комментарии весит меньше совпадения в тексте поста.
+COMMENT_WEIGHT = 0.5
+
+_available = {}
+
+
+def is_available():
+    alias = connection.alias
+    if alias not in _available:
+        _available[alias] = connection.vendor == 'sqlite' and (
+            POST_TABLE in connection.introspection.table_names()
+        )
+    return _available[alias]
+
+
+def _index(table, pk, text):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', [pk])
+        cursor.execute(
+            f'INSERT INTO {table} (rowid, text) VALUES (%s, %s)', [pk, text]
+        )
+
+
+def _unindex(table, pk):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', [pk])
+
+
+def index_post(post):
+    if is_available():
+        _index(POST_TABLE, post.pk, post.text)
+
+
+def unindex_post(post):
+    if is_available():
+        _unindex(POST_TABLE, post.pk)
+
+
+def index_comment(comment):
+    if is_available():
+        _index(COMMENT_TABLE, comment.pk, comment.text)
+
+
+def unindex_comment(comment):
+    if is_available():
+        _unindex(COMMENT_TABLE, comment.pk)
+
+
+def rebuild():
+    with connection.cursor() as cursor:
+        for table, source in (
+            (POST_TABLE, 'posts_post'),
+            (COMMENT_TABLE, 'posts_comment'),
+        ):
+            cursor.execute(f'DELETE FROM {table}')
+            cursor.execute(
+                f'INSERT INTO {table} (rowid, text) '
+                f'SELECT id, text FROM {source}'
+            )
+
+
+def match_expression(query):
+    """Каждое слово запроса как префикс; все слова обязательны."""
+    words = re.findall(r'\w+', query)
+    return ' '.join('"{}"*'.format(word) for word in words)
+
+
+class SearchResults:
+    """Ранжированные результаты FTS5, которые понимает Paginator."""
+
+    ranked = (
+        f'SELECT rowid AS post_id, bm25({POST_TABLE}) AS score '
+        f'FROM {POST_TABLE} WHERE {POST_TABLE} MATCH %s '
+        'UNION ALL '
+        f'SELECT c.post_id, bm25({COMMENT_TABLE}) * {COMMENT_WEIGHT} '
+        f'FROM {COMMENT_TABLE} '
+        f'JOIN posts_comment c ON c.id = {COMMENT_TABLE}.rowid '
+        f'WHERE {COMMENT_TABLE} MATCH %s'
+    )
+
+    def __init__(self, expression):
+        self.expression = expression
+        self._count = None
+
+    def _execute(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [self.expression, self.expression, *params])
+            return cursor.fetchall()
+
+    def count(self):
+        if self._count is None:
+            self._count = self._execute(
+                f'SELECT COUNT(DISTINCT post_id) FROM ({self.ranked})'
+            )[0][0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        stop = self.count() if index.stop is None else index.stop
+        if stop <= start:
+            return []
+        rows = self._execute(
+            f'SELECT post_id FROM ({self.ranked}) GROUP BY post_id '
+            'ORDER BY MIN(score), post_id LIMIT %s OFFSET %s',
+            [stop - start, start],
+        )
+        ids = [post_id for post_id, in rows]
+        posts = Post.objects.for_feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def search(query):
+    """Посты, в тексте или комментариях которых встречается запрос."""
+    expression = match_expression(query)
+    if not expression:
+        return Post.objects.none()
+    if is_available():
+        return SearchResults(expression)
+    return (
+        Post.objects.for_feed()
+        .filter(Q(text__icontains=query) | Q(comments__text__icontains=query))
+        .distinct()
+        .order_by('-pub_date', '-id')
+    )
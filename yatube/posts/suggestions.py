@@ -0,0 +1,208 @@
+"""Кого почитать: рекомендации авторов по графу подписок.
+
+Вес автора ``c`` для пользователя ``u`` складывается из двух частей:
+
+* друзья друзей — сколько авторов, на которых подписан ``u``, сами
+  подписаны на ``c`` (``F @ F``, где ``F`` — матрица подписок);
+* похожие авторы — сумма по авторам ``a`` пользователя ``u`` косинусной
+  близости ``a`` и ``c`` по общим подписчикам
+  (``F @ C``, ``C = Fnᵀ Fn`` без диагонали, ``Fn`` — ``F`` со столбцами,
+  делёнными на корень из числа подписчиков).
+
+Сам пользователь и авторы, на которых он уже подписан, не предлагаются.
+Для каждого пользователя хранится ``SUGGESTIONS_PER_USER`` лучших
+авторов, поэтому страница читает их одним запросом по индексу.
+
+``rebuild`` пересчитывает всех разом — разреженными матрицами scipy,
+если пакет установлен, иначе тем же расчётом на словарях. ``refresh``
+пересчитывает одного пользователя после его подписки или отписки по
+подграфу вокруг него; подписчиков авторов для этого читается не больше
+``SUGGESTIONS_REFRESH_SAMPLE``. Рекомендации остальных пользователей,
+которые меняет эта подписка, обновит следующий ``rebuild``.
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Follow, Suggestion
+from .utils import bulk_batch_size
+
+try:
+    import numpy
+    from scipy import sparse
+except ImportError:
+    numpy = sparse = None
+
+
+def _weights():
+    return (
+        settings.SUGGESTIONS_FOF_WEIGHT,
+        settings.SUGGESTIONS_COFOLLOW_WEIGHT,
+    )
+
+
+def _top(user_id, follows, followers, counts, limit):
+    """Лучшие ``limit`` пар (автор, вес) для одного пользователя.
+
+    ``follows`` и ``followers`` — множества авторов и подписчиков по id,
+    ``counts`` — число подписчиков автора.
+    """
+    fof_weight, cofollow_weight = _weights()
+    following = follows.get(user_id, set())
+    scores = defaultdict(float)
+    for author_id in following:
+        for candidate in follows.get(author_id, ()):
+            scores[candidate] += fof_weight
+        common = Counter()
+        for follower_id in followers.get(author_id, ()):
+            common.update(follows.get(follower_id, ()))
+        del common[author_id]
+        for candidate, shared in common.items():
+            scores[candidate] += cofollow_weight * shared / math.sqrt(
+                counts[author_id] * counts[candidate]
+            )
+    scores.pop(user_id, None)
+    for author_id in following:
+        scores.pop(author_id, None)
+    return heapq.nlargest(
+        limit, scores.items(), key=lambda item: (item[1], -item[0])
+    )
+
+
+def _graph(edges):
+    follows = defaultdict(set)
+    followers = defaultdict(set)
+    for user_id, author_id in edges:
+        follows[user_id].add(author_id)
+        followers[author_id].add(user_id)
+    return follows, followers
+
+
+def python_scores(edges, limit):
+    """Рекомендации всех пользователей: {user_id: [(автор, вес), ...]}."""
+    follows, followers = _graph(edges)
+    counts = {author_id: len(users) for author_id, users in followers.items()}
+    result = {}
+    for user_id in follows:
+        top = _top(user_id, follows, followers, counts, limit)
+        if top:
+            result[user_id] = top
+    return result
+
+
+def matrix_scores(edges, limit):
+    """То же, что ``python_scores``, разреженными матрицами scipy."""
+    fof_weight, cofollow_weight = _weights()
+    pairs = numpy.array(list(edges), dtype=numpy.int64).reshape(-1, 2)
+    if not len(pairs):
+        return {}
+    ids, index = numpy.unique(pairs, return_inverse=True)
+    index = index.reshape(-1, 2)
+    size = len(ids)
+    follows = sparse.csr_matrix(
+        (numpy.ones(len(index)), (index[:, 0], index[:, 1])),
+        shape=(size, size),
+    )
+    counts = numpy.asarray(follows.sum(axis=0)).ravel()
+    scale = numpy.zeros(size)
+    scale[counts > 0] = 1 / numpy.sqrt(counts[counts > 0])
+    normalized = follows @ sparse.diags(scale)
+    similarity = (normalized.T @ normalized).tocoo()
+    off_diagonal = similarity.row != similarity.col
+    similarity = sparse.csr_matrix(
+        (
+            similarity.data[off_diagonal],
+            (similarity.row[off_diagonal], similarity.col[off_diagonal]),
+        ),
+        shape=(size, size),
+    )
+    scores = (
+        fof_weight * (follows @ follows)
+        + cofollow_weight * (follows @ similarity)
+    ).tocsr()
+    scores = (scores - scores.multiply(follows)).tocoo()
+    keep = (scores.row != scores.col) & (scores.data > 0)
+    rows = scores.row[keep]
+    cols = scores.col[keep]
+    data = scores.data[keep]
+    # Внутри строки — по убыванию веса, при равенстве по id автора.
+    order = numpy.lexsort((ids[cols], -data, rows))
+    rows, cols, data = rows[order], cols[order], data[order]
+    rank = numpy.arange(len(rows)) - numpy.searchsorted(rows, rows)
+    result = defaultdict(list)
+    for row, col, score in zip(
+        rows[rank < limit], cols[rank < limit], data[rank < limit]
+    ):
+        result[int(ids[row])].append((int(ids[col]), float(score)))
+    return dict(result)
+
+
+def _store(scores):
+    Suggestion.objects.bulk_create(
+        (
+            Suggestion(user_id=user_id, author_id=author_id, score=score)
+            for user_id, top in scores.items()
+            for author_id, score in top
+        ),
+        batch_size=bulk_batch_size(Suggestion, settings.FEED_BATCH_SIZE),
+    )
+
+
+def rebuild():
+    """Пересчитывает рекомендации всех пользователей; вернёт число строк."""
+    edges = Follow.objects.values_list('user_id', 'author_id')
+    compute = matrix_scores if sparse is not None else python_scores
+    scores = compute(edges.iterator(), settings.SUGGESTIONS_PER_USER)
+    with transaction.atomic():
+        Suggestion.objects.all().delete()
+        _store(scores)
+    return sum(len(top) for top in scores.values())
+
+
+def refresh(user_id):
+    """Пересчитывает рекомендации одного пользователя по его подграфу.
+
+    Одним запросом читаются подписки пользователя, его авторов и
+    подписчиков этих авторов вместе с числом подписчиков каждого
+    автора из ``UserStats``.
+    """
+    following = Follow.objects.filter(user_id=user_id).values('author_id')
+    sample = (
+        Follow.objects.filter(author_id__in=following)
+        .order_by('-pk')
+        .values('user_id')[:settings.SUGGESTIONS_REFRESH_SAMPLE]
+    )
+    edges = Follow.objects.filter(
+        Q(user_id=user_id)
+        | Q(user_id__in=following)
+        | Q(user_id__in=sample)
+    ).values_list('user_id', 'author_id', 'author__stats__followers_count')
+    counts = {}
+    pairs = []
+    for follower_id, author_id, count in edges:
+        counts[author_id] = count or 1
+        pairs.append((follower_id, author_id))
+    follows, followers = _graph(pairs)
+    top = _top(
+        user_id, follows, followers, counts, settings.SUGGESTIONS_PER_USER
+    )
+    with transaction.atomic():
+        Suggestion.objects.filter(user_id=user_id).delete()
+        _store({user_id: top})
+
+
+def refresh_on_commit(user_id):
+    """Пересчитывает рекомендации пользователя после коммита подписки."""
+    transaction.on_commit(lambda: refresh(user_id))
+
+
+def for_user(user):
+    """Рекомендации для страницы: один запрос по индексу (user, -score)."""
+    return (
+        user.suggestions.select_related('author')
+        .order_by('-score')[:settings.SUGGESTIONS_ON_PAGE]
+    )
@@ -0,0 +1,254 @@
+"""RSS- и Atom-ленты: общая, групп и авторов.
+
+Лента пишется кусками из ``values_list().iterator()``: ни queryset
+целиком, ни объекты моделей не создаются, а шапка уходит клиенту до
+чтения постов. Состояние ленты (ETag, Last-Modified, заголовки, а после
+первой отдачи и само тело) лежит в кэше под номером поколения
+``posts.cache``, которое меняет любая запись в посты и группы. Пока
+поколение не сменилось, опрос ленты не обращается к базе: без изменений
+ответ 304, иначе тело из кэша.
+"""
+import hashlib
+import io
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.text import Truncator
+from django.utils.xmlutils import SimplerXMLGenerator
+
+from .cache import get_generation
+from .models import Group, Post
+
+User = get_user_model()
+
+# Столько текста копится в буфере, прежде чем уйти клиенту.
+CHUNK_SIZE = 16 * 1024
+TITLE_WORDS = 8
+
+
+class StreamingFeed:
+    """Лента, которая пишется кусками: шапка, записи, закрывающие теги."""
+
+    def __init__(self, *args, last_modified=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.last_modified = last_modified
+
+    def latest_post_date(self):
+        # Записи не копятся в self.items, дата известна заранее.
+        return self.last_modified or super().latest_post_date()
+
+    def stream(self, entries):
+        buffer = io.StringIO()
+        handler = SimplerXMLGenerator(buffer, 'utf-8')
+        handler.startDocument()
+        self.start(handler)
+        yield _drain(buffer)
+        for entry in entries:
+            self.add_item(**entry)
+            self.write_item(handler, self.items.pop())
+            if buffer.tell() >= CHUNK_SIZE:
+                yield _drain(buffer)
+        self.end(handler)
+        yield _drain(buffer)
+
+
+class RssFeed(StreamingFeed, Rss201rev2Feed):
+    def start(self, handler):
+        handler.startElement('rss', self.rss_attributes())
+        handler.startElement('channel', self.root_attributes())
+        self.add_root_elements(handler)
+
+    def write_item(self, handler, item):
+        handler.startElement('item', self.item_attributes(item))
+        self.add_item_elements(handler, item)
+        handler.endElement('item')
+
+    def end(self, handler):
+        self.endChannelElement(handler)
+        handler.endElement('rss')
+
+
+class AtomFeed(StreamingFeed, Atom1Feed):
+    def start(self, handler):
+        handler.startElement('feed', self.root_attributes())
+        self.add_root_elements(handler)
+
+    def write_item(self, handler, item):
+        handler.startElement('entry', self.item_attributes(item))
+        self.add_item_elements(handler, item)
+        handler.endElement('entry')
+
+    def end(self, handler):
+        handler.endElement('feed')
+
+
+FORMATS = {'rss': RssFeed, 'atom': AtomFeed}
+
+
+def _drain(buffer):
+    text = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return text.encode()
+
+
+def _cache():
+    return caches[settings.FEED_CACHE_ALIAS]
+
+
+def _scope(slug, username):
+    """Заголовок, описание и страница ленты и фильтр её постов."""
+    if slug is not None:
+        try:
+            group = Group.objects.values('pk', 'title', 'description').get(
+                slug=slug
+            )
+        except Group.DoesNotExist:
+            return None
+        return {
+            'title': f'Yatube: {group["title"]}',
+            'description': group['description'],
+            'link': reverse('posts:group_list', args=[slug]),
+            'filter': {'group_id': group['pk']},
+        }
+    if username is not None:
+        try:
+            author = User.objects.values_list('pk', flat=True).get(
+                username=username
+            )
+        except User.DoesNotExist:
+            return None
+        return {
+            'title': f'Yatube: {username}',
+            'description': f'Посты пользователя {username}',
+            'link': reverse('posts:profile', args=[username]),
+            'filter': {'author_id': author},
+        }
+    return {
+        'title': 'Yatube',
+        'description': 'Последние обновления на сайте',
+        'link': reverse('posts:index'),
+        'filter': {},
+    }
+
+
+def _posts(scope):
+    # Последние посты ленты, по тем же индексам, что и HTML-страницы.
+    return (
+        Post.objects.filter(**scope['filter'])
+        .order_by('-pub_date', '-id')[:settings.SYNDICATION_ITEMS]
+    )
+
+
+def _load_state(request, feed_format, slug, username):
+    # Ссылки в теле абсолютные: http и https — разные ленты.
+    parts = (
+        get_generation(),
+        request.scheme,
+        request.get_host(),
+        feed_format,
+        slug,
+        username,
+    )
+    key = 'syndication:' + hashlib.md5(repr(parts).encode()).hexdigest()
+    state = _cache().get(key)
+    if state is not None:
+        return state
+    scope = _scope(slug, username)
+    if scope is None:
+        return None
+    # В ленте и названия групп постов: переименование группы меняет
+    # категории записей.
+    window = list(_posts(scope).values_list('id', 'updated', 'group__title'))
+    # ETag зависит от данных, а не от поколения: запись в другую ленту
+    # сменит поколение, но не ETag этой.
+    etag = hashlib.md5(
+        repr((parts[1:], scope['title'], scope['description'], window))
+        .encode()
+    ).hexdigest()
+    state = {
+        'key': key,
+        'etag': etag,
+        'last_modified': max(
+            (updated for _, updated, _ in window), default=None
+        ),
+        'scope': scope,
+    }
+    _cache().set(key, state, settings.FEED_CACHE_TIMEOUT)
+    return state
+
+
+def feed_state(request, feed_format, slug=None, username=None):
+    """Состояние ленты из кэша или базы; None, если группы или автора
+    нет. Считается один раз на запрос."""
+    if not hasattr(request, '_feed_state'):
+        request._feed_state = _load_state(
+            request, feed_format, slug, username
+        )
+    return request._feed_state
+
+
+def etag(request, **kwargs):
+    state = feed_state(request, **kwargs)
+    return state and state['etag']
+
+
+def last_modified(request, **kwargs):
+    state = feed_state(request, **kwargs)
+    return state and state['last_modified']
+
+
+def _entries(scope, base):
+    rows = _posts(scope).values_list(
+        'pk', 'text', 'pub_date', 'updated', 'author__username', 'group__title'
+    )
+    for pk, text, pub_date, updated, author, group in rows.iterator():
+        link = base + reverse('posts:post_detail', args=[pk])
+        yield {
+            'title': Truncator(text).words(TITLE_WORDS),
+            'link': link,
+            'description': text,
+            'author_name': author,
+            'pubdate': pub_date,
+            'updateddate': updated,
+            'unique_id': link,
+            'categories': [group] if group else (),
+        }
+
+
+def _store(chunks, state):
+    """Отдаёт куски и, если лента дописана до конца, кладёт её в кэш."""
+    body = []
+    for chunk in chunks:
+        body.append(chunk)
+        yield chunk
+    _cache().set(
+        state['key'],
+        {**state, 'body': b''.join(body)},
+        settings.FEED_CACHE_TIMEOUT,
+    )
+
+
+def response(request, feed_format, state):
+    content_type = FORMATS[feed_format].content_type
+    if 'body' in state:
+        return HttpResponse(state['body'], content_type=content_type)
+    scope = state['scope']
+    base = request.build_absolute_uri('/')[:-1]
+    feed = FORMATS[feed_format](
+        title=scope['title'],
+        link=base + scope['link'],
+        description=scope['description'],
+        # Без строки запроса: ?utm=... первого читателя попал бы в кэш.
+        feed_url=base + request.path,
+        language=settings.LANGUAGE_CODE,
+        last_modified=state['last_modified'],
+    )
+    chunks = feed.stream(_entries(scope, base))
+    return StreamingHttpResponse(
+        _store(chunks, state), content_type=content_type
+    )
@@ -0,0 +1,10 @@
+from django import template
+
+from posts.thumbnails import get_feed_image
+
+register = template.Library()
+
+
+@register.simple_tag
+def feed_image(image):
+    return get_feed_image(image)
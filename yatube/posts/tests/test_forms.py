@@ -1,13 +1,21 @@
+import io
 import shutil
+import struct
 import tempfile
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings,
+)
 from django.urls import reverse
+from PIL import Image, ImageSequence, PngImagePlugin
 
-from posts.models import Follow, Group, Post
+from posts import images, thumbnails
+from posts.models import FeedEntry, Follow, Group, Post
 
 User = get_user_model()
 
@@ -159,3 +167,233 @@ class TestFollow(TestCase):
             user=self.user_foller, author=self.user_folling
         ).count()
         self.assertEqual(self.count, 0)
+
+    def test_feed_entries_follow_subscriptions(self):
+        """Лента заполняется при подписке и публикации, чистится отпиской."""
+        Post.objects.create(text='Старый пост', author=self.user_folling)
+        Follow.objects.create(user=self.user_foller, author=self.user_folling)
+        Post.objects.create(text='Новый пост', author=self.user_folling)
+        entries = FeedEntry.objects.filter(user=self.user_foller)
+        self.assertEqual(entries.count(), 2)
+
+        self.authorized_client_foller.get(
+            reverse(
+                'posts:profile_unfollow', args={self.user_folling.username}
+            )
+        )
+        self.assertFalse(entries.exists())
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_popular_author_posts_are_pulled_on_read(self):
+        """Посты популярных авторов дочитываются в ленту при открытии."""
+        Follow.objects.create(user=self.user_foller, author=self.user_folling)
+        post = Post.objects.create(text='Пост', author=self.user_folling)
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+
+        response = self.authorized_client_foller.get(
+            reverse('posts:follow_index')
+        )
+        self.assertEqual(list(response.context['page_obj']), [post])
+        self.assertTrue(FeedEntry.objects.filter(post=post).exists())
+
+
+def photo(size=(300, 200), orientation=None):
+    """JPEG с EXIF, как с телефона: модель камеры и, возможно, поворот."""
+    image = Image.new('RGB', size, (200, 30, 30))
+    exif = image.getexif()
+    exif[0x0110] = 'Camera'
+    if orientation:
+        exif[images.ORIENTATION] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', exif=exif)
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_MAX_SIZE=100)
+class ImageProcessingTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_upload_drops_exif_and_caps_size(self):
+        user = User.objects.create_user(username='photographer')
+        client = Client()
+        client.force_login(user)
+        uploaded = SimpleUploadedFile(
+            'photo.jpg', photo(), content_type='image/jpeg'
+        )
+        client.post(
+            reverse('posts:post_create'),
+            {'text': 'Фото', 'image': uploaded},
+        )
+        post = Post.objects.get(author=user)
+        self.assertEqual(post.image.name, 'posts/photo.jpg')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (100, 67))
+            self.assertNotIn('exif', image.info)
+
+    def test_orientation_is_applied(self):
+        data = images.normalize(photo(size=(80, 40), orientation=6))
+        with Image.open(io.BytesIO(data)) as image:
+            self.assertEqual(image.size, (40, 80))
+            self.assertEqual(dict(image.getexif()), {})
+
+    def test_clean_image_is_kept_as_is(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (50, 50)).save(buffer, 'PNG')
+        self.assertIsNone(images.normalize(buffer.getvalue()))
+
+    def test_xmp_is_dropped(self):
+        xmp = b'<x:xmpmeta xmlns:x="adobe:ns:meta/">GPS</x:xmpmeta>'
+        segment = images.XMP_HEADER + xmp
+        jpeg = photo(size=(50, 50))
+        # Сегмент APP1 с XMP сразу после SOI; Pillow его не пишет.
+        jpeg = (
+            jpeg[:2] + b'\xff\xe1'
+            + (len(segment) + 2).to_bytes(2, 'big') + segment + jpeg[2:]
+        )
+        info = PngImagePlugin.PngInfo()
+        info.add_itxt('XML:com.adobe.xmp', xmp.decode())
+        png = io.BytesIO()
+        Image.new('RGB', (50, 50)).save(png, 'PNG', pnginfo=info)
+        for data in (jpeg, png.getvalue()):
+            with self.subTest(data=data[:4]):
+                cleaned = images.normalize(data)
+                self.assertNotIn(b'GPS', cleaned)
+                self.assertIsNone(images.normalize(cleaned))
+
+    def test_small_animation_is_kept_as_is(self):
+        self.assertIsNone(images.normalize(animation('GIF', (50, 50))))
+
+    def test_animation_keeps_frames(self):
+        data = images.normalize(animation('GIF', (200, 200), loop=0))
+        with Image.open(io.BytesIO(data)) as image:
+            self.assertEqual(image.size, (100, 100))
+            self.assertEqual(image.n_frames, 2)
+            self.assertEqual(image.info['loop'], 0)
+            durations = []
+            for frame in ImageSequence.Iterator(image):
+                durations.append(frame.info['duration'])
+            self.assertEqual(durations, [100, 200])
+
+    def test_animation_drops_exif_from_every_frame(self):
+        exif = Image.Exif()
+        exif[0x0110] = 'Camera'
+        data = images.normalize(animation('PNG', (50, 50), exif=exif))
+        self.assertNotIn(b'Camera', data)
+        with Image.open(io.BytesIO(data)) as image:
+            self.assertEqual(image.n_frames, 2)
+            self.assertNotIn('exif', image.info)
+
+    def test_mpo_keeps_primary_frame_as_jpeg(self):
+        data = mpo()
+        with Image.open(io.BytesIO(data)) as image:
+            self.assertEqual(image.format, 'MPO')
+            self.assertEqual(image.n_frames, 2)
+        data = images.normalize(data)
+        with Image.open(io.BytesIO(data)) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (100, 50))
+            self.assertNotIn('exif', image.info)
+
+    def test_process_stored(self):
+        name = default_storage.save('posts/old.jpg', io.BytesIO(photo()))
+        self.assertTrue(images.process_stored(name))
+        with default_storage.open(name) as stored:
+            self.assertEqual(Image.open(stored).size, (100, 67))
+        self.assertFalse(images.process_stored(name))
+
+    def test_failed_process_stored_keeps_original(self):
+        original = photo()
+        name = default_storage.save('posts/kept.jpg', io.BytesIO(original))
+        with mock.patch('posts.images.os.replace', side_effect=OSError):
+            with self.assertRaises(OSError):
+                images.process_stored(name)
+        with default_storage.open(name) as stored:
+            self.assertEqual(stored.read(), original)
+        self.assertFalse(default_storage.exists(f'{name}.tmp'))
+
+
+def mpo():
+    """Снимок MPO, как с телефона: основной кадр с EXIF и кадр глубины.
+
+    Pillow не пишет MPO, поэтому индекс кадров (APP2 «MPF») собирается
+    вручную сразу за SOI основного кадра.
+    """
+    primary = photo(size=(200, 100))
+    depth = io.BytesIO()
+    Image.new('L', (200, 100)).save(depth, 'JPEG')
+    depth = depth.getvalue()
+    # Заголовок TIFF, IFD из трёх тегов, затем две записи MPEntry.
+    header_size = 8 + 2 + 3 * 12 + 4
+    segment_size = 2 + 4 + header_size + 2 * 16
+    first_size = len(primary) + 2 + segment_size
+    # Смещения кадров считаются от заголовка TIFF внутри APP2.
+    mp_offset = 2 + 2 + 2 + 4
+    entries = struct.pack(
+        '>IIIHH', 0x030000, first_size, 0, 0, 0
+    ) + struct.pack(
+        '>IIIHH', 0x020002, len(depth), first_size - mp_offset, 0, 0
+    )
+    ifd = b''.join((
+        b'MM\x00\x2a', struct.pack('>I', 8), struct.pack('>H', 3),
+        struct.pack('>HHI4s', 0xB000, 7, 4, b'0100'),
+        struct.pack('>HHII', 0xB001, 4, 1, 2),
+        struct.pack('>HHII', 0xB002, 7, len(entries), header_size),
+        struct.pack('>I', 0),
+    ))
+    segment = b'\xff\xe2' + struct.pack('>H', segment_size) + b'MPF\x00'
+    return primary[:2] + segment + ifd + entries + primary[2:] + depth
+
+
+def animation(format_, size, **options):
+    """Анимация из двух кадров по 100 и 200 мс."""
+    frames = [Image.new('RGB', size, color) for color in ('red', 'blue')]
+    buffer = io.BytesIO()
+    frames[0].save(
+        buffer,
+        format_,
+        save_all=True,
+        append_images=frames[1:],
+        duration=[100, 200],
+        **options,
+    )
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=True)
+class ThumbnailQueueTests(TransactionTestCase):
+    """Варианты загруженной картинки строит пул, а не запрос."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='uploader')
+        self.client.force_login(self.user)
+        for name in ('_submit', 'generate'):
+            patcher = mock.patch.object(thumbnails, name)
+            setattr(self, name.strip('_'), patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def upload(self, address, name):
+        self.client.post(address, {
+            'text': 'Фото',
+            'image': SimpleUploadedFile(name, photo(size=(50, 50))),
+        })
+
+    def test_create_and_edit_queue_thumbnails(self):
+        self.upload(reverse('posts:post_create'), 'created.jpg')
+        post = Post.objects.get(author=self.user)
+        self.submit.assert_called_once_with(post.image.name)
+        self.upload(
+            reverse('posts:post_edit', args=[post.pk]), 'edited.jpg'
+        )
+        post.refresh_from_db()
+        self.submit.assert_called_with(post.image.name)
+        self.assertEqual(self.submit.call_count, 2)
+        self.generate.assert_not_called()
@@ -1,7 +1,10 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import Client, TestCase
 
-from posts.models import Group, Post
+from posts.models import Comment, Follow, Group, Post, UserStats
 
 User = get_user_model()
 
@@ -34,3 +37,70 @@ class PostModelTests(TestCase):
         post = PostModelTests.post
         expected_object_post_name = post.text[:15]
         self.assertEqual(expected_object_post_name, str(post))
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются при создании и удалении записей."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='Ответ')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        stats = UserStats.objects.get(user=self.author)
+        self.assertEqual(stats.posts_count, 1)
+        self.assertEqual(stats.followers_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 1
+        )
+
+        follow.delete()
+        post.comments.all().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        stats.refresh_from_db()
+        self.assertEqual(stats.followers_count, 0)
+
+        post.delete()
+        stats.refresh_from_db()
+        self.assertEqual(stats.posts_count, 0)
+
+    def test_comment_keeps_microseconds_in_updated(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='Ответ')
+        post.refresh_from_db()
+        self.assertNotEqual(post.updated.microsecond, 0)
+
+    def test_drifted_counters_stay_non_negative(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Ответ'
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        UserStats.objects.update(followers_count=0, following_count=0)
+        Post.objects.filter(pk=post.pk).update(comments_count=0)
+        follow.delete()
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 0
+        )
+
+    def test_recount_repairs_drift(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='Ответ')
+        UserStats.objects.filter(user=self.author).update(posts_count=42)
+        Post.objects.filter(pk=post.pk).update(comments_count=42)
+        call_command('recount_stats', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1
+        )
@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import registry
+from posts.models import Comment, Follow, Group, Post
+from posts.urls import urlpatterns
+
+User = get_user_model()
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class QueryBudgetTests(TestCase):
+    """Каждый view приложения posts укладывается в свой бюджет SQL."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='budget', description='Описание'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(15):
+            cls.post = Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}'
+            )
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Ответ {i}'
+            )
+        cls.own_post = Post.objects.create(author=cls.user, text='Свой пост')
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def requests(self):
+        post = {'post_id': self.post.pk}
+        own_post = {'post_id': self.own_post.pk}
+        author = {'username': self.author.username}
+        return [
+            ('get', 'posts:index', {}, {}),
+            ('get', 'posts:group_list', {'slug': self.group.slug}, {}),
+            ('get', 'posts:profile', author, {}),
+            ('get', 'posts:post_detail', post, {}),
+            ('get', 'posts:post_comments', post, {}),
+            ('get', 'posts:post_comments', post, {'format': 'json'}),
+            ('get', 'posts:post_create', {}, {}),
+            ('post', 'posts:post_create', {}, {'text': 'Новый пост'}),
+            ('get', 'posts:post_edit', own_post, {}),
+            ('post', 'posts:post_edit', own_post, {'text': 'Правка'}),
+            ('post', 'posts:add_comment', post, {'text': 'Комментарий'}),
+            ('get', 'posts:follow_index', {}, {}),
+            ('get', 'posts:search', {}, {'q': 'Пост'}),
+            ('get', 'posts:search_api', {}, {'q': 'Пост'}),
+            ('get', 'posts:index_rss', {}, {}),
+            ('get', 'posts:group_atom', {'slug': self.group.slug}, {}),
+            ('get', 'posts:profile_rss', author, {}),
+            ('get', 'posts:profile_unfollow', author, {}),
+            ('get', 'posts:profile_follow', author, {}),
+        ]
+
+    def test_every_view_declares_budget(self):
+        for pattern in urlpatterns:
+            with self.subTest(view=pattern.name):
+                self.assertIsInstance(
+                    getattr(pattern.callback, 'query_budget', None), int
+                )
+
+    def test_views_stay_within_budget(self):
+        for client in (self.client, self.authorized_client):
+            for method, name, kwargs, data in self.requests():
+                with self.subTest(name=name, method=method):
+                    address = reverse(name, kwargs=kwargs)
+                    getattr(client, method)(address, data)
+        stats = registry.snapshot()
+        self.assertEqual(stats['posts:index']['budget_exceeded'], 0)
+        self.assertEqual(stats['posts:index']['requests'], 2)
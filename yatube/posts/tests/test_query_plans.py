@@ -0,0 +1,96 @@
+import re
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# «SCAN posts_post» без индекса — полный просмотр таблицы; сканы
+# виртуальных таблиц FTS5 и констант полным просмотром не считаются.
+FULL_SCAN = re.compile(r'\bSCAN (?!CONSTANT ROW)(\S+)(?!.*\bINDEX\b)')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN SQLite')
+class FeedQueryPlanTests(TestCase):
+    """Запросы лент идут по индексам: без полных просмотров и сортировок."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='plans', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(settings.POSTS_ON_PAGE * 2):
+            cls.post = Post.objects.create(
+                author=cls.author,
+                group=cls.group if i % 2 else None,
+                text=f'Пост {i}',
+            )
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text=f'Ответ {i}'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def assertIndexedPlans(self, client, address):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(address)
+        self.assertEqual(response.status_code, 200)
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            plan = explain(sql)
+            with self.subTest(address=address, sql=sql):
+                for line in plan:
+                    self.assertNotIn(TEMP_SORT, line, plan)
+                    scan = FULL_SCAN.search(line)
+                    self.assertIsNone(scan, plan)
+
+    def feed_addresses(self):
+        index = reverse('posts:index')
+        group = reverse('posts:group_list', args=[self.group.slug])
+        profile = reverse('posts:profile', args=[self.author.username])
+        follow = reverse('posts:follow_index')
+        addresses = []
+        for address in (index, group, profile, follow):
+            page_obj = self.reader_client.get(address).context['page_obj']
+            paginator = page_obj.paginator
+            addresses += [
+                address,
+                f'{address}?after={paginator.next_cursor}',
+                f'{address}?before={paginator.next_cursor}',
+                f'{address}?page=2',
+            ]
+        return addresses
+
+    def test_feed_queries_use_indexes(self):
+        for address in self.feed_addresses():
+            cache.clear()
+            self.assertIndexedPlans(self.reader_client, address)
+
+    def test_post_detail_queries_use_indexes(self):
+        address = reverse('posts:post_detail', args=[self.post.pk])
+        self.assertIndexedPlans(self.client, address)
+        self.assertIndexedPlans(self.reader_client, address)
@@ -0,0 +1,129 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from posts import suggestions
+from posts.models import Follow, Suggestion
+
+User = get_user_model()
+
+# 1 → 2, 2 → 3, 2 → 4, 5 → 2, 5 → 3
+EDGES = [(1, 2), (2, 3), (2, 4), (5, 2), (5, 3)]
+# Посчитано вручную: друзья друзей плюс косинус по общим подписчикам.
+EXPECTED = {
+    1: [(3, 1 + 1 / 2), (4, 1.0)],
+    5: [(4, 1 + 1 / 2 ** 0.5)],
+}
+
+
+class SuggestionScoreTests(SimpleTestCase):
+    def assertScores(self, scores, expected):
+        self.assertEqual(scores.keys(), expected.keys())
+        for user_id, top in expected.items():
+            with self.subTest(user_id=user_id):
+                self.assertEqual(
+                    [author for author, _ in scores[user_id]],
+                    [author for author, _ in top],
+                )
+                for (_, score), (_, value) in zip(scores[user_id], top):
+                    self.assertAlmostEqual(score, value)
+
+    def test_python_scores(self):
+        self.assertScores(suggestions.python_scores(EDGES, 10), EXPECTED)
+        self.assertScores(
+            suggestions.python_scores(EDGES, 1),
+            {1: EXPECTED[1][:1], 5: EXPECTED[5]},
+        )
+
+    @skipUnless(suggestions.sparse, 'нужен пакет scipy')
+    def test_matrix_scores_match_python(self):
+        self.assertScores(suggestions.matrix_scores(EDGES, 10), EXPECTED)
+        self.assertEqual(suggestions.matrix_scores([], 10), {})
+
+
+class SuggestionStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = {
+            number: User.objects.create_user(username=f'user-{number}')
+            for number in range(1, 6)
+        }
+        for user, author in EDGES:
+            Follow.objects.create(
+                user=cls.users[user], author=cls.users[author]
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def stored(self, number):
+        return [
+            (row.author.username, row.score)
+            for row in suggestions.for_user(self.users[number])
+        ]
+
+    def expected(self, number):
+        return [
+            (self.users[author].username, score)
+            for author, score in EXPECTED.get(number, [])
+        ]
+
+    def test_rebuild_stores_top_suggestions(self):
+        out = StringIO()
+        call_command('rebuild_suggestions', stdout=out)
+        self.assertIn('Сохранено рекомендаций: 3', out.getvalue())
+        for number in self.users:
+            with self.subTest(number=number):
+                stored = self.stored(number)
+                expected = self.expected(number)
+                self.assertEqual(
+                    [name for name, _ in stored],
+                    [name for name, _ in expected],
+                )
+                for (_, score), (_, value) in zip(stored, expected):
+                    self.assertAlmostEqual(score, value)
+
+    def test_refresh_matches_rebuild(self):
+        suggestions.rebuild()
+        rebuilt = self.stored(1)
+        Suggestion.objects.all().delete()
+        suggestions.refresh(self.users[1].pk)
+        self.assertEqual(
+            [name for name, _ in self.stored(1)],
+            [name for name, _ in rebuilt],
+        )
+        for (_, score), (_, value) in zip(self.stored(1), rebuilt):
+            self.assertAlmostEqual(score, value)
+        Follow.objects.filter(user=self.users[1]).delete()
+        suggestions.refresh(self.users[1].pk)
+        self.assertEqual(self.stored(1), [])
+
+    def test_follow_index_shows_suggestions(self):
+        suggestions.rebuild()
+        self.client.force_login(self.users[1])
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'Кого почитать')
+        self.assertContains(
+            response, reverse('posts:profile', args=['user-3'])
+        )
+
+
+class SuggestionRefreshTests(TransactionTestCase):
+    def test_follow_and_unfollow_refresh_suggestions(self):
+        reader, author, other = (
+            User.objects.create_user(username=name)
+            for name in ('reader', 'author', 'other')
+        )
+        Follow.objects.create(user=author, author=other)
+        self.client.force_login(reader)
+        self.client.get(reverse('posts:profile_follow', args=['author']))
+        authors = reader.suggestions.values_list('author__username')
+        self.assertEqual(list(authors), [('other',)])
+        self.client.get(reverse('posts:profile_unfollow', args=['author']))
+        self.assertFalse(reader.suggestions.exists())
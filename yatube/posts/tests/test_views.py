@@ -1,3 +1,4 @@
+import base64
 import shutil
 import tempfile
 
@@ -9,11 +10,16 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from posts.models import Comment, Group, Post
+from posts import search, thumbnails
+from posts.models import Comment, Follow, Group, Post
 
 User = get_user_model()
 
 
+def encode_cursor(raw):
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
 class PostViewTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -133,22 +139,23 @@ class PostViewTests(TestCase):
         self.assertEqual(first_comment.text, form_data['comment'])
 
     def test_cache(self):
-        """Проверяем кэширование index."""
+        """Проверяем кэширование index и его сброс при записи."""
 
         response = self.authorized_client.get(reverse('posts:index'))
         first_time_data = response.content
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        response = self.authorized_client.get(reverse('posts:index'))
+        second_time_data = response.content
+        self.assertEqual(first_time_data, second_time_data)
         Post.objects.create(
             group=self.group,
             author=self.user,
             text='Текст поста жи есть',
         )
         response = self.authorized_client.get(reverse('posts:index'))
-        second_time_data = response.content
-        self.assertEqual(first_time_data, second_time_data)
-        cache.clear()
-        response = self.authorized_client.get(reverse('posts:index'))
         third_time_data = response.content
-        self.assertFalse(first_time_data == third_time_data)
+        self.assertIn('Текст поста жи есть', third_time_data.decode())
+        self.assertIn('Без сигналов', third_time_data.decode())
 
 
 class PaginatorViewsTest(TestCase):
@@ -171,6 +178,7 @@ class PaginatorViewsTest(TestCase):
             )
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -187,6 +195,488 @@ class PaginatorViewsTest(TestCase):
         else:
             self.assertEqual(posts_count, settings.POSTS_ON_PAGE)
 
+    def test_cursor_pages_follow_each_other(self):
+        """Курсорные страницы не пересекаются и листаются в обе стороны."""
+        response = self.client.get(reverse('posts:index'))
+        first_page = response.context['page_obj']
+        paginator = first_page.paginator
+        self.assertFalse(paginator.has_previous)
+        self.assertTrue(paginator.has_next)
+
+        response = self.client.get(
+            reverse('posts:index') + f'?after={paginator.next_cursor}'
+        )
+        second_page = response.context['page_obj']
+        self.assertEqual(len(second_page), self.remaining_posts)
+        self.assertFalse(second_page.paginator.has_next)
+        self.assertTrue(second_page.paginator.has_previous)
+        first_ids = {post.pk for post in first_page}
+        self.assertFalse(first_ids & {post.pk for post in second_page})
+
+        response = self.client.get(
+            reverse('posts:index')
+            + f'?before={second_page.paginator.previous_cursor}'
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [post.pk for post in first_page],
+        )
+
+    def test_broken_cursor_returns_first_page(self):
+        cursors = [
+            'broken',
+            # Дата, которой не бывает.
+            encode_cursor('2020-02-30T00:00:00|5'),
+            # id больше 64 бит.
+            encode_cursor(f'2020-01-01T00:00:00|{2 ** 64}'),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    reverse('posts:index'), {'after': cursor}
+                )
+                self.assertEqual(
+                    len(response.context['page_obj']),
+                    settings.POSTS_ON_PAGE,
+                )
+
+
+class FeedQueryCountTests(TestCase):
+    """Число запросов на страницу ленты не зависит от числа постов."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='queries', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(settings.POSTS_ON_PAGE + 1):
+            author = User.objects.create_user(username=f'author-{i}')
+            post = Post.objects.create(
+                author=cls.author if i % 2 else author,
+                group=cls.group if i % 3 else None,
+                text=f'Пост {i}',
+            )
+            Comment.objects.create(post=post, author=author, text='Ответ')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_anonymous_feed_query_count(self):
+        pages = {
+            reverse('posts:index'): 1,
+            reverse('posts:group_list', args={self.group.slug}): 3,
+            reverse('posts:profile', args={self.author.username}): 4,
+        }
+        for address, queries in pages.items():
+            with self.subTest(address=address):
+                with self.assertNumQueries(queries):
+                    self.client.get(address)
+
+    def test_follow_feed_query_count(self):
+        # Сессия уже в кэше, пользователь читается из базы один раз.
+        with self.assertNumQueries(5):
+            self.reader_client.get(reverse('posts:follow_index'))
+        with self.assertNumQueries(4):
+            response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            len(response.context['page_obj']), settings.POSTS_ON_PAGE // 2
+        )
+        post = response.context['page_obj'][0]
+        self.assertEqual(post.comments_count, 1)
+
+
+class ConditionalGetTests(TestCase):
+    """Неизменившиеся пост, группа и профиль отдаются ответом 304."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='conditional', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.pages = [
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+        ]
+
+    def etags(self, client):
+        return {
+            address: client.get(address)['ETag'] for address in self.pages
+        }
+
+    def test_not_modified_without_rendering(self):
+        for address in self.pages:
+            with self.subTest(address=address):
+                response = self.client.get(address)
+                with self.settings(PAGE_CACHE_ENABLED=False):
+                    with self.assertNumQueries(1):
+                        cached = self.client.get(
+                            address, HTTP_IF_NONE_MATCH=response['ETag']
+                        )
+                self.assertEqual(cached.status_code, 304)
+                # Из кэша страниц тот же ответ приходит без SQL.
+                with self.assertNumQueries(0):
+                    cached = self.client.get(
+                        address, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(cached.status_code, 304)
+
+    def test_no_last_modified(self):
+        # Дата не покрывает всего, от чего зависит страница: проверка
+        # только по If-Modified-Since отдала бы устаревшую страницу.
+        for address in self.pages:
+            with self.subTest(address=address):
+                response = self.client.get(address)
+                self.assertFalse(response.has_header('Last-Modified'))
+                response = self.client.get(
+                    address,
+                    HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT',
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_group_edit_and_post_delete_change_etag(self):
+        address = reverse('posts:group_list', args=[self.group.slug])
+        before = self.client.get(address)['ETag']
+        group = Group.objects.get(pk=self.group.pk)
+        group.description = 'Новое описание'
+        group.save()
+        edited = self.client.get(address)['ETag']
+        self.assertNotEqual(edited, before)
+        newer = Post.objects.create(
+            author=self.author, group=self.group, text='Новый'
+        )
+        with_newer = self.client.get(address)['ETag']
+        self.assertNotEqual(with_newer, edited)
+        newer.delete()
+        self.assertEqual(self.client.get(address)['ETag'], edited)
+
+    def test_group_rename_changes_post_etag(self):
+        address = reverse('posts:post_detail', args=[self.post.pk])
+        before = self.client.get(address)['ETag']
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        response = self.client.get(address, HTTP_IF_NONE_MATCH=before)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новое название')
+        renamed = response['ETag']
+        group.slug = 'new-slug'
+        group.save()
+        response = self.client.get(address, HTTP_IF_NONE_MATCH=renamed)
+        self.assertContains(
+            response, reverse('posts:group_list', args=['new-slug'])
+        )
+
+    def test_missing_page_is_not_found(self):
+        response = self.client.get(
+            reverse('posts:group_list', args=['missing']),
+            HTTP_IF_NONE_MATCH='*',
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_etag_depends_on_viewer(self):
+        self.assertNotEqual(
+            self.etags(self.client), self.etags(self.reader_client)
+        )
+
+    def test_edit_changes_etag(self):
+        before = self.etags(self.client)
+        self.author_client.post(
+            reverse('posts:post_edit', args=[self.post.pk]),
+            {'text': 'Новый текст', 'group': self.group.pk},
+        )
+        after = self.etags(self.client)
+        for address in self.pages:
+            with self.subTest(address=address):
+                self.assertNotEqual(before[address], after[address])
+
+    def test_comment_changes_etag(self):
+        before = self.etags(self.client)
+        self.reader_client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Ответ'},
+        )
+        after = self.etags(self.client)
+        for address in self.pages:
+            with self.subTest(address=address):
+                self.assertNotEqual(before[address], after[address])
+
+    def test_follow_changes_profile_etag(self):
+        address = reverse('posts:profile', args=[self.author.username])
+        before = self.reader_client.get(address)['ETag']
+        self.reader_client.post(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertNotEqual(
+            self.reader_client.get(address)['ETag'], before
+        )
+
+
+class SyndicationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='feeds', description='Описание группы'
+        )
+        cls.group_post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост в группе'
+        )
+        cls.other_post = Post.objects.create(
+            author=User.objects.create_user(username='other'),
+            text='Пост без группы',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_feeds_list_posts(self):
+        feeds = {
+            reverse('posts:index_rss'): 'application/rss+xml',
+            reverse('posts:index_atom'): 'application/atom+xml',
+        }
+        for address, content_type in feeds.items():
+            with self.subTest(address=address):
+                response = self.client.get(address)
+                self.assertTrue(response.streaming)
+                self.assertTrue(response['Content-Type'].startswith(
+                    content_type
+                ))
+                body = self.read(response)
+                self.assertIn('Пост в группе', body)
+                self.assertIn('Пост без группы', body)
+                self.assertIn(
+                    'http://testserver'
+                    + reverse('posts:post_detail', args=[self.group_post.pk]),
+                    body,
+                )
+
+    def test_group_and_author_feeds(self):
+        body = self.read(self.client.get(
+            reverse('posts:group_rss', args=[self.group.slug])
+        ))
+        self.assertIn('Пост в группе', body)
+        self.assertNotIn('Пост без группы', body)
+        body = self.read(self.client.get(
+            reverse('posts:profile_atom', args=['other'])
+        ))
+        self.assertIn('Пост без группы', body)
+        self.assertNotIn('Пост в группе', body)
+        for address in (
+            reverse('posts:group_rss', args=['missing']),
+            reverse('posts:profile_rss', args=['missing']),
+        ):
+            with self.subTest(address=address):
+                response = self.client.get(address)
+                self.assertEqual(response.status_code, 404)
+
+    @override_settings(SYNDICATION_ITEMS=1)
+    def test_items_limit(self):
+        body = self.read(self.client.get(reverse('posts:index_rss')))
+        self.assertEqual(body.count('<item>'), 1)
+        self.assertIn('Пост без группы', body)
+
+    def test_cached_feed_needs_no_queries(self):
+        address = reverse('posts:index_rss')
+        first = self.client.get(address)
+        body = self.read(first)
+        with self.assertNumQueries(0):
+            cached = self.client.get(address)
+            not_modified = self.client.get(
+                address, HTTP_IF_NONE_MATCH=first['ETag']
+            )
+        self.assertFalse(cached.streaming)
+        self.assertEqual(cached.content.decode(), body)
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_new_post_invalidates_feed(self):
+        address = reverse('posts:group_atom', args=[self.group.slug])
+        before = self.client.get(address)
+        self.read(before)
+        Post.objects.create(author=self.author, group=self.group, text='Новый')
+        response = self.client.get(
+            address, HTTP_IF_NONE_MATCH=before['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Новый', self.read(response))
+
+    def test_unrelated_write_keeps_etag(self):
+        address = reverse('posts:group_rss', args=[self.group.slug])
+        before = self.client.get(address)['ETag']
+        Post.objects.create(author=self.author, text='Вне группы')
+        response = self.client.get(address, HTTP_IF_NONE_MATCH=before)
+        self.assertEqual(response.status_code, 304)
+
+    def test_self_link_ignores_first_reader(self):
+        address = reverse('posts:index_atom')
+        body = self.read(self.client.get(address, {'utm_source': 'mail'}))
+        self.assertNotIn('utm_source', body)
+        body = self.read(self.client.get(address, secure=True))
+        self.assertIn(f'href="https://testserver{address}"', body)
+        self.assertNotIn('utm_source', body)
+        self.assertNotIn('http://testserver', body)
+
+    def test_group_rename_changes_etag(self):
+        addresses = (
+            reverse('posts:index_rss'),
+            reverse('posts:profile_atom', args=['author']),
+        )
+        before = {
+            address: self.client.get(address)['ETag']
+            for address in addresses
+        }
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        for address in addresses:
+            with self.subTest(address=address):
+                response = self.client.get(
+                    address, HTTP_IF_NONE_MATCH=before[address]
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Новое название', self.read(response))
+
+
+@override_settings(COMMENTS_ON_PAGE=3)
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=author, text='Вирусный пост')
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.create_user(username=f'reader-{i}'),
+                text=f'Ответ {i}',
+            )
+            for i in range(7)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_shows_first_page(self):
+        address = reverse('posts:post_detail', args=[self.post.pk])
+        with self.assertNumQueries(4):
+            response = self.client.get(address)
+        self.assertEqual(
+            list(response.context['comments']), self.comments[:3]
+        )
+        self.assertContains(
+            response, reverse('posts:post_comments', args=[self.post.pk])
+        )
+
+    def test_comment_pages_in_json(self):
+        address = reverse('posts:post_comments', args=[self.post.pk])
+        ids = []
+        cursor = ''
+        while cursor is not None:
+            response = self.client.get(
+                address, {'format': 'json', 'after': cursor}
+            )
+            data = response.json()
+            ids += [comment['id'] for comment in data['results']]
+            cursor = data['next']
+        self.assertEqual(ids, [comment.pk for comment in self.comments])
+        self.assertEqual(data['results'][0]['author'], 'reader-6')
+
+    def test_comment_page_fragment(self):
+        first = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        cursor = first.context['comments'].paginator.next_cursor
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk]),
+            {'after': cursor},
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertNotContains(response, '<html')
+        self.assertEqual(
+            list(response.context['comments']), self.comments[3:6]
+        )
+        self.assertContains(response, 'data-more-comments')
+
+    def test_comments_of_missing_post(self):
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk + 1])
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class SearchViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='searcher')
+        cls.in_text = Post.objects.create(
+            author=cls.user, text='Рецепт борща со свёклой'
+        )
+        cls.in_comment = Post.objects.create(
+            author=cls.user, text='Что приготовить на обед?'
+        )
+        Comment.objects.create(
+            post=cls.in_comment, author=cls.user, text='Сварите борщ'
+        )
+        Post.objects.create(author=cls.user, text='Совсем другое')
+
+    def test_search_ranks_posts_and_comments(self):
+        """Поиск находит слово в постах и комментариях, пост выше."""
+        response = self.client.get(reverse('posts:search'), {'q': 'борщ'})
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [self.in_text, self.in_comment],
+        )
+
+    def test_search_follows_edits_and_deletes(self):
+        post = Post.objects.get(pk=self.in_text.pk)
+        post.text = 'Рецепт окрошки'
+        post.save()
+        self.in_comment.comments.all().delete()
+        response = self.client.get(reverse('posts:search'), {'q': 'борщ'})
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_search_api(self):
+        response = self.client.get(reverse('posts:search_api'), {'q': 'обед'})
+        data = response.json()
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['results'][0]['id'], self.in_comment.pk)
+
+    def test_search_without_fts_falls_back_to_icontains(self):
+        search._available['default'] = False
+        try:
+            response = self.client.get(
+                reverse('posts:search'), {'q': 'борщ'}
+            )
+        finally:
+            search._available.clear()
+        self.assertEqual(
+            set(response.context['page_obj']), {self.in_text, self.in_comment}
+        )
+
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -262,3 +752,40 @@ class ImageViewTests(TestCase):
         )
         first_object = response.context['post']
         self.auxiliary_method(first_object)
+
+    def test_thumbnail_placeholder_until_generated(self):
+        """Пока миниатюры нет, вместо неё выводится заглушка."""
+        cache.clear()
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', args={self.post.pk})
+        )
+        self.assertContains(response, 'aspect-ratio: 960 / 339')
+
+        with self.settings(THUMBNAIL_ASYNC=False):
+            thumbnails.schedule(self.post.image.name)
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', args={self.post.pk})
+        )
+        self.assertNotContains(response, 'aspect-ratio: 960 / 339')
+        self.assertContains(response, '<img class="card-img my-2" src=')
+
+    def test_thumbnail_variants_in_srcset(self):
+        with self.settings(THUMBNAIL_ASYNC=False):
+            thumbnails.schedule(self.post.image.name)
+        with self.assertNumQueries(0):
+            image = thumbnails.get_feed_image(self.post.image)
+        self.assertEqual(image.srcset.count('.jpg '), 3)
+        for width in thumbnails.FEED_WIDTHS:
+            self.assertIn(f' {width}w', image.srcset)
+        self.assertIn(image.src, image.srcset)
+        self.assertEqual(
+            [mime for mime, _ in image.sources],
+            ['image/webp'] if 'WEBP' in thumbnails.formats() else [],
+        )
+        for _, srcset in image.sources:
+            self.assertEqual(srcset.count('.webp '), 3)
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', args={self.post.pk})
+        )
+        self.assertContains(response, f'sizes="{thumbnails.FEED_SIZES}"')
+        self.assertContains(response, 'srcset=')
@@ -0,0 +1,173 @@
+"""Миниатюры картинок постов, которые готовятся вне запроса.
+
+Для лент строится набор вариантов по ширине (``FEED_WIDTHS``) в WebP,
+если его умеет Pillow, и в JPEG для остальных браузеров; шаблон
+отдаёт их через ``srcset``, и телефон скачивает узкий вариант вместо
+широкого. Варианты новой картинки ставятся в очередь фонового пула
+потоков при загрузке, сразу после коммита. Шаблоны только читают
+готовую миниатюру из key-value хранилища sorl-thumbnail. Если её нет
+(старая картинка, вытесненная запись или пул ещё не успел),
+показывается заглушка, а миниатюры ставятся в очередь того же пула.
+"""
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from PIL import features
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from .cache import bump_generation
+
+logger = logging.getLogger(__name__)
+
+FEED_WIDTH = 960
+FEED_HEIGHT = 339
+FEED_WIDTHS = (320, 640, FEED_WIDTH)
+FEED_SIZES = f'(max-width: {FEED_WIDTH}px) 100vw, {FEED_WIDTH}px'
+FEED_OPTIONS = {'crop': 'center', 'upscale': True, 'quality': 80}
+MIME_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+
+FeedImage = namedtuple('FeedImage', 'src srcset sources sizes width height')
+
+_executor = None
+_pending = set()
+
+
+class PrecomputedThumbnailBackend(ThumbnailBackend):
+    def _options(self, source, options):
+        # Те же умолчания, что и в ThumbnailBackend.get_thumbnail, чтобы
+        # имя миниатюры совпало с тем, под которым её сохранит генерация.
+        options = dict(options)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return options
+
+    def thumbnail_name(self, file_, geometry_string, **options):
+        """Имя, под которым лежит или ляжет миниатюра; без ввода-вывода."""
+        source = ImageFile(file_)
+        options = self._options(source, options)
+        return self._get_thumbnail_filename(source, geometry_string, options)
+
+    def get_cached_thumbnail(self, file_, geometry_string, **options):
+        """Готовая миниатюра из хранилища или None, без обращения к Pillow."""
+        name = self.thumbnail_name(file_, geometry_string, **options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+backend = PrecomputedThumbnailBackend()
+
+
+def formats():
+    """Форматы вариантов; JPEG последний — он же ``src`` картинки."""
+    compact = ['WEBP'] if features.check_module('webp') else []
+    return compact + ['JPEG']
+
+
+def _geometry(width):
+    return f'{width}x{round(width * FEED_HEIGHT / FEED_WIDTH)}'
+
+
+def variants():
+    """(ширина, формат) в порядке построения: последним строится
+    JPEG шириной ``FEED_WIDTH``, и по нему видно, что готовы все."""
+    return [
+        (width, format_) for format_ in formats() for width in FEED_WIDTHS
+    ]
+
+
+def generate(name):
+    try:
+        for width, format_ in variants():
+            backend.get_thumbnail(
+                name, _geometry(width), format=format_, **FEED_OPTIONS
+            )
+        # Закэшированные фрагменты лент ещё показывают заглушку.
+        bump_generation()
+    except Exception:
+        logger.exception('Не удалось построить миниатюру %s', name)
+    finally:
+        _pending.discard(name)
+
+
+def _generate_in_thread(name):
+    try:
+        generate(name)
+    finally:
+        connection.close()
+
+
+def _submit(name):
+    global _executor
+    if name in _pending:
+        return
+    _pending.add(name)
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    _executor.submit(_generate_in_thread, name)
+
+
+def schedule(name):
+    """Ставит миниатюры в очередь после коммита текущей транзакции."""
+    if not name:
+        return
+    if settings.THUMBNAIL_ASYNC:
+        transaction.on_commit(lambda: _submit(name))
+    else:
+        generate(name)
+
+
+def _url(name, width, format_):
+    return default.storage.url(
+        backend.thumbnail_name(
+            name, _geometry(width), format=format_, **FEED_OPTIONS
+        )
+    )
+
+
+def get_feed_image(image):
+    """Варианты картинки для ленты или None, пока они не готовы.
+
+    Хранилище опрашивается один раз, про последний построенный вариант;
+    адреса остальных вычисляются по именам.
+    """
+    if not image:
+        return None
+    thumbnail = backend.get_cached_thumbnail(
+        image.name, _geometry(FEED_WIDTH), format='JPEG', **FEED_OPTIONS
+    )
+    if thumbnail is None:
+        schedule(image.name)
+        return None
+    srcsets = {
+        format_: ', '.join(
+            f'{_url(image.name, width, format_)} {width}w'
+            for width in FEED_WIDTHS
+        )
+        for format_ in formats()
+    }
+    return FeedImage(
+        src=thumbnail.url,
+        srcset=srcsets.pop('JPEG'),
+        sources=[
+            (MIME_TYPES[format_], srcset)
+            for format_, srcset in srcsets.items()
+        ],
+        sizes=FEED_SIZES,
+        width=FEED_WIDTH,
+        height=FEED_HEIGHT,
+    )
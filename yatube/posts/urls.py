@@ -8,6 +8,11 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments',
+    ),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
@@ -15,6 +20,8 @@ urlpatterns = [
         'posts/<int:post_id>/comment/', views.add_comment, name='add_comment'
     ),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search_posts, name='search'),
+    path('search/api/', views.search_api, name='search_api'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -26,3 +33,19 @@ urlpatterns = [
         name='profile_unfollow',
     ),
 ]
+
+# Ленты RSS и Atom: /rss/, /group/<slug>/atom/, /profile/<username>/rss/.
+urlpatterns += [
+    path(
+        f'{prefix}{feed_format}/',
+        views.post_feed,
+        {'feed_format': feed_format},
+        name=f'{name}_{feed_format}',
+    )
+    for prefix, name in (
+        ('', 'index'),
+        ('group/<slug:slug>/', 'group'),
+        ('profile/<str:username>/', 'profile'),
+    )
+    for feed_format in ('rss', 'atom')
+]
@@ -1,7 +1,165 @@
+import base64
+import binascii
+
 from django.conf import settings
 from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+CURSOR_ORDERING = ('-pub_date', '-id')
+# Комментарии читаются сверху вниз, от старых к новым.
+COMMENT_ORDERING = ('created', 'id')
+# Больше SQLite не свяжет как параметр: OverflowError.
+MAX_INTEGER = 2 ** 63 - 1
+
+
+def parse_cursor_value(field, part):
+    """Значение поля из курсора; None, если это не значение поля.
+
+    Невозможная дата (30 февраля) даёт ValueError из ``parse_datetime``.
+    """
+    if field.get_internal_type() == 'DateTimeField':
+        return parse_datetime(part)
+    if not part.lstrip('-').isdecimal():
+        return None
+    value = int(part)
+    return value if -MAX_INTEGER - 1 <= value <= MAX_INTEGER else None
+
+
+def bulk_batch_size(model, limit):
+    """Пачка для bulk_create не больше той, что примет СУБД.
+
+    Явный ``batch_size`` Django не урезает, а SQLite не принимает больше
+    999 параметров и 500 строк в одном INSERT.
+    """
+    fields = model._meta.concrete_fields
+    return min(limit, connection.ops.bulk_batch_size(fields, []))
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу (pub_date, id) без COUNT и OFFSET.
+
+    Страница строится одним запросом вида
+    ``WHERE (pub_date, id) < (курсор) ORDER BY ... LIMIT per_page + 1``,
+    поэтому её стоимость не зависит от глубины листания.
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, ordering=CURSOR_ORDERING):
+        super().__init__(object_list.order_by(*ordering), per_page)
+        self.ordering = ordering
+        self.has_next = False
+        self.has_previous = False
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    @cached_property
+    def _fields(self):
+        return [
+            (name.lstrip('-'), name.startswith('-')) for name in self.ordering
+        ]
+
+    def encode_cursor(self, obj):
+        values = []
+        for name, _ in self._fields:
+            value = obj[name] if isinstance(obj, dict) else getattr(obj, name)
+            values.append(
+                value.isoformat() if hasattr(value, 'isoformat') else value
+            )
+        raw = '|'.join(str(value) for value in values)
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            return None
+        parts = raw.split('|')
+        if len(parts) != len(self._fields):
+            return None
+        values = []
+        for (name, _), part in zip(self._fields, parts):
+            field = self.object_list.model._meta.get_field(name)
+            try:
+                value = parse_cursor_value(field, part)
+            except (ValueError, OverflowError):
+                return None
+            if value is None:
+                return None
+            values.append(value)
+        return values
+
+    def _seek(self, values, forward):
+        """Условие «строго после курсора» в направлении листания."""
+        condition = Q()
+        equal = {}
+        for (name, descending), value in zip(self._fields, values):
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def _order_by(self, forward):
+        if forward:
+            return self.ordering
+        return [
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in self.ordering
+        ]
+
+    def get_cursor_page(self, after=None, before=None):
+        forward = before is None
+        cursor = self.decode_cursor(after if forward else before)
+        if cursor is None:
+            forward = True
+        queryset = self.object_list.order_by(*self._order_by(forward))
+        if cursor:
+            queryset = queryset.filter(self._seek(cursor, forward))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if forward:
+            self.has_next = has_more
+            self.has_previous = bool(cursor)
+        else:
+            rows.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+            if not rows:
+                return self.get_cursor_page()
+        if rows:
+            self.next_cursor = self.encode_cursor(rows[-1])
+            self.previous_cursor = self.encode_cursor(rows[0])
+        return self._get_page(rows, 1, self)
+
+
+def get_page_obj(obj_list, request, ordering=CURSOR_ORDERING):
+    """Страница ленты: курсорная по умолчанию, по номеру для ?page=N."""
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        paginator = Paginator(
+            obj_list.order_by(*ordering), settings.POSTS_ON_PAGE
+        )
+        return paginator.get_page(page_number)
+    paginator = CursorPaginator(
+        obj_list, settings.POSTS_ON_PAGE, ordering=ordering
+    )
+    return paginator.get_cursor_page(
+        after=request.GET.get('after'), before=request.GET.get('before')
+    )
 
 
-def get_page_obj(obj_list, page_number):
-    paginator = Paginator(obj_list, settings.POSTS_ON_PAGE)
-    return paginator.get_page(page_number)
+def get_comment_page(post, after=None):
+    """Страница комментариев поста с авторами, по курсору ``after``."""
+    paginator = CursorPaginator(
+        post.comments.select_related('author'),
+        settings.COMMENTS_ON_PAGE,
+        ordering=COMMENT_ORDERING,
+    )
+    return paginator.get_cursor_page(after=after)
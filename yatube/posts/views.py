@@ -1,38 +1,61 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-
+from django.views.decorators.http import condition
+
+from core.db_router import use_primary
+from core.metrics import query_budget
+from core.pagecache import anonymous_page
+from core.ratelimit import rate_limit
+
+from . import counters, feed, search, suggestions, syndication
+from .cache import fragment_context, get_generation
+from .conditional import (
+    conditional, group_validators, post_validators, profile_validators,
+)
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, get_user_model
-from .utils import get_page_obj
+from .utils import get_comment_page, get_page_obj
 
 User = get_user_model()
 
 
+@query_budget(4)
+@anonymous_page(get_generation)
 def index(request):
-    post_list = Post.objects.all()
-    page_obj = get_page_obj(post_list, request.GET.get('page'))
-    context = {'page_obj': page_obj, 'index': True}
+    post_list = Post.objects.for_feed()
+    page_obj = get_page_obj(post_list, request)
+    context = {'page_obj': page_obj, 'index': True, **fragment_context()}
     return render(request, 'posts/index.html', context)
 
 
+@query_budget(6)
+@anonymous_page(get_generation)
+@conditional(group_validators)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_obj = get_page_obj(posts, request.GET.get('page'))
+    posts = group.posts.for_feed()
+    page_obj = get_page_obj(posts, request)
 
     context = {
         'group': group,
         'page_obj': page_obj,
+        **fragment_context(),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@query_budget(9)
+@anonymous_page(get_generation)
+@conditional(profile_validators)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    count = posts.count()
-    page_number = request.GET.get('page')
-    page_obj = get_page_obj(posts, page_number)
+    posts = author.posts.for_feed()
+    count = counters.get_stats(author.pk).posts_count
+    page_obj = get_page_obj(posts, request)
     user = request.user
     following = False
     if request.user.is_authenticated:
@@ -42,24 +65,102 @@ def profile(request, username):
         'author': author,
         'page_obj': page_obj,
         'following': following,
+        **fragment_context(),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@query_budget(5)
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(search.search(query), settings.POSTS_ON_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {'page_obj': page_obj, 'query': query}
+    return render(request, 'posts/search.html', context)
+
+
+@query_budget(3)
+def search_api(request):
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(search.search(query), settings.POSTS_ON_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    return JsonResponse({
+        'query': query,
+        'count': paginator.count,
+        'page': page_obj.number,
+        'num_pages': paginator.num_pages,
+        'results': [
+            {
+                'id': post.pk,
+                'text': post.text,
+                'author': post.author.username,
+                'group': post.group.slug if post.group else None,
+                'pub_date': post.pub_date,
+            }
+            for post in page_obj
+        ],
+    })
+
+
+@query_budget(6)
+@anonymous_page(get_generation)
+@conditional(post_validators)
 def post_detail(request, post_id):
     form = CommentForm()
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id
+    )
     context = {
         'post': post,
+        'author_stats': counters.get_stats(post.author_id),
         'form': form,
-        'comments': comments,
+        'comments': get_comment_page(post, request.GET.get('after')),
         'post_id': post_id,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@query_budget(2)
+def post_comments(request, post_id):
+    """Следующая страница комментариев: HTML-фрагмент или JSON."""
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comments = get_comment_page(post, request.GET.get('after'))
+    if request.GET.get('format') != 'json':
+        context = {'post': post, 'comments': comments}
+        return render(request, 'posts/includes/comments.html', context)
+    paginator = comments.paginator
+    return JsonResponse({
+        'post': post.pk,
+        'next': paginator.next_cursor if paginator.has_next else None,
+        'results': [
+            {
+                'id': comment.pk,
+                'author': comment.author.username,
+                'text': comment.text,
+                'created': comment.created,
+            }
+            for comment in comments
+        ],
+    })
+
+
+@query_budget(2)
+@condition(
+    etag_func=syndication.etag, last_modified_func=syndication.last_modified
+)
+def post_feed(request, feed_format, slug=None, username=None):
+    """RSS или Atom общей ленты, группы или автора."""
+    state = syndication.feed_state(request, feed_format, slug, username)
+    if state is None:
+        raise Http404
+    return syndication.response(request, feed_format, state)
+
+
+@query_budget(12)
+@use_primary
 @login_required
+@rate_limit('post')
+@transaction.atomic
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
@@ -69,10 +170,13 @@ def post_create(request):
     return render(request, 'posts/create_post.html', {'form': form})
 
 
+@query_budget(8)
+@use_primary
 @login_required
+@rate_limit('post')
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
-    if request.user.id != post.author.pk:
+    if request.user.id != post.author_id:
         return redirect('posts:post_detail', post.pk)
     form = PostForm(
         request.POST or None, files=request.FILES or None, instance=post
@@ -88,7 +192,11 @@ def post_edit(request, post_id):
     return render(request, 'posts/create_post.html', context)
 
 
+@query_budget(9)
+@use_primary
 @login_required
+@rate_limit('comment')
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -100,28 +208,43 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post.pk)
 
 
+@query_budget(9)
+@use_primary
 @login_required
 def follow_index(request):
-    fav_posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = get_page_obj(fav_posts, request.GET.get('page'))
-    context = {'page_obj': page_obj, 'follow': True}
+    page_obj = feed.get_feed_page(request.user, request)
+    context = {
+        'page_obj': page_obj,
+        'follow': True,
+        'suggestions': suggestions.for_user(request.user),
+    }
     return render(request, 'posts/follow.html', context)
 
 
+@query_budget(15)
+@use_primary
 @login_required
+@rate_limit('follow', methods=None)
+@transaction.atomic
 def profile_follow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
     following = Follow.objects.filter(user=user, author=author)
     if request.user != author and not following.exists():
         Follow.objects.create(user=request.user, author=author)
+        suggestions.refresh_on_commit(user.pk)
     return redirect('posts:profile', username)
 
 
+@query_budget(14)
+@use_primary
 @login_required
+@rate_limit('follow', methods=None)
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     user = request.user
-    following = user.follower.filter(author=author)
-    following.delete()
+    deleted, _ = user.follower.filter(author=author).delete()
+    if deleted:
+        suggestions.refresh_on_commit(user.pk)
     return redirect('posts:follow_index')
@@ -0,0 +1,24 @@
+// Подгружает следующую страницу комментариев вместо кнопки «Показать ещё».
+// Без JavaScript кнопка остаётся обычной ссылкой на следующую страницу.
+document.addEventListener('click', function (event) {
+  var link = event.target.closest('[data-more-comments]');
+  if (!link) {
+    return;
+  }
+  event.preventDefault();
+  link.classList.add('disabled');
+  fetch(link.dataset.moreComments, { credentials: 'same-origin' })
+    .then(function (response) {
+      if (!response.ok) {
+        throw new Error(response.statusText);
+      }
+      return response.text();
+    })
+    .then(function (html) {
+      link.insertAdjacentHTML('afterend', html);
+      link.remove();
+    })
+    .catch(function () {
+      window.location = link.href;
+    });
+});
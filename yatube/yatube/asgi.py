@@ -0,0 +1,18 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named
+``application``. Django 2.2 has no ASGI support of its own, so requests
+run through ``core.asgi.ASGIHandler`` in a bounded thread pool.
+"""
+
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+django.setup(set_prefix=False)
+
+from core.asgi import ASGIHandler  # noqa: E402
+
+application = ASGIHandler()
@@ -23,26 +23,31 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.auth.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+if DEBUG:
+    INSTALLED_APPS += ['debug_toolbar']
+    MIDDLEWARE += ['debug_toolbar.middleware.DebugToolbarMiddleware']
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -58,6 +63,8 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+# yatube.asgi выполняет запросы в пуле из стольких потоков
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', 8))
 
 
 DATABASES = {
@@ -67,6 +74,46 @@ DATABASES = {
     }
 }
 
+# Режим производительности SQLite: прагмы из SQLITE_PRAGMAS на каждом
+# новом соединении, транзакции BEGIN IMMEDIATE (бэкенд core.sqlite) и
+# соединения, живущие между запросами. SQLITE_PERFORMANCE=0 возвращает
+# настройки SQLite и Django по умолчанию
+SQLITE_PERFORMANCE = os.getenv('SQLITE_PERFORMANCE', '1') != '0'
+SQLITE_PRAGMAS = {}
+if SQLITE_PERFORMANCE:
+    DATABASES['default']['ENGINE'] = 'core.sqlite'
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        # Отрицательное значение — в килобайтах: 64 МБ на соединение
+        'cache_size': -int(os.getenv('SQLITE_CACHE_KB', 64 * 1024)),
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    }
+DATABASES['default']['CONN_MAX_AGE'] = int(
+    os.getenv('CONN_MAX_AGE', 600 if SQLITE_PERFORMANCE else 0)
+)
+
+# Реплики только для чтения: пути к копиям базы через запятую. Локально
+# их обновляет команда replicate
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+    filter(None, os.getenv('DATABASE_REPLICAS', '').split(',')), start=1
+):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{path.strip()}?mode=ro',
+        # replicate подменяет файл реплики: старое соединение его не увидит
+        'CONN_MAX_AGE': 0,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['core.db_router.PrimaryReplicaRouter']
+# После записи браузер столько секунд читает из основной базы
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 10))
+REPLICA_PIN_COOKIE = 'primary_pin'
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -101,6 +148,21 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATIC_ROOT = os.getenv(
+    'STATIC_ROOT', os.path.join(BASE_DIR, 'collected_static')
+)
+# Хэш в именах файлов и копии .gz/.br (core.staticfiles) появляются после
+# collectstatic: без него {% static %} с этим хранилищем не работает,
+# поэтому оно включается явно. STATIC_SERVE отдаёт STATIC_ROOT самим
+# Django со сжатием по Accept-Encoding и вечным кэшем.
+STATIC_COMPRESSED = os.getenv('STATIC_COMPRESSED') == '1'
+if STATIC_COMPRESSED:
+    STATICFILES_STORAGE = (
+        'core.staticfiles.CompressedManifestStaticFilesStorage'
+    )
+STATIC_SERVE = os.getenv(
+    'STATIC_SERVE', '1' if STATIC_COMPRESSED else '0'
+) == '1'
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
@@ -108,19 +170,138 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_ON_PAGE = 10
+COMMENTS_ON_PAGE = 20
+
+# JSON API: размер страницы по умолчанию (?limit=), его предел и
+# предел объектов в одном запросе к пакетным адресам
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+API_BULK_LIMIT = 50
+
+# Авторы с большим числом подписчиков не раскладываются в ленты при записи
+FEED_FANOUT_LIMIT = 10000
+FEED_BATCH_SIZE = 1000
+
+# Кого почитать (posts.suggestions): веса друзей друзей и похожих по
+# подписчикам авторов, сколько рекомендаций хранится и показывается,
+# сколько подписчиков авторов читает пересчёт после подписки
+SUGGESTIONS_FOF_WEIGHT = 1.0
+SUGGESTIONS_COFOLLOW_WEIGHT = 1.0
+SUGGESTIONS_PER_USER = 10
+SUGGESTIONS_ON_PAGE = 5
+SUGGESTIONS_REFRESH_SAMPLE = 1000
 
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Общий для всех воркеров кэш на SQLite; LocMemCache и другие бэкенды
+# Django подключаются через CACHE_BACKEND и CACHE_LOCATION
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'core.cache_backends.SQLiteCache'
+        ),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache.sqlite3')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 100000)),
+            'MAX_SIZE': int(os.getenv('CACHE_MAX_SIZE', 256 * 1024 * 1024)),
+        },
     }
 }
 
+# Тесты идут на LocMemCache, а не на файле кэша разработки
+TEST_RUNNER = 'core.testing.TestRunner'
+
+# Сессия и пользователь запроса читаются из кэша, база — при промахе.
+# Сессия пишется в кэш и в базу, только когда меняется; пользователя
+# сбрасывает его запись (core.auth), а правки мимо сигналов видны не
+# позже, чем через USER_CACHE_TIMEOUT
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'default'
+USER_CACHE_ALIAS = 'default'
+USER_CACHE_TIMEOUT = 60 * 15
+
+# Постов в лентах RSS и Atom
+SYNDICATION_ITEMS = 50
+
+# Фрагменты лент живут долго: их сбрасывает поколение в posts.cache
+FEED_CACHE_ALIAS = 'default'
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Целые страницы лент и постов для читателей без сессии (core.pagecache);
+# сбрасываются тем же поколением, что и фрагменты
+PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE_ENABLED', '1') == '1'
+PAGE_CACHE_ALIAS = 'default'
+PAGE_CACHE_TIMEOUT = 60 * 60
+PAGE_CACHE_BYPASS_COOKIES = ('sessionid', 'messages')
+
+# Миниатюры картинок постов строятся в фоновом пуле потоков
+THUMBNAIL_ASYNC = True
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_KVSTORE = 'core.thumbnail_kvstore.KVStore'
+
+# Загруженная картинка ужимается до стольких точек по длинной стороне
+IMAGE_MAX_SIZE = 2048
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+# Адреса обратных прокси перед приложением через запятую: для запросов
+# от них адрес клиента берётся из X-Forwarded-For (core.http.client_ip)
+TRUSTED_PROXIES = [
+    address.strip()
+    for address in os.getenv('TRUSTED_PROXIES', '').split(',')
+    if address.strip()
+]
+
+# Ограничение частоты записи (core.ratelimit): "N/период" — N запросов
+# подряд, затем N за период (s, m, h, d), отдельно на пользователя и IP.
+# LocalBackend держит корзины в памяти процесса, CacheBackend — в общем
+# кэше RATE_LIMIT_CACHE_ALIAS
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', '1') == '1'
+RATE_LIMIT_BACKEND = os.getenv(
+    'RATE_LIMIT_BACKEND', 'core.ratelimit.CacheBackend'
+)
+RATE_LIMIT_CACHE_ALIAS = 'default'
+RATE_LIMITS = {
+    'post': {'user': '10/m', 'ip': '60/m'},
+    'comment': {'user': '20/m', 'ip': '120/m'},
+    'follow': {'user': '30/m', 'ip': '120/m'},
+}
+
+# Метрики запросов: /metrics/ для Prometheus и JSON-лог yatube.metrics
+METRICS_PREFIX = 'yatube'
+METRICS_LOG = bool(os.getenv('METRICS_LOG'))
+METRICS_ALLOWED_IPS = INTERNAL_IPS
+# С токеном /metrics/ требует "Authorization: Bearer <токен>" с любого
+# адреса; без него открыт только клиентам из METRICS_ALLOWED_IPS
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+# Превышение query_budget view в тестах — ошибка, в продакшене — запись
+QUERY_BUDGET_RAISE = False
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'metrics': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'yatube.metrics': {
+            'handlers': ['metrics'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
@@ -1,8 +1,13 @@
+import re
+
 from django.conf import settings
 from django.conf.urls import include
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import path
+from django.urls import path, re_path
+
+from core import staticfiles
+from core.views import metrics
 
 handler404 = 'core.views.page_not_found'
 handler500 = 'core.views.server_error'
@@ -14,8 +19,19 @@ urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('api/v1/', include('api.urls', namespace='api')),
+    path('metrics/', metrics, name='metrics'),
 ]
 
+if settings.STATIC_SERVE:
+    urlpatterns += (
+        re_path(
+            r'^%s(?P<path>.+)$' % re.escape(settings.STATIC_URL.lstrip('/')),
+            staticfiles.serve,
+            name='static',
+        ),
+    )
+
 if settings.DEBUG:
     urlpatterns += static(
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT